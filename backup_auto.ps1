@@ -11,9 +11,19 @@ $timestamp = Get-Date -Format "yyyy-MM-dd_HH-mm"
 $nombreCarpeta = "${timestamp}_${Descripcion}"
 $rutaBackup = "backups\$nombreCarpeta"
 
-# Obtener archivos modificados desde el ultimo commit
+# Las bases SQLite no se copian archivo por archivo: en modo WAL los ultimos cambios
+# estan en db.sqlite3-wal. La API de backup de sqlite3 (la de ".backup") lee la
+# base completa y consistente aunque la app este escribiendo.
+function Copiar-BaseSqlite($origen, $destino) {
+    python -c "import sqlite3, sys; o = sqlite3.connect(sys.argv[1]); d = sqlite3.connect(sys.argv[2]); o.backup(d); d.close(); o.close()" $origen $destino
+    if ($LASTEXITCODE -ne 0) {
+        throw "No se pudo respaldar la base de datos $origen"
+    }
+}
+
+# Obtener archivos modificados desde el ultimo commit (el -wal y el -shm van dentro de la copia de la base)
 Write-Host "Detectando archivos modificados..." -ForegroundColor Cyan
-$archivosModificados = git diff --name-only HEAD
+$archivosModificados = @(git diff --name-only HEAD | Where-Object { $_ -notmatch '\.sqlite3-(wal|shm)$' })
 
 if ($archivosModificados.Count -eq 0) {
     Write-Host "No hay archivos modificados desde el ultimo commit." -ForegroundColor Yellow
@@ -35,7 +45,11 @@ foreach ($archivo in $archivosModificados) {
             New-Item -ItemType Directory -Path $dirDestino -Force | Out-Null
         }
         
-        Copy-Item $archivo "$rutaBackup\$archivo" -Force
+        if ($archivo -like "*.sqlite3") {
+            Copiar-BaseSqlite $archivo "$rutaBackup\$archivo"
+        } else {
+            Copy-Item $archivo "$rutaBackup\$archivo" -Force
+        }
         Write-Host "  OK $archivo" -ForegroundColor Cyan
         $contador++
     }
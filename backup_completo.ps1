@@ -25,10 +25,21 @@ Write-Host ""
 # Crear carpeta de backup
 New-Item -ItemType Directory -Path $rutaBackup -Force | Out-Null
 
+# Las bases SQLite no se copian archivo por archivo: en modo WAL los ultimos cambios
+# estan en db.sqlite3-wal. La API de backup de sqlite3 (la de ".backup") lee la
+# base completa y consistente aunque la app este escribiendo.
+function Copiar-BaseSqlite($origen, $destino) {
+    python -c "import sqlite3, sys; o = sqlite3.connect(sys.argv[1]); d = sqlite3.connect(sys.argv[2]); o.backup(d); d.close(); o.close()" $origen $destino
+    if ($LASTEXITCODE -ne 0) {
+        throw "No se pudo respaldar la base de datos $origen"
+    }
+}
+
 # Obtener TODOS los archivos (sin exclusiones)
 $archivos = Get-ChildItem -Path . -Recurse -File | Where-Object {
     # Solo excluir la carpeta de backups actual para evitar recursion infinita
-    $_.FullName -notlike "*\backups\*"
+    # (y el -wal/-shm de SQLite, que ya van dentro de la copia de la base)
+    $_.FullName -notlike "*\backups\*" -and $_.Name -notmatch '\.sqlite3-(wal|shm)$'
 }
 
 $total = $archivos.Count
@@ -44,7 +55,11 @@ foreach ($archivo in $archivos) {
         New-Item -ItemType Directory -Path $dirDestino -Force | Out-Null
     }
     
-    Copy-Item $archivo.FullName $destino -Force
+    if ($archivo.Extension -eq ".sqlite3") {
+        Copiar-BaseSqlite $archivo.FullName $destino
+    } else {
+        Copy-Item $archivo.FullName $destino -Force
+    }
     
     # Mostrar progreso cada 100 archivos
     if ($contador % 100 -eq 0) {
@@ -19,6 +19,16 @@ $rutaBackup = "backups\$nombreCarpeta"
 Write-Host "Creando backup preventivo en: $rutaBackup" -ForegroundColor Green
 New-Item -ItemType Directory -Path $rutaBackup -Force | Out-Null
 
+# Las bases SQLite no se copian archivo por archivo: en modo WAL los ultimos cambios
+# estan en db.sqlite3-wal. La API de backup de sqlite3 (la de ".backup") lee la
+# base completa y consistente aunque la app este escribiendo.
+function Copiar-BaseSqlite($origen, $destino) {
+    python -c "import sqlite3, sys; o = sqlite3.connect(sys.argv[1]); d = sqlite3.connect(sys.argv[2]); o.backup(d); d.close(); o.close()" $origen $destino
+    if ($LASTEXITCODE -ne 0) {
+        throw "No se pudo respaldar la base de datos $origen"
+    }
+}
+
 $contador = 0
 
 # Copiar cada ruta especificada
@@ -39,7 +49,11 @@ foreach ($ruta in $Rutas) {
             if ($dirDestino -and !(Test-Path $dirDestino)) {
                 New-Item -ItemType Directory -Path $dirDestino -Force | Out-Null
             }
-            Copy-Item $ruta "$rutaBackup\$ruta" -Force
+            if ($ruta -like "*.sqlite3") {
+                Copiar-BaseSqlite $ruta "$rutaBackup\$ruta"
+            } else {
+                Copy-Item $ruta "$rutaBackup\$ruta" -Force
+            }
             Write-Host "  OK Archivo: $ruta" -ForegroundColor Cyan
             $contador++
         }
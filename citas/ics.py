@@ -0,0 +1,251 @@
+# citas/ics.py
+"""
+Lectura de un calendario ICS en streaming, limitada a una ventana de fechas.
+
+El calendario de Google trae todo el historial de eventos, pero solo interesa una
+ventana alrededor de hoy. Por eso:
+
+- se leen las líneas de una en una y se arma cada VEVENT como texto;
+- los eventos simples fuera de la ventana se descartan mirando solo la fecha de
+  DTSTART, sin construir el componente de icalendar ni convertir zonas horarias;
+- los eventos recurrentes (RRULE) se expanden solo dentro de la ventana,
+  respetando EXDATE y las ocurrencias modificadas o canceladas (RECURRENCE-ID).
+"""
+
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+import logging
+
+from dateutil.rrule import rrulestr
+from django.utils import timezone
+from icalendar import Event
+
+logger = logging.getLogger(__name__)
+
+# Margen para el filtro rápido: la fecha de DTSTART puede estar en otra zona horaria
+_MARGEN = timedelta(days=1)
+
+
+def _a_hora_local(valor):
+    """Devuelve (datetime aware en la zona actual, es_todo_el_dia)."""
+    zona = timezone.get_current_timezone()
+    if isinstance(valor, date) and not isinstance(valor, datetime):
+        # Evento de todo el día: medianoche en Perú
+        return timezone.make_aware(datetime.combine(valor, datetime.min.time()), zona), True
+    if timezone.is_naive(valor):
+        # Google envía algunas horas sin zona: se asumen en hora de Perú
+        return timezone.make_aware(valor, zona), False
+    return valor.astimezone(zona), False
+
+
+def lineas_de_bytes(trozos):
+    """
+    Corta en líneas un flujo de bytes en trozos arbitrarios (`response.iter_content()`).
+    `iter_lines()` de requests no sirve: si un trozo termina entre el \r y el \n
+    devuelve una línea vacía de más, y eso corta las líneas continuadas.
+    """
+    resto = b''
+    for trozo in trozos:
+        resto += trozo
+        *completas, resto = resto.split(b'\n')
+        yield from completas
+    if resto:
+        yield resto
+
+
+def _lineas_desplegadas(lineas):
+    """
+    Une las líneas continuadas del formato ICS (las que empiezan con espacio o tab).
+    Si llegan en bytes se unen antes de decodificar: el corte puede caer en medio
+    de una letra de varios bytes en UTF-8 ("Extracci" + "ón").
+    """
+    actual = None
+    for linea in lineas:
+        if isinstance(linea, bytes):
+            linea = linea.rstrip(b'\r\n')
+            continuacion = linea[:1] in (b' ', b'\t')
+        else:
+            linea = linea.rstrip('\r\n')
+            continuacion = linea[:1] in (' ', '\t')
+        if continuacion and actual is not None:
+            actual += linea[1:]
+            continue
+        if actual is not None:
+            yield _texto(actual)
+        actual = linea
+    if actual is not None:
+        yield _texto(actual)
+
+
+def _texto(linea):
+    return linea.decode('utf-8', errors='replace') if isinstance(linea, bytes) else linea
+
+
+def _bloques_vevent(lineas):
+    """Genera cada VEVENT como lista de líneas, sin parsear el resto del calendario."""
+    bloque = None
+    for linea in _lineas_desplegadas(lineas):
+        if linea == 'BEGIN:VEVENT':
+            bloque = [linea]
+        elif bloque is not None:
+            bloque.append(linea)
+            if linea == 'END:VEVENT':
+                yield bloque
+                bloque = None
+
+
+def _fecha_de_linea(linea):
+    """Fecha (sin hora) del valor de una línea DTSTART/UNTIL, o None si no se entiende."""
+    valor = linea.rsplit(':', 1)[-1]
+    try:
+        return date(int(valor[0:4]), int(valor[4:6]), int(valor[6:8]))
+    except (ValueError, IndexError):
+        return None
+
+
+def _descartable(bloque, desde, hasta):
+    """True si el evento no puede caer en la ventana, mirando solo el texto."""
+    inicio = None
+    regla = None
+    for linea in bloque:
+        if linea.startswith('DTSTART'):
+            inicio = _fecha_de_linea(linea)
+        elif linea.startswith('RRULE'):
+            regla = linea
+        elif linea.startswith('RECURRENCE-ID'):
+            # Una ocurrencia movida puede anular otra que sí está en la ventana
+            return False
+    if inicio is None:
+        return False
+    if inicio - _MARGEN > hasta.date():
+        return True
+    if regla is None:
+        return inicio + _MARGEN < desde.date()
+    for parte in regla.split(':', 1)[-1].split(';'):
+        if parte.startswith('UNTIL='):
+            fin_regla = _fecha_de_linea(parte)
+            return fin_regla is not None and fin_regla + _MARGEN < desde.date()
+    return False
+
+
+def _evento(componente, inicio, duracion, todo_el_dia):
+    fin = inicio + duracion if duracion is not None else None
+    return {
+        'uid': str(componente.get('uid', '')),
+        'titulo': str(componente.get('summary', 'Sin título')),
+        'descripcion': str(componente.get('description', '')),
+        'inicio': inicio,
+        'fin': fin,
+        'todo_el_dia': todo_el_dia,
+    }
+
+
+def _fechas_exdate(componente):
+    exdate = componente.get('exdate')
+    if exdate is None:
+        return set()
+    if not isinstance(exdate, list):
+        exdate = [exdate]
+    return {_a_hora_local(d.dt)[0] for lista in exdate for d in lista.dts}
+
+
+def _ocurrencias(componente, valor_dtstart, desde, hasta):
+    """Inicios (hora local) de una regla RRULE que caen dentro de [desde, hasta]."""
+    regla = componente.get('rrule').to_ical().decode()
+    # La regla se expande en la zona del propio DTSTART (TZID): así una serie de
+    # Nueva York conserva su hora de pared al cambiar el horario de verano.
+    # Los DTSTART sin zona o de todo el día se toman en hora de Perú.
+    if isinstance(valor_dtstart, datetime) and not timezone.is_naive(valor_dtstart):
+        inicio = valor_dtstart
+    else:
+        inicio, _ = _a_hora_local(valor_dtstart)
+    zona = inicio.tzinfo
+    if 'UNTIL=' in regla:
+        # dateutil exige UNTIL en UTC cuando DTSTART es aware
+        partes = []
+        for parte in regla.split(';'):
+            if parte.startswith('UNTIL='):
+                parte = 'UNTIL=' + _until_utc(parte[6:], zona).strftime('%Y%m%dT%H%M%SZ')
+            partes.append(parte)
+        regla = ';'.join(partes)
+    ocurrencias = rrulestr(regla, dtstart=inicio).between(
+        desde.astimezone(zona), hasta.astimezone(zona), inc=True
+    )
+    return [timezone.localtime(o) for o in ocurrencias]
+
+
+def _until_utc(valor, zona):
+    """UNTIL en UTC; si viene como fecha o sin zona se interpreta en la zona del evento."""
+    fin = _valor_until(valor)
+    if not isinstance(fin, datetime):
+        # UNTIL=AAAAMMDD incluye todo ese día
+        fin = datetime.combine(fin, datetime.max.time().replace(microsecond=0))
+    if timezone.is_naive(fin):
+        fin = timezone.make_aware(fin, zona)
+    return fin.astimezone(dt_timezone.utc)
+
+
+def _valor_until(valor):
+    if len(valor) == 8:
+        return date(int(valor[0:4]), int(valor[4:6]), int(valor[6:8]))
+    fecha = datetime.strptime(valor.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if valor.endswith('Z'):
+        fecha = fecha.replace(tzinfo=dt_timezone.utc)
+    return fecha
+
+
+def extraer_eventos(lineas, desde, hasta):
+    """
+    Recorre una sola vez las líneas de un .ics (bytes o str, p. ej. un archivo
+    abierto en binario o `lineas_de_bytes(response.iter_content())`) y devuelve la lista de eventos cuyo inicio cae en
+    [desde, hasta], ya en hora local, con las recurrencias expandidas.
+    Cada evento es un dict con uid, titulo, descripcion, inicio, fin y todo_el_dia.
+    """
+    eventos = {}
+    modificadas = {}
+
+    for bloque in _bloques_vevent(lineas):
+        if _descartable(bloque, desde, hasta):
+            continue
+        try:
+            componente = Event.from_ical('\r\n'.join(bloque))
+            dtstart = componente.get('dtstart')
+            if not dtstart or not dtstart.dt:
+                continue
+            inicio, todo_el_dia = _a_hora_local(dtstart.dt)
+            duracion = None
+            dtend = componente.get('dtend')
+            if dtend and dtend.dt:
+                duracion = _a_hora_local(dtend.dt)[0] - inicio
+            uid = str(componente.get('uid', ''))
+
+            recurrencia = componente.get('recurrence-id')
+            if recurrencia is not None:
+                # Ocurrencia movida o cancelada de una serie: reemplaza a la original
+                original, _ = _a_hora_local(recurrencia.dt)
+                cancelada = str(componente.get('status', '')).upper() == 'CANCELLED'
+                dentro = desde <= inicio <= hasta
+                modificadas[(uid, original)] = (
+                    _evento(componente, inicio, duracion, todo_el_dia)
+                    if dentro and not cancelada else None
+                )
+                continue
+
+            if componente.get('rrule') is None:
+                if desde <= inicio <= hasta:
+                    eventos[(uid, inicio)] = _evento(componente, inicio, duracion, todo_el_dia)
+                continue
+
+            excluidas = _fechas_exdate(componente)
+            for ocurrencia in _ocurrencias(componente, dtstart.dt, desde, hasta):
+                if ocurrencia not in excluidas:
+                    eventos[(uid, ocurrencia)] = _evento(componente, ocurrencia, duracion, todo_el_dia)
+        except Exception as e:
+            logger.warning(f"Error al procesar evento: {e}")
+            continue
+
+    for clave, evento in modificadas.items():
+        eventos.pop(clave, None)
+        if evento is not None:
+            eventos[(evento['uid'], evento['inicio'])] = evento
+
+    return sorted(eventos.values(), key=lambda e: e['inicio'])
@@ -0,0 +1,71 @@
+# citas/management/commands/benchmark_ics.py
+
+from datetime import timedelta
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from icalendar import Calendar
+
+from citas.ics import extraer_eventos, _a_hora_local
+from citas.views import calcular_ventana
+
+
+def generar_ics(ruta, cantidad, anios=10, recurrentes=0.02):
+    """Escribe un .ics sintético con `cantidad` eventos repartidos en los últimos `anios` años."""
+    ahora = timezone.now()
+    rnd = random.Random(42)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//benchmark//ES\r\n')
+        for i in range(cantidad):
+            inicio = ahora - timedelta(days=rnd.randint(-60, anios * 365), minutes=rnd.randint(0, 600))
+            f.write('BEGIN:VEVENT\r\n')
+            f.write(f'UID:evento-{i}@benchmark\r\n')
+            f.write(f'DTSTART:{inicio:%Y%m%dT%H%M%SZ}\r\n')
+            f.write(f'DTEND:{inicio + timedelta(minutes=30):%Y%m%dT%H%M%SZ}\r\n')
+            if rnd.random() < recurrentes:
+                f.write('RRULE:FREQ=WEEKLY;COUNT=52\r\n')
+            f.write(f'SUMMARY:Cita dental {i}\r\n')
+            f.write('DESCRIPTION:Paciente de prueba para medir el parser\r\n')
+            f.write('END:VEVENT\r\n')
+        f.write('END:VCALENDAR\r\n')
+
+
+def parser_completo(ruta, desde, hasta):
+    """Como lo hacía la vista antes: parsear todo y convertir cada evento."""
+    with open(ruta, 'rb') as f:
+        cal = Calendar.from_ical(f.read())
+    eventos = []
+    for componente in cal.walk('VEVENT'):
+        inicio, _ = _a_hora_local(componente.get('dtstart').dt)
+        if desde <= inicio <= hasta:
+            eventos.append(componente)
+    return eventos
+
+
+class Command(BaseCommand):
+    help = "Mide el tiempo de lectura de un calendario ICS sintético (parser completo vs. streaming por ventana)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--eventos', type=int, default=50000)
+        parser.add_argument('--filtro', default='mes', help='Ventana a extraer: hoy, semana, mes, proximo_mes, rango')
+
+    def handle(self, *args, **options):
+        desde, hasta = calcular_ventana(options['filtro'], timezone.localtime())
+        with tempfile.NamedTemporaryFile(suffix='.ics') as archivo:
+            generar_ics(archivo.name, options['eventos'])
+            self.stdout.write(f"{options['eventos']} eventos, ventana {desde:%d/%m/%Y} - {hasta:%d/%m/%Y}")
+
+            t0 = time.perf_counter()
+            completos = parser_completo(archivo.name, desde, hasta)
+            t_completo = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with open(archivo.name, 'rb') as f:
+                ventana = extraer_eventos(f, desde, hasta)
+            t_streaming = time.perf_counter() - t0
+
+        self.stdout.write(f"Parser completo:   {t_completo * 1000:8.0f} ms ({len(completos)} eventos sin expandir RRULE)")
+        self.stdout.write(f"Streaming ventana: {t_streaming * 1000:8.0f} ms ({len(ventana)} eventos con RRULE expandidas)")
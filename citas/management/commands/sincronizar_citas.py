@@ -0,0 +1,29 @@
+# citas/management/commands/sincronizar_citas.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from citas.sincronizacion import sincronizar_calendario, ERROR
+
+
+class Command(BaseCommand):
+    help = "Descarga el calendario ICS de Google y actualiza las citas locales"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='URL del ICS (por defecto settings.CITAS_ICS_URL)')
+        parser.add_argument(
+            '--cada',
+            type=int,
+            default=0,
+            metavar='SEGUNDOS',
+            help='Repetir la sincronización cada N segundos (modo en segundo plano)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            resultado = sincronizar_calendario(url=options['url'])
+            estilo = self.style.ERROR if resultado == ERROR else self.style.SUCCESS
+            self.stdout.write(estilo(f"Sincronización: {resultado}"))
+            if not options['cada']:
+                break
+            time.sleep(options['cada'])
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SincronizacionCalendario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+                ('ultima_consulta', models.DateTimeField(blank=True, null=True, verbose_name='Última consulta a Google')),
+                ('ultima_actualizacion', models.DateTimeField(blank=True, null=True, verbose_name='Última vez que cambiaron los eventos')),
+                ('error', models.TextField(blank=True, verbose_name='Último error')),
+            ],
+            options={
+                'verbose_name': 'Sincronización del calendario',
+                'verbose_name_plural': 'Sincronización del calendario',
+            },
+        ),
+        migrations.CreateModel(
+            name='Cita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.CharField(max_length=255, verbose_name='UID del evento')),
+                ('titulo', models.CharField(max_length=255, verbose_name='Título')),
+                ('descripcion', models.TextField(blank=True, verbose_name='Descripción')),
+                ('inicio', models.DateTimeField(db_index=True, verbose_name='Inicio')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('todo_el_dia', models.BooleanField(default=False, verbose_name='Todo el día')),
+            ],
+            options={
+                'verbose_name': 'Cita',
+                'verbose_name_plural': 'Citas',
+                'ordering': ['inicio'],
+                'constraints': [models.UniqueConstraint(fields=('uid', 'inicio'), name='cita_uid_inicio_unica')],
+            },
+        ),
+    ]
@@ -1,3 +1,75 @@
+# citas/models.py
+
 from django.db import models
 
-# Create your models here.
+
+class Cita(models.Model):
+    """Evento del calendario de Google guardado localmente por `sincronizar_citas`."""
+    uid = models.CharField(
+        max_length=255,
+        verbose_name="UID del evento"
+    )
+    titulo = models.CharField(
+        max_length=255,
+        verbose_name="Título"
+    )
+    descripcion = models.TextField(
+        blank=True,
+        verbose_name="Descripción"
+    )
+    inicio = models.DateTimeField(
+        db_index=True,
+        verbose_name="Inicio"
+    )
+    fin = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Fin"
+    )
+    todo_el_dia = models.BooleanField(
+        default=False,
+        verbose_name="Todo el día"
+    )
+
+    class Meta:
+        verbose_name = "Cita"
+        verbose_name_plural = "Citas"
+        ordering = ['inicio']
+        constraints = [
+            models.UniqueConstraint(fields=['uid', 'inicio'], name='cita_uid_inicio_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.titulo} ({self.inicio:%d/%m/%Y %H:%M})"
+
+
+class SincronizacionCalendario(models.Model):
+    """Estado de la última descarga del calendario ICS (una sola fila)."""
+    etag = models.CharField(max_length=255, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+    ultima_consulta = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Última consulta a Google"
+    )
+    ultima_actualizacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Última vez que cambiaron los eventos"
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Último error"
+    )
+
+    class Meta:
+        verbose_name = "Sincronización del calendario"
+        verbose_name_plural = "Sincronización del calendario"
+
+    def __str__(self):
+        return f"Sincronización ({self.ultima_consulta or 'nunca'})"
+
+    @classmethod
+    def obtener(cls):
+        estado, _ = cls.objects.get_or_create(pk=1)
+        return estado
@@ -0,0 +1,92 @@
+# citas/sincronizacion.py
+"""
+Descarga del calendario de Google a la tabla local `Cita`.
+
+La vista de citas solo lee la base de datos; este módulo lo ejecuta el comando
+`python manage.py sincronizar_citas` (tarea programada o `--cada N` en segundo plano).
+Se usan ETag / Last-Modified para que Google responda 304 si nada cambió, y solo
+se guardan los eventos (y ocurrencias de eventos recurrentes) dentro de la ventana
+CITAS_SINCRONIZAR_DIAS_ATRAS / CITAS_SINCRONIZAR_DIAS_ADELANTE.
+"""
+
+from datetime import timedelta
+import logging
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .ics import extraer_eventos, lineas_de_bytes
+from .models import Cita, SincronizacionCalendario
+
+logger = logging.getLogger(__name__)
+
+SIN_CAMBIOS = 'sin_cambios'
+ACTUALIZADO = 'actualizado'
+ERROR = 'error'
+
+
+def guardar_eventos(eventos):
+    """Reemplaza todas las citas locales por `eventos` en una sola transacción."""
+    vistos = set()
+    citas = []
+    for evento in eventos:
+        clave = (evento['uid'], evento['inicio'])
+        if clave in vistos:
+            continue
+        vistos.add(clave)
+        citas.append(Cita(**evento))
+    with transaction.atomic():
+        Cita.objects.all().delete()
+        Cita.objects.bulk_create(citas, batch_size=500)
+    return len(citas)
+
+
+def ventana_de_sincronizacion(ahora=None):
+    """Rango de fechas que se guarda localmente (el que puede pedir la lista de citas)."""
+    ahora = timezone.localtime(ahora)
+    desde = ahora.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
+        days=settings.CITAS_SINCRONIZAR_DIAS_ATRAS
+    )
+    hasta = ahora + timedelta(days=settings.CITAS_SINCRONIZAR_DIAS_ADELANTE)
+    return desde, hasta
+
+
+def sincronizar_calendario(url=None, timeout=None):
+    """Consulta el ICS y actualiza las citas si cambió. Devuelve SIN_CAMBIOS, ACTUALIZADO o ERROR."""
+    url = url or settings.CITAS_ICS_URL
+    timeout = timeout or settings.CITAS_ICS_TIMEOUT
+    estado = SincronizacionCalendario.obtener()
+
+    cabeceras = {}
+    if estado.etag:
+        cabeceras['If-None-Match'] = estado.etag
+    if estado.last_modified:
+        cabeceras['If-Modified-Since'] = estado.last_modified
+
+    try:
+        response = requests.get(url, headers=cabeceras, timeout=timeout, stream=True)
+        if response.status_code == 304:
+            resultado = SIN_CAMBIOS
+        else:
+            response.raise_for_status()
+            desde, hasta = ventana_de_sincronizacion()
+            # Se procesa línea a línea mientras se descarga, sin cargar el calendario entero
+            total = guardar_eventos(extraer_eventos(
+                lineas_de_bytes(response.iter_content(64 * 1024)), desde, hasta
+            ))
+            logger.info(f"Calendario sincronizado: {total} eventos")
+            estado.etag = response.headers.get('ETag', '')
+            estado.last_modified = response.headers.get('Last-Modified', '')
+            estado.ultima_actualizacion = timezone.now()
+            resultado = ACTUALIZADO
+        estado.error = ''
+    except Exception as e:
+        logger.error(f"Error al sincronizar el calendario: {e}")
+        estado.error = str(e)
+        resultado = ERROR
+
+    estado.ultima_consulta = timezone.now()
+    estado.save()
+    return resultado
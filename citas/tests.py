@@ -1,3 +1,217 @@
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .ics import extraer_eventos, lineas_de_bytes
+from .models import Cita, SincronizacionCalendario
+from .sincronizacion import sincronizar_calendario, ACTUALIZADO, SIN_CAMBIOS, ERROR
+
+
+def ics_de_prueba(eventos):
+    lineas = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//pruebas//ES']
+    for uid, inicio, titulo in eventos:
+        lineas += [
+            'BEGIN:VEVENT',
+            f'UID:{uid}',
+            f'DTSTART:{inicio:%Y%m%dT%H%M%SZ}',
+            f'DTEND:{inicio + timedelta(hours=1):%Y%m%dT%H%M%SZ}',
+            f'SUMMARY:{titulo}',
+            'END:VEVENT',
+        ]
+    lineas.append('END:VCALENDAR')
+    return '\r\n'.join(lineas).encode()
+
+
+class ServidorICS:
+    """Servidor HTTP local que sirve un .ics con ETag, como Google Calendar."""
+
+    def __init__(self):
+        self.contenido = b''
+        self.etag = '"v1"'
+        self.peticiones = []
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor.peticiones.append(dict(self.headers))
+                if self.path == '/falla.ics':
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == servidor.etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/calendar')
+                self.send_header('ETag', servidor.etag)
+                self.end_headers()
+                self.wfile.write(servidor.contenido)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}/basic.ics'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SincronizacionCitasTest(TestCase):
+    def setUp(self):
+        self.servidor = ServidorICS()
+        self.addCleanup(self.servidor.cerrar)
+        self.ahora = timezone.now().replace(microsecond=0)
+        self.servidor.contenido = ics_de_prueba([
+            ('a@test', self.ahora, 'Consulta dental'),
+            ('b@test', self.ahora + timedelta(days=3), 'Control'),
+        ])
+
+    def test_descarga_y_guarda_eventos(self):
+        self.assertEqual(sincronizar_calendario(url=self.servidor.url), ACTUALIZADO)
+        self.assertEqual(Cita.objects.count(), 2)
+        self.assertEqual(SincronizacionCalendario.obtener().etag, '"v1"')
+
+    def test_etag_evita_volver_a_procesar(self):
+        sincronizar_calendario(url=self.servidor.url)
+        self.assertEqual(sincronizar_calendario(url=self.servidor.url), SIN_CAMBIOS)
+        self.assertEqual(self.servidor.peticiones[-1].get('If-None-Match'), '"v1"')
+
+    def test_eventos_eliminados_desaparecen(self):
+        sincronizar_calendario(url=self.servidor.url)
+        self.servidor.etag = '"v2"'
+        self.servidor.contenido = ics_de_prueba([('a@test', self.ahora, 'Consulta dental')])
+        sincronizar_calendario(url=self.servidor.url)
+        self.assertEqual(list(Cita.objects.values_list('uid', flat=True)), ['a@test'])
+
+    def test_error_conserva_las_citas_anteriores(self):
+        sincronizar_calendario(url=self.servidor.url)
+        url_falla = self.servidor.url.replace('basic.ics', 'falla.ics')
+        self.assertEqual(sincronizar_calendario(url=url_falla), ERROR)
+        self.assertEqual(Cita.objects.count(), 2)
+        self.assertTrue(SincronizacionCalendario.obtener().error)
+
+    def test_la_vista_solo_lee_la_base_de_datos(self):
+        sincronizar_calendario(url=self.servidor.url)
+        peticiones = len(self.servidor.peticiones)
+        response = self.client.get(reverse('citas:eventos_ics') + '?filtro=rango&dias=7&pasado=1')
+        self.assertEqual(len(self.servidor.peticiones), peticiones)
+        self.assertEqual(len(response.context['citas_hoy']), 1)
+        self.assertEqual(len(response.context['eventos']), 2)
+        self.assertContains(response, 'Última sincronización')
+
+
+class ExtraerEventosTest(TestCase):
+    ICS = """BEGIN:VCALENDAR
+VERSION:2.0
+BEGIN:VTIMEZONE
+TZID:America/Lima
+END:VTIMEZONE
+BEGIN:VEVENT
+UID:antiguo@test
+DTSTART:20150105T150000Z
+SUMMARY:Evento de hace años
+END:VEVENT
+BEGIN:VEVENT
+UID:simple@test
+DTSTART;TZID=America/Lima:20250310T090000
+DTEND;TZID=America/Lima:20250310T100000
+SUMMARY:Consulta
+  dental
+END:VEVENT
+BEGIN:VEVENT
+UID:semanal@test
+DTSTART;TZID=America/Lima:20250101T160000
+DTEND;TZID=America/Lima:20250101T163000
+RRULE:FREQ=WEEKLY;UNTIL=20250402T210000Z
+EXDATE;TZID=America/Lima:20250312T160000
+SUMMARY:Ortodoncia
+END:VEVENT
+BEGIN:VEVENT
+UID:semanal@test
+RECURRENCE-ID;TZID=America/Lima:20250319T160000
+DTSTART;TZID=America/Lima:20250320T110000
+DTEND;TZID=America/Lima:20250320T113000
+SUMMARY:Ortodoncia (movida)
+END:VEVENT
+BEGIN:VEVENT
+UID:cumple@test
+DTSTART;VALUE=DATE:20000315
+RRULE:FREQ=YEARLY
+SUMMARY:Cumpleaños
+END:VEVENT
+END:VCALENDAR
+"""
+
+    def extraer(self):
+        zona = timezone.get_current_timezone()
+        desde = timezone.make_aware(timezone.datetime(2025, 3, 1), zona)
+        hasta = timezone.make_aware(timezone.datetime(2025, 3, 31, 23, 59), zona)
+        return extraer_eventos(self.ICS.splitlines(), desde, hasta)
+
+    def test_solo_eventos_de_la_ventana_con_recurrencias(self):
+        eventos = [(e['titulo'], timezone.localtime(e['inicio']).strftime('%d %H:%M')) for e in self.extraer()]
+        self.assertEqual(eventos, [
+            ('Ortodoncia', '05 16:00'),
+            ('Consulta dental', '10 09:00'),
+            ('Cumpleaños', '15 00:00'),
+            ('Ortodoncia (movida)', '20 11:00'),
+            ('Ortodoncia', '26 16:00'),
+        ])
+
+    def test_duracion_y_todo_el_dia(self):
+        eventos = {e['titulo']: e for e in self.extraer()}
+        self.assertEqual(eventos['Consulta dental']['fin'] - eventos['Consulta dental']['inicio'], timedelta(hours=1))
+        self.assertTrue(eventos['Cumpleaños']['todo_el_dia'])
+
+    def test_recurrencia_en_la_zona_del_evento_con_cambio_de_horario(self):
+        # Serie semanal a las 10:00 de Nueva York: el 9 de marzo empieza el horario
+        # de verano allá, así que en Lima pasa de las 10:00 a las 09:00
+        ics = (
+            'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:nueva-york@test\r\n'
+            'DTSTART;TZID=America/New_York:20250303T100000\r\n'
+            'DTEND;TZID=America/New_York:20250303T110000\r\n'
+            'RRULE:FREQ=WEEKLY;UNTIL=20250317T140000Z\r\n'
+            'SUMMARY:Videollamada\r\nEND:VEVENT\r\nEND:VCALENDAR\r\n'
+        )
+        zona = timezone.get_current_timezone()
+        desde = timezone.make_aware(timezone.datetime(2025, 3, 1), zona)
+        hasta = timezone.make_aware(timezone.datetime(2025, 3, 31, 23, 59), zona)
+        eventos = extraer_eventos(ics.splitlines(), desde, hasta)
+        self.assertEqual(
+            [timezone.localtime(e['inicio']).strftime('%d %H:%M') for e in eventos],
+            ['03 10:00', '10 09:00', '17 09:00'],
+        )
+
+
+class LineasPlegadasTest(TestCase):
+    # SUMMARY plegado en medio de la "ó" (0xC3 0xB3) y de la palabra "dental"
+    ICS = (
+        b'BEGIN:VCALENDAR\r\nBEGIN:VEVENT\r\nUID:plegado@test\r\n'
+        b'DTSTART:20250310T140000Z\r\n'
+        b'SUMMARY:Extracci\xc3\r\n \xb3n y consulta\r\n  den\r\n tal\r\n'
+        b'END:VEVENT\r\nEND:VCALENDAR\r\n'
+    )
+
+    def titulos(self, trozos):
+        zona = timezone.get_current_timezone()
+        desde = timezone.make_aware(timezone.datetime(2025, 3, 1), zona)
+        hasta = timezone.make_aware(timezone.datetime(2025, 3, 31), zona)
+        return [e['titulo'] for e in extraer_eventos(lineas_de_bytes(trozos), desde, hasta)]
+
+    def test_letra_multibyte_cortada_por_el_plegado(self):
+        self.assertEqual(self.titulos([self.ICS]), ['Extracción y consulta dental'])
 
-# Create your tests here.
+    def test_trozo_que_termina_entre_cr_y_lf(self):
+        corte = self.ICS.index(b'consulta\r\n') + len(b'consulta\r')
+        self.assertEqual(self.titulos([self.ICS[:corte], self.ICS[corte:]]), ['Extracción y consulta dental'])
+        # Trozos de un byte: cortes en todas partes
+        trozos = [self.ICS[i:i + 1] for i in range(len(self.ICS))]
+        self.assertEqual(self.titulos(trozos), ['Extracción y consulta dental'])
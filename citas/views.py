@@ -1,168 +1,104 @@
 from django.shortcuts import render
-import requests
-from icalendar import Calendar
 from django.utils import timezone
-from datetime import datetime, date, timedelta
-# import pytz  # Necesario para manejo avanzado de timezones
+from datetime import timedelta
 import logging
 
+from .models import Cita, SincronizacionCalendario
+
 logger = logging.getLogger(__name__)
 
 def calendario_view(request):
     return render(request, 'citas/calendario.html')
 
+
+def calcular_ventana(filtro, ahora, dias='30', pasado='7'):
+    """Devuelve (limite_pasado, limite_futuro) para el filtro de la lista de citas."""
+    if filtro == 'hoy':
+        limite_pasado = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+        limite_futuro = ahora.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    elif filtro == 'semana':
+        inicio_semana = ahora - timedelta(days=ahora.weekday())
+        fin_semana = inicio_semana + timedelta(days=6)
+        limite_pasado = inicio_semana.replace(hour=0, minute=0, second=0, microsecond=0)
+        limite_futuro = fin_semana.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+    elif filtro == 'mes':
+        primer_dia = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        if ahora.month == 12:
+            ultimo_dia = primer_dia.replace(year=ahora.year + 1, month=1) - timedelta(microseconds=1)
+        else:
+            ultimo_dia = primer_dia.replace(month=ahora.month + 1) - timedelta(microseconds=1)
+        limite_pasado = primer_dia
+        limite_futuro = ultimo_dia
+
+    elif filtro == 'proximo_mes':
+        if ahora.month == 12:
+            primer_dia = ahora.replace(year=ahora.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            primer_dia = ahora.replace(month=ahora.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        if primer_dia.month == 12:
+            ultimo_dia = primer_dia.replace(year=primer_dia.year + 1, month=1) - timedelta(microseconds=1)
+        else:
+            ultimo_dia = primer_dia.replace(month=primer_dia.month + 1) - timedelta(microseconds=1)
+        limite_pasado = primer_dia
+        limite_futuro = ultimo_dia
+
+    else:  # filtro == 'rango'
+        dias_futuro = min(max(int(dias), 1), 365)
+        dias_pasado = min(max(int(pasado), 0), 30)
+        limite_futuro = ahora + timedelta(days=dias_futuro)
+        limite_pasado = ahora - timedelta(days=dias_pasado)
+
+    return limite_pasado, limite_futuro
+
+
+def _en_hora_local(citas):
+    # El template agrupa por inicio.date: las fechas deben estar en hora de Perú
+    for cita in citas:
+        cita.inicio = timezone.localtime(cita.inicio)
+        if cita.fin:
+            cita.fin = timezone.localtime(cita.fin)
+    return citas
+
+
 def eventos_ics_view(request):
-    ics_url = "https://calendar.google.com/calendar/ical/juancarloscn%40gmail.com/private-7c3dfb4a8b649579159a76228916d6cf/basic.ics"
-    
+    # Solo lee las citas locales; la descarga de Google la hace `sincronizar_citas`
+    ahora = timezone.localtime()
+    manana = (ahora + timedelta(days=1)).date()
+    filtro = request.GET.get('filtro', 'mes')
+    sincronizacion = SincronizacionCalendario.objects.filter(pk=1).first()
+
     try:
-        response = requests.get(ics_url, timeout=10)
-        response.raise_for_status()
-        cal = Calendar.from_ical(response.content)
-        
-        eventos = []
-        citas_hoy = []
-        ahora = timezone.now()
-        hoy_peru = ahora.date()
-        # peru_tz = pytz.timezone('America/Lima')
-        
-        # Obtener el tipo de filtro desde la URL
-        filtro = request.GET.get('filtro', 'mes')
-
-        # Calcular límites según el filtro
-        # Calcular límites según el filtro
-        if filtro == 'hoy':
-            limite_pasado = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
-            limite_futuro = ahora.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-        elif filtro == 'semana':
-            inicio_semana = ahora - timedelta(days=ahora.weekday())
-            fin_semana = inicio_semana + timedelta(days=6)
-            limite_pasado = inicio_semana.replace(hour=0, minute=0, second=0, microsecond=0)
-            limite_futuro = fin_semana.replace(hour=23, minute=59, second=59, microsecond=999999)
-            
-        elif filtro == 'mes':
-            primer_dia = ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            if ahora.month == 12:
-                ultimo_dia = ahora.replace(year=ahora.year + 1, month=1, day=1) - timedelta(seconds=1)
-            else:
-                ultimo_dia = ahora.replace(month=ahora.month + 1, day=1) - timedelta(seconds=1)
-            limite_pasado = primer_dia
-            limite_futuro = ultimo_dia
-            
-        elif filtro == 'proximo_mes':
-            if ahora.month == 12:
-                primer_dia = ahora.replace(year=ahora.year + 1, month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                ultimo_dia = ahora.replace(year=ahora.year + 1, month=2, day=1) - timedelta(seconds=1)
-            else:
-                primer_dia = ahora.replace(month=ahora.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-                if ahora.month == 11:
-                    ultimo_dia = ahora.replace(month=12, day=31, hour=23, minute=59, second=59, microsecond=999999)
-                else:
-                    siguiente_mes = ahora.replace(month=ahora.month + 2, day=1) - timedelta(seconds=1)
-                    ultimo_dia = siguiente_mes
-            limite_pasado = primer_dia
-            limite_futuro = ultimo_dia
-            
-        else:  # filtro == 'rango'
-            dias_futuro = int(request.GET.get('dias', 30))
-            dias_pasado = int(request.GET.get('pasado', 7))
-            dias_futuro = min(max(dias_futuro, 1), 365)
-            dias_pasado = min(max(dias_pasado, 0), 30)
-            limite_futuro = ahora + timedelta(days=dias_futuro)
-            limite_pasado = ahora - timedelta(days=dias_pasado)
-        
-        # Procesar todos los eventos del calendario
-        # Procesar todos los eventos del calendario
-        # Procesar eventos
-        # Reemplaza la sección de procesamiento de eventos por esta:
-
-        for componente in cal.walk():
-            if componente.name == "VEVENT":
-                try:
-                    inicio = componente.get('dtstart').dt
-                    if not inicio:
-                        continue
-                    
-                    # Caso 1: Fecha simple (evento de todo el día)
-                    if isinstance(inicio, date) and not isinstance(inicio, datetime):
-                        # Usar la fecha directamente para eventos de todo el día
-                        inicio_peru_date = inicio
-                        # Crear datetime en la zona horaria de Perú
-                        inicio_peru = timezone.datetime.combine(inicio, timezone.datetime.min.time())
-                        inicio_peru = timezone.make_aware(inicio_peru, timezone.get_current_timezone())
-                    else:
-                        # Caso 2: Datetime
-                        if timezone.is_naive(inicio):
-                            # Google Calendar ICS envía en UTC, pero asumimos que es Perú
-                            # (solución práctica para evitar pytz)
-                            inicio_peru = timezone.make_aware(inicio, timezone.get_current_timezone())
-                        else:
-                            # Ya tiene timezone, convertir a Perú
-                            inicio_peru = inicio.astimezone(timezone.get_current_timezone())
-                        inicio_peru_date = inicio_peru.date()
-                    
-                    # Procesar fecha de fin (similar)
-                    fin_peru = None
-                    if componente.get('dtend'):
-                        fin = componente.get('dtend').dt
-                        if fin:
-                            if isinstance(fin, date) and not isinstance(fin, datetime):
-                                fin_peru = timezone.datetime.combine(fin, timezone.datetime.min.time())
-                                fin_peru = timezone.make_aware(fin_peru, timezone.get_current_timezone())
-                            else:
-                                if timezone.is_naive(fin):
-                                    fin_peru = timezone.make_aware(fin, timezone.get_current_timezone())
-                                else:
-                                    fin_peru = fin.astimezone(timezone.get_current_timezone())
-                    
-                    # Comparar fechas en Perú
-                    if inicio_peru_date == hoy_peru:
-                        citas_hoy.append({
-                            'titulo': str(componente.get('summary', 'Sin título')),
-                            'inicio': inicio_peru,
-                            'fin': fin_peru,
-                            'descripcion': str(componente.get('description', '')),
-                            'uid': str(componente.get('uid', ''))
-                        })
-                    
-                    # Para filtros
-                    if limite_pasado <= inicio_peru <= limite_futuro:
-                        eventos.append({
-                            'titulo': str(componente.get('summary', 'Sin título')),
-                            'inicio': inicio_peru,
-                            'fin': fin_peru,
-                            'descripcion': str(componente.get('description', '')),
-                            'uid': str(componente.get('uid', ''))
-                        })
-                        
-                except Exception as e:
-                    logger.warning(f"Error al procesar evento: {e}")
-                    continue
-        
-        # Ordenar
-        eventos.sort(key=lambda x: x['inicio'], reverse=True)
-        citas_hoy.sort(key=lambda x: x['inicio'])
-        
-        manana = (ahora + timedelta(days=1)).date()
-        
-        return render(request, 'citas/eventos_ics.html', {
-            'eventos': eventos, 
-            'citas_hoy': citas_hoy,
-            'error': None,
-            'filtro_activo': filtro,
-            'ahora': ahora,
-            'manana': manana
-        })
-        
-    except Exception as e:
-        logger.error(f"Error general: {e}")
-        ahora_error = timezone.now()
-        manana_error = (ahora_error + timedelta(days=1)).date()
-        return render(request, 'citas/eventos_ics.html', {
-            'eventos': [], 
-            'citas_hoy': [],
-            'error': 'Error al procesar el calendario',
-            'filtro_activo': request.GET.get('filtro', 'mes'),
-            'ahora': ahora_error,
-            'manana': manana_error
-        })
\ No newline at end of file
+        limite_pasado, limite_futuro = calcular_ventana(
+            filtro, ahora,
+            dias=request.GET.get('dias', 30),
+            pasado=request.GET.get('pasado', 7),
+        )
+    except ValueError as e:
+        logger.warning(f"Filtro de citas inválido: {e}")
+        filtro = 'mes'
+        limite_pasado, limite_futuro = calcular_ventana(filtro, ahora)
+
+    inicio_hoy = ahora.replace(hour=0, minute=0, second=0, microsecond=0)
+    citas_hoy = _en_hora_local(list(
+        Cita.objects.filter(inicio__gte=inicio_hoy, inicio__lt=inicio_hoy + timedelta(days=1))
+        .order_by('inicio')
+    ))
+    eventos = _en_hora_local(list(
+        Cita.objects.filter(inicio__range=(limite_pasado, limite_futuro)).order_by('-inicio')
+    ))
+
+    error = None
+    if sincronizacion is None or sincronizacion.ultima_actualizacion is None:
+        error = 'El calendario aún no se ha sincronizado'
+
+    return render(request, 'citas/eventos_ics.html', {
+        'eventos': eventos,
+        'citas_hoy': citas_hoy,
+        'error': error,
+        'filtro_activo': filtro,
+        'ahora': ahora,
+        'manana': manana,
+        'sincronizacion': sincronizacion,
+    })
@@ -0,0 +1,95 @@
+# consultorio_dental/almacenamiento.py
+"""
+Almacenamiento de imágenes direccionado por contenido.
+
+Cada archivo se guarda una sola vez, con el SHA-256 de su contenido como nombre,
+en una carpeta común para historias y notas (se ignora la carpeta de upload_to):
+
+    imagenes/3f/3f2a...c9.jpg
+    imagenes/3f/derivadas/3f2a...c9_jpg_miniatura.webp
+
+Si la misma imagen se adjunta a varias notas o entradas, todas las filas apuntan
+al mismo archivo. Las filas que lo usan son su contador de referencias: el archivo
+(y sus derivadas) solo se borra cuando se elimina la última fila que lo referencia.
+
+Para deduplicar los archivos subidos antes de esto:
+`python manage.py deduplicar_imagenes`.
+"""
+
+import hashlib
+import logging
+import posixpath
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
+from django.utils.deconstruct import deconstructible
+
+from .imagenes import CARPETA_DERIVADAS, eliminar_derivadas
+
+logger = logging.getLogger(__name__)
+
+CARPETA = 'imagenes'
+
+
+def digest_de(contenido):
+    """SHA-256 del archivo, leído por bloques."""
+    sha = hashlib.sha256()
+    for bloque in contenido.chunks():
+        sha.update(bloque)
+    contenido.seek(0)
+    return sha.hexdigest()
+
+
+def nombre_por_contenido(nombre, digest):
+    extension = posixpath.splitext(nombre)[1].lower()
+    # Subcarpeta con los dos primeros caracteres: evita miles de archivos en un directorio
+    return posixpath.join(CARPETA, digest[:2], f'{digest}{extension}')
+
+
+@deconstructible
+class AlmacenamientoDeduplicado(FileSystemStorage):
+    """FileSystemStorage que guarda cada contenido una sola vez bajo su hash."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        # Las derivadas ya se nombran a partir del original: se guardan tal cual
+        if posixpath.basename(posixpath.dirname(name)) == CARPETA_DERIVADAS:
+            return super().save(name, content, max_length=max_length)
+
+        name = nombre_por_contenido(name, digest_de(content))
+        if self.exists(name):
+            logger.info(f"Imagen repetida: se reutiliza {name}")
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def campos_que_lo_usan(self):
+        """(modelo, campo) de todos los FileField que guardan en este almacenamiento."""
+        for modelo in apps.get_models():
+            for campo in modelo._meta.get_fields():
+                if isinstance(campo, models.FileField) and campo.storage is self:
+                    yield modelo, campo
+
+    def referencias(self, name):
+        """Número de filas que apuntan a `name`."""
+        return sum(
+            modelo._default_manager.filter(**{campo.name: name}).count()
+            for modelo, campo in self.campos_que_lo_usan()
+        )
+
+    def liberar(self, name):
+        """Borra `name` y sus derivadas si ya ninguna fila lo usa (al confirmar la transacción)."""
+        def borrar_si_huerfano():
+            # Contar y borrar con el turno de escritura tomado: una subida que reutiliza
+            # el archivo (ImagenConDerivadasMixin.save) guarda archivo y fila en su propia
+            # transacción, así que termina antes de este conteo o empieza después del borrado
+            with transaction.atomic():
+                if self.referencias(name) == 0 and self.exists(name):
+                    self.delete(name)
+                    eliminar_derivadas(name, self)
+                    logger.info(f"Imagen sin referencias eliminada: {name}")
+        transaction.on_commit(borrar_si_huerfano)
+
+
+almacenamiento_imagenes = AlmacenamientoDeduplicado()
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+class ConsultorioDentalConfig(AppConfig):
+    name = 'consultorio_dental'
+    verbose_name = 'Consultorio dental'
+
+    def ready(self):
+        from . import estaticos  # noqa: F401  (registra el chequeo de {% static %})
+        from . import signals  # noqa: F401  (índice de búsqueda clínica)
+
+        from django.conf import settings
+        if settings.PRECOMPILAR_PLANTILLAS:
+            from .plantillas import precompilar_plantillas
+            precompilar_plantillas()
@@ -0,0 +1,214 @@
+# consultorio_dental/busqueda.py
+"""
+Búsqueda clínica en todo el consultorio: historias, notas, tratamientos y pagos.
+
+En SQLite el texto se indexa en una sola tabla virtual FTS5 (`busqueda_clinica`)
+con el tokenizador `unicode61 remove_diacritics 2`: ignora tildes y mayúsculas,
+así "endodoncia molar" encuentra "Endodóncia del Molar". SQLite no trae un
+lematizador para español; en su lugar cada palabra se busca como prefijo
+("implant" encuentra "implante" e "implantes"). Los números se buscan
+exactos: "36" es la pieza 36, no la 360.
+
+Cada documento usa como rowid `id * 4 + tipo`, así se actualiza o borra por
+clave sin recorrer la tabla. El índice se mantiene con las señales de
+`consultorio_dental.signals` y se puede regenerar con
+`python manage.py reconstruir_busqueda_clinica`.
+"""
+
+import re
+from itertools import groupby
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from historias.models import EntradaHistoria
+from notas.models import Nota
+from pacientes.models import Paciente
+from tratamientos.models import Pago, Tratamiento
+
+TABLA = 'busqueda_clinica'
+
+ENTRADA, NOTA, TRATAMIENTO, PAGO = range(4)
+# Modelo, nombre para mostrar y campo de fecha de cada tipo de documento
+TIPOS = {
+    ENTRADA: (EntradaHistoria, 'Historia clínica', 'fecha'),
+    NOTA: (Nota, 'Nota', 'creado_en'),
+    TRATAMIENTO: (Tratamiento, 'Tratamiento', 'fecha_inicio'),
+    PAGO: (Pago, 'Pago', 'fecha_pago'),
+}
+CODIGO_DE_MODELO = {modelo: codigo for codigo, (modelo, _, _) in TIPOS.items()}
+
+# Marcas de las coincidencias: caracteres de control que no aparecen en el texto,
+# se cambian por <mark> después de escapar el HTML
+_INICIO, _FIN = '\x02', '\x03'
+
+# Mismo contenido que _documento(), en SQL, para llenar el índice de una vez
+SQL_DOCUMENTOS = [
+    f"SELECT id * 4 + {ENTRADA}, motivo, diagnostico || char(10) || notas || char(10) || evolucion, paciente_id "
+    f"FROM {EntradaHistoria._meta.db_table}",
+    f"SELECT id * 4 + {NOTA}, titulo, contenido, paciente_id FROM {Nota._meta.db_table}",
+    f"SELECT id * 4 + {TRATAMIENTO}, nombre, descripcion, paciente_id FROM {Tratamiento._meta.db_table}",
+    f"SELECT p.id * 4 + {PAGO}, '', p.nota, t.paciente_id "
+    f"FROM {Pago._meta.db_table} p JOIN {Tratamiento._meta.db_table} t ON t.id = p.tratamiento_id "
+    f"WHERE p.nota != ''",
+]
+
+
+def usa_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(objeto):
+    return objeto.pk * 4 + CODIGO_DE_MODELO[type(objeto)]
+
+
+def _documento(objeto):
+    """(título, contenido, paciente_id) que se indexan de `objeto`; None si no hay nada que buscar."""
+    if isinstance(objeto, EntradaHistoria):
+        return objeto.motivo, '\n'.join((objeto.diagnostico, objeto.notas, objeto.evolucion)), objeto.paciente_id
+    if isinstance(objeto, Nota):
+        return objeto.titulo, objeto.contenido, objeto.paciente_id
+    if isinstance(objeto, Tratamiento):
+        return objeto.nombre, objeto.descripcion, objeto.paciente_id
+    if objeto.nota:
+        return '', objeto.nota, objeto.tratamiento.paciente_id
+    return None
+
+
+def indexar(objeto):
+    if not usa_fts():
+        return
+    documento = _documento(objeto)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [_rowid(objeto)])
+        if documento is not None:
+            cursor.execute(
+                f"INSERT INTO {TABLA}(rowid, titulo, contenido, paciente_id) VALUES (%s, %s, %s, %s)",
+                [_rowid(objeto), *documento],
+            )
+
+
+def desindexar(objeto):
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [_rowid(objeto)])
+
+
+def reconstruir_indice():
+    """Vacía y vuelve a llenar el índice. Devuelve el número de documentos indexados."""
+    if not usa_fts():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA}")
+        for consulta in SQL_DOCUMENTOS:
+            cursor.execute(f"INSERT INTO {TABLA}(rowid, titulo, contenido, paciente_id) {consulta}")
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLA}")
+        return cursor.fetchone()[0]
+
+
+def _expresion_fts(texto):
+    # Cada palabra entre comillas (el usuario no escribe sintaxis FTS); prefijo salvo los números
+    palabras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{p}"' if p.isdigit() else f'"{p}"*' for p in palabras)
+
+
+def _resaltar(texto):
+    return mark_safe(escape(texto).replace(_INICIO, '<mark>').replace(_FIN, '</mark>'))
+
+
+def _coincidencias_fts(texto, limite):
+    expresion = _expresion_fts(texto)
+    if not expresion:
+        return []
+    with connection.cursor() as cursor:
+        # bm25 con más peso para el título que para el contenido
+        cursor.execute(
+            f"SELECT rowid, paciente_id, "
+            f"highlight({TABLA}, 0, %s, %s), snippet({TABLA}, 1, %s, %s, '…', 16) "
+            f"FROM {TABLA} WHERE {TABLA} MATCH %s "
+            f"ORDER BY bm25({TABLA}, 4.0, 1.0) LIMIT %s",
+            [_INICIO, _FIN, _INICIO, _FIN, expresion, limite],
+        )
+        return [
+            (rowid % 4, rowid // 4, paciente_id, titulo, fragmento)
+            for rowid, paciente_id, titulo, fragmento in cursor.fetchall()
+        ]
+
+
+def _coincidencias_sin_fts(texto, limite):
+    # Sin FTS (otra base de datos): icontains por palabra, sin orden por relevancia
+    palabras = re.findall(r'\w+', texto)
+    if not palabras:
+        return []
+    campos = {
+        ENTRADA: (['motivo', 'diagnostico', 'notas', 'evolucion'], 'paciente_id'),
+        NOTA: (['titulo', 'contenido'], 'paciente_id'),
+        TRATAMIENTO: (['nombre', 'descripcion'], 'paciente_id'),
+        PAGO: (['nota'], 'tratamiento__paciente_id'),
+    }
+    coincidencias = []
+    for codigo, (nombres, paciente) in campos.items():
+        filtro = Q()
+        for palabra in palabras:
+            alguna = Q()
+            for nombre in nombres:
+                alguna |= Q(**{f'{nombre}__icontains': palabra})
+            filtro &= alguna
+        modelo = TIPOS[codigo][0]
+        for pk, paciente_id, titulo, contenido in modelo.objects.filter(filtro).values_list(
+            'pk', paciente, nombres[0], nombres[-1]
+        )[:limite]:
+            titulo = '' if codigo == PAGO else titulo
+            coincidencias.append((codigo, pk, paciente_id, titulo, contenido[:200]))
+    return coincidencias[:limite]
+
+
+def buscar_en_historial(texto, limite=100):
+    """
+    Busca `texto` en historias, notas, tratamientos y notas de pagos. Devuelve
+    los resultados agrupados por paciente, el grupo con la mejor coincidencia
+    primero:
+
+        [{'paciente': Paciente o None,
+          'resultados': [{'tipo', 'objeto', 'fecha', 'url', 'titulo', 'fragmento'}, ...]}, ...]
+
+    `titulo` y `fragmento` son HTML seguro con las coincidencias en <mark>.
+    """
+    texto = texto.strip()
+    if usa_fts():
+        coincidencias = _coincidencias_fts(texto, limite)
+    else:
+        coincidencias = _coincidencias_sin_fts(texto, limite)
+
+    # Una consulta por tipo para los objetos y una para los pacientes
+    objetos = {}
+    for codigo, grupo in groupby(sorted(coincidencias, key=lambda c: c[0]), key=lambda c: c[0]):
+        modelo = TIPOS[codigo][0]
+        consulta = modelo.objects.select_related('tratamiento') if modelo is Pago else modelo.objects
+        objetos[codigo] = consulta.in_bulk([c[1] for c in grupo])
+    pacientes = Paciente.objects.only('pk', 'nombre_completo', 'dni').in_bulk(
+        {c[2] for c in coincidencias if c[2] is not None}
+    )
+
+    grupos = {}
+    for codigo, pk, paciente_id, titulo, fragmento in coincidencias:
+        objeto = objetos[codigo].get(pk)
+        if objeto is None:
+            continue  # borrado después de indexar
+        grupo = grupos.setdefault(paciente_id, {'paciente': pacientes.get(paciente_id), 'resultados': []})
+        _, tipo, campo_fecha = TIPOS[codigo]
+        grupo['resultados'].append({
+            'tipo': tipo,
+            'objeto': objeto,
+            'fecha': getattr(objeto, campo_fecha),
+            # Los pagos no tienen página propia: se ven en su tratamiento
+            'url': (objeto.tratamiento if codigo == PAGO else objeto).get_absolute_url(),
+            'titulo': _resaltar(titulo) if titulo else '',
+            'fragmento': _resaltar(fragmento),
+        })
+    # dict conserva el orden de inserción: el de la mejor coincidencia de cada paciente
+    return list(grupos.values())
@@ -0,0 +1,100 @@
+# consultorio_dental/cache_paginas.py
+"""
+Caché de páginas completas con invalidación por versiones.
+
+Cada página cacheada declara de qué depende: una lista global ('pacientes',
+'tratamientos', 'pagos') o un paciente (`dependencia_paciente(pk)`). Cada
+dependencia tiene un número de versión en la caché, y la clave de la página
+incluye esas versiones además de la URL (con la consulta), el usuario y el día
+(la edad y los cumpleaños cambian a medianoche).
+
+Al guardar o borrar un modelo, `consultorio_dental.signals` llama a `invalidar()`
+con las dependencias que ese cambio afecta: un pago nuevo invalida la ficha de
+su paciente, la lista de pagos y la de tratamientos (que muestra saldos), pero
+no la ficha de los demás pacientes ni la lista de pacientes. Invalidar es
+borrar la versión; al volver a leerla se crea una nueva (la hora en
+nanosegundos), así las páginas viejas quedan inalcanzables y caducan solas.
+
+Con varios procesos (workers) la caché debe ser compartida (FileBasedCache en
+settings.py): con LocMemCache cada proceso solo vería sus propias invalidaciones.
+"""
+
+import hashlib
+import time
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+
+PREFIJO_VERSION = 'version'
+PREFIJO_PAGINA = 'pagina'
+
+
+def dependencia_paciente(pk):
+    return f'paciente:{pk}'
+
+
+def invalidar(*dependencias):
+    cache.delete_many([f'{PREFIJO_VERSION}:{dependencia}' for dependencia in dependencias])
+
+
+def versiones(dependencias):
+    claves = [f'{PREFIJO_VERSION}:{dependencia}' for dependencia in dependencias]
+    actuales = cache.get_many(claves)
+    for clave in claves:
+        if clave not in actuales:
+            # add(): si otro proceso la creó recién, gana la suya
+            cache.add(clave, time.time_ns(), None)
+            actuales[clave] = cache.get(clave)
+    return [actuales[clave] for clave in claves]
+
+
+class CachePaginaMixin:
+    """
+    Para vistas GET: guarda la respuesta renderizada y la reutiliza mientras no
+    cambien sus dependencias (`get_dependencias_cache()`).
+
+    No se cachea si hay mensajes pendientes (se mostrarían otra vez), si la
+    página usó el token CSRF (es propio de la sesión) ni las respuestas que no
+    son 200 o son descargas en streaming.
+    """
+    cache_timeout = 600
+
+    def get_dependencias_cache(self):
+        raise NotImplementedError
+
+    def _clave_cache(self):
+        request = self.request
+        usuario = request.user.pk if request.user.is_authenticated else 0
+        partes = [
+            request.get_full_path(),
+            str(usuario),
+            timezone.localdate().isoformat(),
+            *map(str, versiones(self.get_dependencias_cache())),
+        ]
+        return f"{PREFIJO_PAGINA}:{hashlib.md5('|'.join(partes).encode()).hexdigest()}"
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+        clave = self._clave_cache()
+        guardada = cache.get(clave)
+        if guardada is not None:
+            contenido, tipo = guardada
+            return HttpResponse(contenido, content_type=tipo)
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or response.streaming:
+            return response
+
+        def guardar(response):
+            if not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                cache.set(clave, (response.content, response['Content-Type']), self.cache_timeout)
+
+        if hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(guardar)
+        else:
+            guardar(response)
+        return response
@@ -0,0 +1,222 @@
+# consultorio_dental/estaticos.py
+"""
+Archivos estáticos en producción.
+
+1. `AlmacenamientoEstaticoComprimido` (STORAGES['staticfiles'] con DEBUG=False):
+   `collectstatic` copia cada archivo con el hash de su contenido en el nombre
+   (css/custom.3f2a9c1b.css), escribe el manifiesto staticfiles.json y crea al lado
+   las versiones .gz y .br (paquete `brotli`, en requirements.txt).
+2. `ArchivosEstaticos` (envuelve la aplicación en wsgi.py): sirve STATIC_ROOT antes
+   de llegar a Django, eligiendo .br/.gz según Accept-Encoding. Los archivos con
+   hash van con `Cache-Control: immutable` de un año.
+3. `verificar_referencias_estaticas`: chequeo de `manage.py check --deploy` que
+   avisa si un `{% static '...' %}` de las plantillas no existe, y si falta
+   `brotli` (sin él `collectstatic` solo escribe las .gz).
+"""
+
+import gzip
+import json
+import mimetypes
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.checks import Error, Tags, Warning, register
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.utils.http import http_date
+
+from .plantillas import directorios_de_plantillas
+
+try:
+    import brotli
+except ImportError:  # sin él solo se generan las .gz; check --deploy lo avisa (W001)
+    brotli = None
+
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+# Si comprimir no ahorra al menos un 5 % no vale la pena guardar la variante
+AHORRO_MINIMO = 0.95
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, max-age=0, must-revalidate'
+
+
+def comprimir_variantes(ruta):
+    """Escribe `ruta`.gz (y .br si hay brotli). Devuelve las extensiones escritas."""
+    ruta = Path(ruta)
+    datos = ruta.read_bytes()
+    escritas = []
+    variantes = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variantes.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for extension, comprimir in variantes:
+        comprimido = comprimir(datos)
+        if len(comprimido) < len(datos) * AHORRO_MINIMO:
+            ruta.with_name(ruta.name + extension).write_bytes(comprimido)
+            escritas.append(extension)
+    return escritas
+
+
+class AlmacenamientoEstaticoComprimido(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además deja versiones .gz/.br de cada archivo con hash."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hasheados = set()
+        for original, hasheado, procesado in super().post_process(paths, dry_run, **options):
+            if isinstance(hasheado, str):
+                hasheados.add(hasheado)
+            yield original, hasheado, procesado
+        if dry_run:
+            return
+        for nombre in sorted(hasheados):
+            if Path(nombre).suffix.lower() in EXTENSIONES_COMPRIMIBLES:
+                comprimir_variantes(self.path(nombre))
+
+
+class ArchivosEstaticos:
+    """
+    Middleware WSGI que sirve STATIC_URL desde STATIC_ROOT sin pasar por Django.
+    Lo que no encuentra lo deja pasar a la aplicación.
+    """
+
+    def __init__(self, aplicacion, raiz=None, prefijo=None):
+        self.aplicacion = aplicacion
+        self.raiz = Path(raiz or settings.STATIC_ROOT).resolve()
+        self.prefijo = prefijo or settings.STATIC_URL
+        if not self.prefijo.startswith('/'):
+            self.prefijo = '/' + self.prefijo
+        self.hasheados = self._leer_manifiesto()
+
+    def _leer_manifiesto(self):
+        try:
+            with open(self.raiz / ManifestStaticFilesStorage.manifest_name) as archivo:
+                return set(json.load(archivo).get('paths', {}).values())
+        except (OSError, ValueError):
+            return set()
+
+    def _buscar(self, nombre):
+        try:
+            ruta = (self.raiz / nombre).resolve()
+            ruta.relative_to(self.raiz)
+        except (ValueError, OSError):
+            return None
+        return ruta if ruta.is_file() else None
+
+    def _variante(self, ruta, aceptadas):
+        for codificacion, extension in (('br', '.br'), ('gzip', '.gz')):
+            if codificacion in aceptadas:
+                comprimida = ruta.with_name(ruta.name + extension)
+                if comprimida.is_file():
+                    return comprimida, codificacion
+        return ruta, None
+
+    def __call__(self, environ, start_response):
+        ruta_url = environ.get('PATH_INFO', '')
+        if environ.get('REQUEST_METHOD') not in ('GET', 'HEAD') or not ruta_url.startswith(self.prefijo):
+            return self.aplicacion(environ, start_response)
+        nombre = ruta_url[len(self.prefijo):]
+        ruta = self._buscar(nombre)
+        if ruta is None:
+            return self.aplicacion(environ, start_response)
+
+        aceptadas = {
+            parte.split(';')[0].strip()
+            for parte in environ.get('HTTP_ACCEPT_ENCODING', '').split(',')
+        }
+        enviada, codificacion = self._variante(ruta, aceptadas)
+        estado = enviada.stat()
+        etag = f'"{estado.st_mtime_ns:x}-{estado.st_size:x}{"-" + codificacion if codificacion else ""}"'
+        tipo = mimetypes.guess_type(ruta.name)[0] or 'application/octet-stream'
+        if tipo.startswith('text/') or tipo in ('application/javascript', 'application/json'):
+            tipo += '; charset=utf-8'
+        cabeceras = [
+            ('Content-Type', tipo),
+            ('Cache-Control', CACHE_INMUTABLE if nombre in self.hasheados else CACHE_REVALIDAR),
+            ('ETag', etag),
+            ('Last-Modified', http_date(estado.st_mtime)),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if codificacion:
+            cabeceras.append(('Content-Encoding', codificacion))
+
+        if _coincide_etag(etag, environ.get('HTTP_IF_NONE_MATCH', '')):
+            start_response('304 Not Modified', cabeceras)
+            return []
+
+        cabeceras.append(('Content-Length', str(estado.st_size)))
+        start_response('200 OK', cabeceras)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        envoltorio = environ.get('wsgi.file_wrapper')
+        if envoltorio:
+            # uWSGI/gunicorn envían el archivo con sendfile
+            return envoltorio(open(enviada, 'rb'), 64 * 1024)
+        return _leer_por_bloques(enviada)
+
+
+def _coincide_etag(etag, if_none_match):
+    # Lista separada por comas; If-None-Match compara en forma débil (W/"..." vale igual)
+    for candidata in if_none_match.split(','):
+        candidata = candidata.strip()
+        if candidata == '*' or candidata.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def _leer_por_bloques(ruta):
+    with open(ruta, 'rb') as archivo:
+        while bloque := archivo.read(64 * 1024):
+            yield bloque
+
+
+_STATIC_LITERAL = re.compile(r"""{%\s*static\s+(['"])(?P<nombre>[^'"]+)\1""")
+
+
+def referencias_estaticas():
+    """(plantilla, nombre) de cada `{% static '...' %}` literal en las plantillas del proyecto."""
+    base = Path(settings.BASE_DIR).resolve()
+    for motor in engines.all():
+        if not isinstance(motor, DjangoTemplates):
+            continue
+        for carpeta in directorios_de_plantillas(motor.engine):
+            carpeta = Path(carpeta).resolve()
+            if (base not in carpeta.parents and carpeta != base) or 'site-packages' in carpeta.parts:
+                continue  # plantillas de Django u otros paquetes
+            for plantilla in carpeta.rglob('*.html'):
+                for coincidencia in _STATIC_LITERAL.finditer(plantilla.read_text(encoding='utf-8')):
+                    yield plantilla.relative_to(base), coincidencia['nombre']
+
+
+@register(Tags.staticfiles, deploy=True)
+def verificar_referencias_estaticas(app_configs, **kwargs):
+    errores = []
+    usa_manifiesto = isinstance(staticfiles_storage, ManifestStaticFilesStorage)
+    for plantilla, nombre in referencias_estaticas():
+        if not finders.find(nombre):
+            errores.append(Error(
+                f"{plantilla} usa {{% static '{nombre}' %}} pero ese archivo no existe.",
+                id='consultorio_dental.E001',
+            ))
+        elif usa_manifiesto:
+            try:
+                staticfiles_storage.stored_name(nombre)
+            except ValueError:
+                errores.append(Error(
+                    f"{plantilla} usa {{% static '{nombre}' %}} pero no está en el manifiesto.",
+                    hint="Ejecuta `python manage.py collectstatic` antes de publicar.",
+                    id='consultorio_dental.E002',
+                ))
+    return errores
+
+
+@register(Tags.staticfiles, deploy=True)
+def verificar_brotli(app_configs, **kwargs):
+    if brotli is not None or not isinstance(staticfiles_storage, AlmacenamientoEstaticoComprimido):
+        return []
+    return [Warning(
+        "El paquete brotli no está instalado: collectstatic no escribirá las versiones .br.",
+        hint="pip install -r requirements.txt",
+        id='consultorio_dental.W001',
+    )]
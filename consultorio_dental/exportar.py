@@ -0,0 +1,210 @@
+# consultorio_dental/exportar.py
+"""
+Descargas de listados en CSV y XLSX.
+
+La respuesta se genera fila por fila mientras se envía (StreamingHttpResponse):
+las filas salen de `values_list(...).iterator(chunk_size=...)`, sin crear
+instancias de los modelos ni tener el listado completo en memoria.
+
+- `ExportarMixin`: para una ListView, `?formato=csv` o `?formato=xlsx` descarga
+  todas las filas de `get_queryset()` (con los mismos filtros que la lista).
+- `python manage.py exportar pagos --formato xlsx --filtros "metodo=yape"`: lo
+  mismo a un archivo, para copias o para abrir en Excel.
+
+El XLSX se escribe a mano (es un ZIP con XML) para no depender de openpyxl.
+"""
+
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+FILAS_POR_LOTE = 2000
+
+# Caracteres de control que XML 1.0 no admite ni escapados (Excel no abre el libro)
+_CONTROL_NO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class _Eco:
+    """Archivo falso para csv.writer: devuelve la línea en vez de escribirla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor, zona):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        if valor.tzinfo is not None:
+            valor = valor.astimezone(zona)
+        return valor.strftime('%Y-%m-%d %H:%M')
+    return valor
+
+
+def filas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    # La zona horaria se busca una vez, no en cada celda
+    zona = timezone.get_current_timezone()
+    # BOM: Excel abre el archivo como UTF-8 (tildes y ñ)
+    yield '﻿' + escritor.writerow(encabezados)
+    # Se envía de a FILAS_POR_LOTE filas: menos trozos pequeños para el servidor
+    lote = []
+    for fila in filas:
+        lote.append(escritor.writerow([_texto(valor, zona) for valor in fila]))
+        if len(lote) == FILAS_POR_LOTE:
+            yield ''.join(lote)
+            lote.clear()
+    if lote:
+        yield ''.join(lote)
+
+
+# ----- XLSX -----
+
+_TIPOS_CONTENIDO = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+_RELACIONES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+_LIBRO = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{nombre}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+_RELACIONES_LIBRO = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+
+class _Tuberia:
+    """Destino del ZipFile: acumula lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self.pendiente = []
+
+    def write(self, datos):
+        self.pendiente.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.pendiente)
+        self.pendiente.clear()
+        return datos
+
+
+def _celda(valor, zona):
+    if isinstance(valor, bool):
+        return f'<c t="b"><v>{int(valor)}</v></c>'
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    if isinstance(valor, (date, datetime)):
+        valor = _texto(valor, zona) if isinstance(valor, datetime) else valor.isoformat()
+    if valor is None or valor == '':
+        return '<c/>'
+    texto = _CONTROL_NO_XML.sub('', str(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _fila_xml(valores, zona):
+    return '<row>' + ''.join(_celda(valor, zona) for valor in valores) + '</row>'
+
+
+def filas_xlsx(encabezados, filas, hoja='Datos'):
+    """Genera el archivo .xlsx por partes (bytes), una hoja con `encabezados` y `filas`."""
+    zona = timezone.get_current_timezone()
+    tuberia = _Tuberia()
+    with zipfile.ZipFile(tuberia, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+        libro.writestr('[Content_Types].xml', _TIPOS_CONTENIDO)
+        libro.writestr('_rels/.rels', _RELACIONES)
+        libro.writestr('xl/workbook.xml', _LIBRO.format(nombre=escape(hoja)))
+        libro.writestr('xl/_rels/workbook.xml.rels', _RELACIONES_LIBRO)
+        yield tuberia.vaciar()
+
+        with libro.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as hoja_xml:
+            hoja_xml.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja_xml.write(_fila_xml(encabezados, zona).encode())
+            lote = []
+            for numero, fila in enumerate(filas, 1):
+                lote.append(_fila_xml(fila, zona))
+                if numero % FILAS_POR_LOTE == 0:
+                    hoja_xml.write(''.join(lote).encode())
+                    lote.clear()
+                    yield tuberia.vaciar()
+            hoja_xml.write(''.join(lote).encode())
+            hoja_xml.write(b'</sheetData></worksheet>')
+    yield tuberia.vaciar()
+
+
+FORMATOS = {
+    'csv': (filas_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (filas_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+def respuesta_exportacion(formato, nombre_base, encabezados, filas):
+    generar, tipo = FORMATOS[formato]
+    response = StreamingHttpResponse(generar(encabezados, filas), content_type=tipo)
+    response['Content-Disposition'] = f'attachment; filename="{nombre_base}.{formato}"'
+    return response
+
+
+class ExportarMixin:
+    """
+    Para ListView: `?formato=csv|xlsx` devuelve el queryset completo como archivo.
+
+    - `columnas_exportacion`: lista de (campo para values_list, título de la columna).
+    - `nombre_exportacion`: nombre del archivo, sin fecha ni extensión.
+    """
+    columnas_exportacion = []
+    nombre_exportacion = 'exportacion'
+
+    def filas_exportacion(self):
+        campos = [campo for campo, _ in self.columnas_exportacion]
+        return self.get_queryset().values_list(*campos).iterator(chunk_size=FILAS_POR_LOTE)
+
+    def exportar(self, formato):
+        return respuesta_exportacion(
+            formato,
+            f'{self.nombre_exportacion}_{timezone.localdate():%Y-%m-%d}',
+            [titulo for _, titulo in self.columnas_exportacion],
+            self.filas_exportacion(),
+        )
+
+    def get(self, request, *args, **kwargs):
+        formato = request.GET.get('formato')
+        if formato in FORMATOS:
+            return self.exportar(formato)
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Enlaces de descarga con los filtros activos (sin la página actual)
+        urls = {}
+        for formato in FORMATOS:
+            parametros = self.request.GET.copy()
+            for parametro in ('page', 'cursor'):
+                parametros.pop(parametro, None)
+            parametros['formato'] = formato
+            urls[formato] = f'?{parametros.urlencode()}'
+        context['urls_exportacion'] = urls
+        return context
@@ -0,0 +1,239 @@
+# consultorio_dental/imagenes.py
+"""
+Versiones reducidas (derivadas) de las imágenes clínicas.
+
+Al subir una imagen se generan, junto al original, una miniatura y una versión
+mediana en WebP, ya rotadas según el EXIF y sin metadatos. Las páginas muestran
+estas versiones y enlazan al original solo al hacer clic.
+
+    historias/imagenes/radiografia.jpg
+    historias/imagenes/derivadas/radiografia_jpg_miniatura.webp
+    historias/imagenes/derivadas/radiografia_jpg_media.webp
+
+La extensión del original va en el nombre: `a.jpg` y `a.png` no comparten derivadas.
+
+Para imágenes subidas antes de esto: `python manage.py generar_derivadas`.
+
+Antes de eso, `ImagenOptimizadaField` (usado en los formularios de imágenes) reduce
+el propio original al subirlo: limita el lado mayor a IMAGENES_MAX_LADO, recomprime
+con IMAGENES_CALIDAD_JPEG y rechaza imágenes de más de IMAGENES_MAX_MEGAPIXELES.
+"""
+
+import io
+import logging
+import posixpath
+
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Nombre → lado mayor en píxeles
+TAMANOS = {
+    'miniatura': 320,
+    'media': 1280,
+}
+CALIDAD_WEBP = 80
+CARPETA_DERIVADAS = 'derivadas'
+
+
+def ruta_derivada(nombre, tamano):
+    carpeta, archivo = posixpath.split(nombre)
+    base, extension = posixpath.splitext(archivo)
+    if extension:
+        base = f'{base}_{extension[1:]}'
+    return posixpath.join(carpeta, CARPETA_DERIVADAS, f'{base}_{tamano}.webp')
+
+
+def generar_derivadas(nombre, storage=None):
+    """Crea (o rehace) las versiones reducidas de `nombre`. Devuelve los bytes escritos."""
+    storage = storage or default_storage
+    with storage.open(nombre, 'rb') as original:
+        imagen = Image.open(original)
+        imagen = ImageOps.exif_transpose(imagen)
+        if imagen.mode not in ('RGB', 'RGBA'):
+            imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+
+        escritos = 0
+        for tamano, lado in TAMANOS.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.LANCZOS)
+            buffer = io.BytesIO()
+            # Sin exif=...: la derivada no lleva metadatos (GPS, cámara, etc.)
+            copia.save(buffer, 'WEBP', quality=CALIDAD_WEBP, method=4)
+            destino = ruta_derivada(nombre, tamano)
+            if storage.exists(destino):
+                storage.delete(destino)
+            storage.save(destino, ContentFile(buffer.getvalue()))
+            escritos += buffer.tell()
+    return escritos
+
+
+def eliminar_derivadas(nombre, storage=None):
+    storage = storage or default_storage
+    for tamano in TAMANOS:
+        destino = ruta_derivada(nombre, tamano)
+        if storage.exists(destino):
+            storage.delete(destino)
+
+
+class ImagenConDerivadasMixin:
+    """
+    Para modelos con un ImageField (`campo_imagen`) y un BooleanField
+    `derivadas_listas`: genera las derivadas al subir un archivo nuevo y expone
+    `thumbnail_url`, `medium_url` y `srcset`. `derivadas_listas` registra si las
+    derivadas existen, así las páginas no consultan el disco en cada render;
+    mientras es False se usa la URL del original.
+    """
+    campo_imagen = 'imagen'
+
+    def _archivo_imagen(self):
+        return getattr(self, self.campo_imagen)
+
+    def save(self, *args, **kwargs):
+        archivo = self._archivo_imagen()
+        nueva = bool(archivo) and not getattr(archivo, '_committed', True)
+        anterior = None
+        # Al subir otra imagen o vaciar el campo, la anterior queda libre
+        if self.pk and (nueva or not archivo):
+            anterior = type(self)._default_manager.filter(pk=self.pk).values_list(
+                self.campo_imagen, flat=True
+            ).first()
+        if nueva or not archivo:
+            self.derivadas_listas = False
+        # Guardar el archivo y la fila en la misma transacción: toma el turno de
+        # escritura (BEGIN IMMEDIATE) y así no se cruza con AlmacenamientoDeduplicado.liberar
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        if anterior and anterior != (archivo.name if archivo else None):
+            self.liberar_archivo(anterior)
+        if not nueva:
+            return
+        # Con el almacenamiento deduplicado una imagen repetida ya tiene sus derivadas
+        if not all(archivo.storage.exists(ruta_derivada(archivo.name, t)) for t in TAMANOS):
+            try:
+                generar_derivadas(archivo.name, archivo.storage)
+            except Exception as e:
+                logger.warning(f"No se pudieron generar las derivadas de {archivo.name}: {e}")
+                return
+        self.derivadas_listas = True
+        type(self)._default_manager.filter(pk=self.pk).update(derivadas_listas=True)
+
+    def liberar_archivo(self, nombre=None):
+        """Avisa al almacenamiento que esta fila ya no usa `nombre` (por defecto, su imagen)."""
+        archivo = self._archivo_imagen()
+        nombre = nombre or (archivo.name if archivo else None)
+        liberar = getattr(archivo.storage, 'liberar', None)
+        if nombre and liberar:
+            liberar(nombre)
+
+    def url_derivada(self, tamano):
+        archivo = self._archivo_imagen()
+        if not archivo:
+            return None
+        if not self.derivadas_listas:
+            return archivo.url
+        return archivo.storage.url(ruta_derivada(archivo.name, tamano))
+
+    @property
+    def thumbnail_url(self):
+        return self.url_derivada('miniatura')
+
+    @property
+    def medium_url(self):
+        return self.url_derivada('media')
+
+    @property
+    def srcset(self):
+        if not self._archivo_imagen():
+            return ''
+        return ', '.join(
+            f"{self.url_derivada(tamano)} {lado}w" for tamano, lado in TAMANOS.items()
+        )
+
+
+def optimizar_subida(archivo):
+    """
+    Decodifica una sola vez la imagen subida, la gira según el EXIF, la reduce si
+    supera IMAGENES_MAX_LADO y la recomprime en un archivo temporal en disco.
+    Devuelve el archivo a guardar (el original si recomprimir no ahorra nada).
+    Lanza ValidationError si no es una imagen o tiene demasiados píxeles.
+    """
+    archivo.seek(0)
+    try:
+        imagen = Image.open(archivo)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise forms.ValidationError(
+            "Sube una imagen válida. El archivo no es una imagen o está dañado.",
+            code='invalid_image',
+        )
+
+    ancho, alto = imagen.size
+    max_pixeles = settings.IMAGENES_MAX_MEGAPIXELES * 1_000_000
+    if ancho * alto > max_pixeles:
+        raise forms.ValidationError(
+            f"La imagen es demasiado grande ({ancho}×{alto} px). "
+            f"El máximo es {settings.IMAGENES_MAX_MEGAPIXELES} megapíxeles.",
+            code='imagen_demasiado_grande',
+        )
+
+    formato_original = imagen.format
+    lado = settings.IMAGENES_MAX_LADO
+    if formato_original == 'JPEG':
+        # Decodifica directamente a una escala reducida (1/2, 1/4, 1/8) si sobra resolución
+        imagen.draft('RGB', (lado, lado))
+    try:
+        imagen = ImageOps.exif_transpose(imagen)
+        redimensionada = max(imagen.size) > lado
+        imagen.thumbnail((lado, lado), Image.LANCZOS)
+    except (OSError, SyntaxError, ValueError):
+        raise forms.ValidationError(
+            "Sube una imagen válida. El archivo no es una imagen o está dañado.",
+            code='invalid_image',
+        )
+
+    con_transparencia = imagen.mode in ('RGBA', 'LA') or (
+        imagen.mode == 'P' and 'transparency' in imagen.info
+    )
+    base = posixpath.splitext(archivo.name)[0]
+    if con_transparencia:
+        formato, nombre, tipo = 'PNG', f'{base}.png', 'image/png'
+        opciones = {'optimize': True}
+    else:
+        imagen = imagen.convert('RGB')
+        formato, nombre, tipo = 'JPEG', f'{base}.jpg', 'image/jpeg'
+        opciones = {'quality': settings.IMAGENES_CALIDAD_JPEG, 'optimize': True, 'progressive': True}
+
+    # TemporaryUploadedFile vive en disco: el almacenamiento lo mueve sin cargarlo en memoria
+    salida = TemporaryUploadedFile(nombre, tipo, 0, None)
+    imagen.save(salida.file, formato, **opciones)
+    salida.size = salida.file.tell()
+
+    if salida.size >= archivo.size and not redimensionada and formato == formato_original:
+        salida.close()
+        archivo.seek(0)
+        logger.info(f"Imagen subida {archivo.name}: se conserva el original ({archivo.size} bytes)")
+        return archivo
+
+    salida.seek(0)
+    logger.info(
+        f"Imagen subida {archivo.name}: {archivo.size} → {salida.size} bytes "
+        f"({archivo.size - salida.size} bytes ahorrados)"
+    )
+    return salida
+
+
+class ImagenOptimizadaField(forms.ImageField):
+    """ImageField que valida y recomprime la imagen con una sola decodificación."""
+
+    def to_python(self, data):
+        # FileField.to_python: solo comprueba nombre y tamaño; Pillow se usa una vez abajo
+        archivo = forms.FileField.to_python(self, data)
+        if archivo is None:
+            return None
+        return optimizar_subida(archivo)
@@ -0,0 +1,168 @@
+# consultorio_dental/importar.py
+"""
+Lectura de archivos CSV y XLSX para importaciones, fila por fila.
+
+`leer_filas(archivo, nombre)` recibe el archivo abierto en binario (un archivo
+subido o uno del disco) y devuelve un iterador de listas de textos: la primera
+es la fila de títulos. No carga el archivo entero en memoria:
+
+- CSV: se decodifica línea por línea (UTF-8, con o sin BOM). Se acepta `,` o
+  `;` como separador (Excel en español guarda con `;`).
+- XLSX: se recorre la primera hoja con `iterparse`. Solo los textos
+  compartidos (`sharedStrings.xml`) se leen completos, como hace Excel.
+"""
+
+import codecs
+import csv
+import posixpath
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+FORMATOS_IMPORTACION = ('csv', 'xlsx')
+
+_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+def formato_de(nombre):
+    extension = posixpath.splitext(nombre or '')[1].lower().lstrip('.')
+    if extension not in FORMATOS_IMPORTACION:
+        raise ArchivoInvalido(f"Formato no soportado: use un archivo {' o '.join(FORMATOS_IMPORTACION).upper()}.")
+    return extension
+
+
+def leer_filas(archivo, nombre):
+    if formato_de(nombre) == 'xlsx':
+        return _filas_xlsx(archivo)
+    return _filas_csv(archivo)
+
+
+# ----- CSV -----
+
+def _filas_csv(archivo):
+    lineas = codecs.iterdecode(archivo, 'utf-8-sig')
+    try:
+        primera = next(lineas, '')
+    except UnicodeDecodeError:
+        raise ArchivoInvalido("El CSV debe estar guardado en UTF-8.")
+    separador = ';' if primera.count(';') > primera.count(',') else ','
+
+    def todas():
+        yield primera
+        yield from lineas
+
+    try:
+        yield from csv.reader(todas(), delimiter=separador)
+    except UnicodeDecodeError:
+        raise ArchivoInvalido("El CSV debe estar guardado en UTF-8.")
+
+
+# ----- XLSX -----
+
+def _texto_de(elemento):
+    # <si> o <is>: un <t> simple o varios trozos con formato (<r><t>)
+    return ''.join(t.text or '' for t in elemento.iter(f'{_NS}t'))
+
+
+def _textos_compartidos(libro):
+    try:
+        origen = libro.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    textos = []
+    with origen:
+        for _, elemento in iterparse(origen):
+            if elemento.tag == f'{_NS}si':
+                textos.append(_texto_de(elemento))
+                elemento.clear()
+    return textos
+
+
+def _primera_hoja(libro):
+    """Ruta de la primera hoja según el libro (no siempre es sheet1.xml)."""
+    try:
+        with libro.open('xl/workbook.xml') as origen:
+            for _, elemento in iterparse(origen):
+                if elemento.tag == f'{_NS}sheet':
+                    id_relacion = elemento.get(f'{_NS_REL}id')
+                    break
+            else:
+                id_relacion = None
+        with libro.open('xl/_rels/workbook.xml.rels') as origen:
+            for _, elemento in iterparse(origen):
+                if elemento.get('Id') == id_relacion:
+                    destino = elemento.get('Target')
+                    if destino.startswith('/'):
+                        return destino.lstrip('/')
+                    return posixpath.normpath(posixpath.join('xl', destino))
+    except KeyError:
+        pass
+    return 'xl/worksheets/sheet1.xml'
+
+
+def _columna(referencia):
+    # 'AB12' → 27 (índice desde 0)
+    letras = re.match(r'[A-Z]+', referencia or '')
+    if not letras:
+        return None
+    indice = 0
+    for letra in letras.group():
+        indice = indice * 26 + ord(letra) - ord('A') + 1
+    return indice - 1
+
+
+def _valor_celda(celda, compartidos):
+    tipo = celda.get('t')
+    if tipo == 'inlineStr':
+        contenido = celda.find(f'{_NS}is')
+        return _texto_de(contenido) if contenido is not None else ''
+    valor = celda.find(f'{_NS}v')
+    if valor is None or valor.text is None:
+        return ''
+    if tipo == 's':
+        return compartidos[int(valor.text)]
+    if tipo == 'b':
+        return 'True' if valor.text == '1' else 'False'
+    texto = valor.text
+    if tipo is None and texto.endswith('.0'):
+        # Los números enteros (DNI, teléfono) se guardan a veces como 12345678.0
+        texto = texto[:-2]
+    return texto
+
+
+def _filas_xlsx(archivo):
+    try:
+        libro = zipfile.ZipFile(archivo)
+    except zipfile.BadZipFile:
+        raise ArchivoInvalido("El archivo no es un XLSX válido.")
+    with libro:
+        compartidos = _textos_compartidos(libro)
+        try:
+            origen = libro.open(_primera_hoja(libro))
+        except KeyError:
+            raise ArchivoInvalido("El XLSX no tiene hojas.")
+        with origen:
+            numero = 0
+            for _, elemento in iterparse(origen):
+                if elemento.tag != f'{_NS}row':
+                    continue
+                # También omite las filas vacías: se devuelven igual para no correr la numeración
+                numero += 1
+                siguiente = int(elemento.get('r') or numero)
+                while numero < siguiente:
+                    numero += 1
+                    yield []
+                fila = []
+                for celda in elemento.iter(f'{_NS}c'):
+                    # Excel omite las celdas vacías: la referencia (r="C5") dice la columna
+                    columna = _columna(celda.get('r'))
+                    if columna is not None and columna > len(fila):
+                        fila.extend([''] * (columna - len(fila)))
+                    fila.append(_valor_celda(celda, compartidos))
+                elemento.clear()
+                yield fila
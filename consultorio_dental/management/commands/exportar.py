@@ -0,0 +1,52 @@
+# consultorio_dental/management/commands/exportar.py
+
+import sys
+
+from django.core.management.base import BaseCommand
+from django.http import HttpRequest, QueryDict
+
+from consultorio_dental.exportar import FORMATOS
+from pacientes.views import ListaPacientesView
+from tratamientos.views import ListaPagosView, ListaTratamientosView
+
+LISTADOS = {
+    'pacientes': ListaPacientesView,
+    'tratamientos': ListaTratamientosView,
+    'pagos': ListaPagosView,
+}
+
+
+class Command(BaseCommand):
+    help = "Exporta pacientes, tratamientos o pagos a CSV o XLSX, fila por fila"
+
+    def add_arguments(self, parser):
+        parser.add_argument('listado', choices=sorted(LISTADOS))
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument(
+            '--salida',
+            help='Archivo de destino (por defecto <listado>_<fecha>.<formato>; "-" para la salida estándar)'
+        )
+        parser.add_argument(
+            '--filtros',
+            default='',
+            help='Los mismos filtros que la lista web, como en la URL: "metodo=yape&fecha_inicio=2025-01-01"'
+        )
+
+    def handle(self, *args, **options):
+        # La vista de la lista arma el queryset: así los filtros son exactamente los de la web
+        request = HttpRequest()
+        request.method = 'GET'
+        request.GET = QueryDict(options['filtros'])
+        vista = LISTADOS[options['listado']]()
+        vista.setup(request)
+        response = vista.exportar(options['formato'])
+
+        salida = options['salida'] or response['Content-Disposition'].split('"')[1]
+        if salida == '-':
+            for parte in response.streaming_content:
+                sys.stdout.buffer.write(parte)
+            return
+        with open(salida, 'wb') as destino:
+            for parte in response.streaming_content:
+                destino.write(parte)
+        self.stdout.write(self.style.SUCCESS(f"Exportado a {salida}."))
@@ -0,0 +1,51 @@
+# consultorio_dental/management/commands/precompilar_plantillas.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from consultorio_dental.plantillas import precompilar_plantillas, vaciar_cache_de_plantillas
+
+
+class Command(BaseCommand):
+    help = "Compila todas las plantillas y muestra cuánto tarda (sirve también para detectar plantillas rotas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--benchmark', action='store_true',
+            help="Compara el primer render de una página con y sin precompilar",
+        )
+        parser.add_argument(
+            '--plantilla', default='base.html',
+            help="Plantilla que se renderiza (sin contexto) en el benchmark",
+        )
+
+    def handle(self, *args, **options):
+        vaciar_cache_de_plantillas()
+        compiladas, errores, segundos = precompilar_plantillas()
+        self.stdout.write(f"{compiladas} plantillas compiladas en {segundos * 1000:.0f} ms.")
+
+        if options['benchmark']:
+            self.benchmark(options['plantilla'])
+
+        if errores:
+            for nombre, mensaje in errores:
+                self.stderr.write(f"{nombre}: {mensaje}")
+            raise CommandError(f"{len(errores)} plantillas no compilan.")
+
+    def primer_render(self, plantilla):
+        # Sin contexto ni request (no corren los context processors): mide solo las plantillas
+        inicio = time.perf_counter()
+        render_to_string(plantilla)
+        return time.perf_counter() - inicio
+
+    def benchmark(self, plantilla):
+        vaciar_cache_de_plantillas()
+        en_frio = self.primer_render(plantilla)
+        vaciar_cache_de_plantillas()
+        precompilar_plantillas()
+        precompilado = self.primer_render(plantilla)
+        self.stdout.write(
+            f"Primer render de {plantilla}: {en_frio * 1000:.1f} ms sin precompilar, "
+            f"{precompilado * 1000:.1f} ms precompilado."
+        )
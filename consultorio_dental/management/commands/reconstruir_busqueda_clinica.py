@@ -0,0 +1,17 @@
+# consultorio_dental/management/commands/reconstruir_busqueda_clinica.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from consultorio_dental.busqueda import reconstruir_indice, usa_fts
+
+
+class Command(BaseCommand):
+    help = "Regenera el índice de búsqueda clínica (FTS5) desde historias, notas, tratamientos y pagos"
+
+    def handle(self, *args, **options):
+        if not usa_fts():
+            self.stdout.write("La base de datos no es SQLite: la búsqueda clínica no usa índice FTS5.")
+            return
+        with transaction.atomic():
+            total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"{total} documentos indexados."))
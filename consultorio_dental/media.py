@@ -0,0 +1,142 @@
+# consultorio_dental/media.py
+"""
+Vista para servir los archivos de MEDIA_ROOT (radiografías, fotos clínicas).
+
+- Solo para usuarios con sesión iniciada.
+- Respuestas completas con FileResponse: el servidor WSGI puede enviarlas con
+  `wsgi.file_wrapper` (sendfile, sin copiar el archivo por Python).
+- Soporta `Range` (un solo rango, con `If-Range`) y GET condicional con
+  ETag/If-None-Match y Last-Modified/If-Modified-Since.
+- Los originales con nombre por contenido (ver almacenamiento.py) nunca cambian:
+  se envían con caché inmutable de un año. El resto se revalida en cada uso,
+  también las derivadas: `generar_derivadas --rehacer` las reescribe con el
+  mismo nombre.
+"""
+
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .almacenamiento import CARPETA
+
+_POR_CONTENIDO = re.compile(
+    rf'^{CARPETA}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})\.\w+$'
+)
+_RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CACHE_INMUTABLE = 'private, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'private, no-cache'
+TAMANO_BLOQUE = 64 * 1024
+
+
+def _etag(ruta, estado):
+    coincidencia = _POR_CONTENIDO.match(ruta)
+    if coincidencia:
+        return f'"{coincidencia["digest"]}"'
+    return f'"{estado.st_mtime_ns:x}-{estado.st_size:x}"'
+
+
+def _rango_pedido(request, etag, ultima_modificacion, tamano):
+    """
+    (inicio, fin) inclusive del rango pedido, None si se debe enviar todo el
+    archivo, o False si el rango no se puede satisfacer.
+    """
+    cabecera = request.META.get('HTTP_RANGE', '')
+    coincidencia = _RANGO.match(cabecera.strip())
+    if not coincidencia:
+        # Sin Range, o con varios rangos: se envía el archivo completo
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and if_range not in (etag, ultima_modificacion):
+        return None
+
+    inicio, fin = coincidencia.groups()
+    if not inicio and not fin:
+        return None
+    if not inicio:
+        # bytes=-500: los últimos 500 bytes
+        largo = int(fin)
+        if largo == 0:
+            return False
+        return max(tamano - largo, 0), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or inicio > fin:
+        return False
+    return inicio, fin
+
+
+def _leer_rango(ruta_completa, inicio, fin):
+    with open(ruta_completa, 'rb') as archivo:
+        archivo.seek(inicio)
+        restante = fin - inicio + 1
+        while restante > 0:
+            bloque = archivo.read(min(TAMANO_BLOQUE, restante))
+            if not bloque:
+                break
+            restante -= len(bloque)
+            yield bloque
+
+
+@require_safe
+@login_required
+def servir_media(request, ruta):
+    try:
+        ruta_completa = safe_join(settings.MEDIA_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404("Archivo no encontrado")
+    try:
+        estado = os.stat(ruta_completa)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Archivo no encontrado")
+    if not os.path.isfile(ruta_completa):
+        raise Http404("Archivo no encontrado")
+
+    etag = _etag(ruta, estado)
+    ultima_modificacion = http_date(estado.st_mtime)
+    cabeceras = {
+        'ETag': etag,
+        'Last-Modified': ultima_modificacion,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': CACHE_INMUTABLE if _POR_CONTENIDO.match(ruta) else CACHE_REVALIDAR,
+    }
+
+    condicional = get_conditional_response(
+        request, etag=etag, last_modified=int(estado.st_mtime)
+    )
+    if condicional is not None:
+        for nombre, valor in cabeceras.items():
+            condicional[nombre] = valor
+        return condicional
+
+    tipo, codificacion = mimetypes.guess_type(ruta_completa)
+    tipo = tipo or 'application/octet-stream'
+    rango = _rango_pedido(request, etag, ultima_modificacion, estado.st_size)
+
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{estado.st_size}'
+    elif rango is None:
+        response = FileResponse(open(ruta_completa, 'rb'), content_type=tipo)
+    else:
+        inicio, fin = rango
+        response = StreamingHttpResponse(
+            _leer_rango(ruta_completa, inicio, fin), status=206, content_type=tipo
+        )
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{estado.st_size}'
+        response['Content-Length'] = str(fin - inicio + 1)
+
+    for nombre, valor in cabeceras.items():
+        response[nombre] = valor
+    if codificacion:
+        response['Content-Encoding'] = codificacion
+    return response
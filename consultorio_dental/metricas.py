@@ -0,0 +1,230 @@
+# consultorio_dental/metricas.py
+"""
+Tiempos por vista: qué páginas son lentas y por qué.
+
+`MetricasMiddleware` mide cada petición y la asigna al nombre de su URL
+(`pacientes:detalle`, `tratamientos:lista_pagos`...):
+
+- tiempo total dentro de Django;
+- número y tiempo de las consultas SQL (con `connection.execute_wrapper`);
+- consultas duplicadas: la misma SQL con los mismos parámetros más de una vez
+  en la petición, la huella típica de un N+1;
+- tiempo de render de la plantilla, solo en las vistas que devuelven una
+  `TemplateResponse` (todas las vistas genéricas). Las que usan `render()`
+  ya llegan renderizadas y quedan sin ese dato. Incluye las consultas que
+  la plantilla dispara al recorrer querysets perezosos.
+
+Cada petición se registra en una línea `clave=valor` (logger
+`consultorio_dental.metricas`) y se guarda en `registro`, que conserva las
+últimas METRICAS_MUESTRAS mediciones de cada vista para calcular p50/p95/p99.
+`MetricasView` (/metrics, solo staff) las publica en el formato de texto de
+Prometheus, como `summary`.
+
+Las métricas viven en la memoria de cada proceso: con varios workers cada uno
+publica las suyas. Las descargas en streaming se miden hasta que empiezan a
+enviarse, no hasta el final.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.mixins import UserPassesTestMixin
+from django.db import connections
+from django.http import HttpResponse
+from django.views import View
+
+logger = logging.getLogger(__name__)
+
+CUANTILES = (0.5, 0.95, 0.99)
+SIN_RUTA = '<sin_ruta>'
+
+# Nombre en Prometheus y descripción de cada medición (los tiempos van en segundos)
+MEDICIONES = {
+    'tiempo': ('consultorio_peticion_segundos', "Tiempo de la petición dentro de Django"),
+    'sql': ('consultorio_sql_consultas', "Consultas SQL por petición"),
+    'sql_tiempo': ('consultorio_sql_segundos', "Tiempo en consultas SQL por petición"),
+    'duplicadas': ('consultorio_sql_duplicadas', "Consultas SQL repetidas por petición"),
+    'plantillas': ('consultorio_plantillas_segundos', "Tiempo de render de la plantilla por petición"),
+}
+
+
+def percentil(ordenados, cuantil):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not ordenados:
+        return math.nan
+    return ordenados[max(math.ceil(cuantil * len(ordenados)) - 1, 0)]
+
+
+class _Serie:
+    def __init__(self, muestras):
+        self.ultimas = deque(maxlen=muestras)
+        self.suma = 0.0
+        self.cuenta = 0
+
+    def agregar(self, valor):
+        self.ultimas.append(valor)
+        self.suma += valor
+        self.cuenta += 1
+
+
+class RegistroMetricas:
+    """
+    Últimas mediciones por vista y medición. La suma y la cuenta son desde
+    que arrancó el proceso; los percentiles, de las últimas `muestras`.
+    """
+
+    def __init__(self, muestras=None):
+        self.muestras = muestras or getattr(settings, 'METRICAS_MUESTRAS', 1000)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, **valores):
+        with self._lock:
+            for medicion, valor in valores.items():
+                if valor is None:
+                    continue
+                serie = self._series.get((medicion, vista))
+                if serie is None:
+                    serie = self._series[(medicion, vista)] = _Serie(self.muestras)
+                serie.agregar(valor)
+
+    def vaciar(self):
+        with self._lock:
+            self._series.clear()
+
+    def resumen(self, medicion, vista):
+        """{cuantil: valor} de las últimas muestras, o None si no hay datos."""
+        with self._lock:
+            serie = self._series.get((medicion, vista))
+            ordenados = sorted(serie.ultimas) if serie else []
+        return {cuantil: percentil(ordenados, cuantil) for cuantil in CUANTILES} if ordenados else None
+
+    def exportar_prometheus(self):
+        with self._lock:
+            series = {
+                clave: (sorted(serie.ultimas), serie.suma, serie.cuenta)
+                for clave, serie in self._series.items()
+            }
+        lineas = []
+        for medicion, (nombre, ayuda) in MEDICIONES.items():
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} summary']
+            for (de, vista), (ordenados, suma, cuenta) in sorted(series.items()):
+                if de != medicion:
+                    continue
+                etiqueta = f'vista="{_escapar_etiqueta(vista)}"'
+                for cuantil in CUANTILES:
+                    lineas.append(f'{nombre}{{{etiqueta},quantile="{cuantil}"}} {percentil(ordenados, cuantil):.6g}')
+                lineas.append(f'{nombre}_sum{{{etiqueta}}} {suma:.6g}')
+                lineas.append(f'{nombre}_count{{{etiqueta}}} {cuenta}')
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar_etiqueta(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registro = RegistroMetricas()
+
+
+class _ConsultasDePeticion:
+    """execute_wrapper que cuenta y cronometra las consultas de una petición."""
+
+    def __init__(self):
+        self.tiempo = 0.0
+        self.firmas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.firmas[(sql, repr(params))] += 1
+
+    @property
+    def total(self):
+        return sum(self.firmas.values())
+
+    @property
+    def duplicadas(self):
+        return self.total - len(self.firmas)
+
+    def mas_repetida(self):
+        (sql, _), veces = self.firmas.most_common(1)[0]
+        return sql, veces
+
+
+class MetricasMiddleware:
+    # Largo máximo de la SQL repetida que se muestra en el log
+    LARGO_SQL = 200
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        consultas = _ConsultasDePeticion()
+        request._tiempo_plantillas = None
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(consultas))
+            response = self.get_response(request)
+        tiempo = time.perf_counter() - inicio
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = (coincidencia.view_name if coincidencia else None) or SIN_RUTA
+        plantillas = request._tiempo_plantillas
+        registro.registrar(
+            vista,
+            tiempo=tiempo,
+            sql=consultas.total,
+            sql_tiempo=consultas.tiempo,
+            duplicadas=consultas.duplicadas,
+            plantillas=plantillas,
+        )
+
+        linea = (
+            f"vista={vista} metodo={request.method} estado={response.status_code} "
+            f"ms={tiempo * 1000:.1f} sql={consultas.total} sql_ms={consultas.tiempo * 1000:.1f} "
+            f"duplicadas={consultas.duplicadas} "
+            f"plantillas_ms={'-' if plantillas is None else f'{plantillas * 1000:.1f}'}"
+        )
+        if consultas.duplicadas:
+            sql, veces = consultas.mas_repetida()
+            logger.warning(f"{linea} repetida={veces}x {sql[:self.LARGO_SQL]!r}")
+        else:
+            logger.info(linea)
+        return response
+
+    def process_template_response(self, request, response):
+        # El handler llama a response.render() después de este método: se cronometra ese render
+        render = response.render
+
+        def render_cronometrado():
+            inicio = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._tiempo_plantillas = (request._tiempo_plantillas or 0) + time.perf_counter() - inicio
+
+        response.render = render_cronometrado
+        return response
+
+
+class MetricasView(UserPassesTestMixin, View):
+    """Percentiles por vista en formato de texto de Prometheus. Solo para staff."""
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return HttpResponse(
+            registro.exportar_prometheus(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:40
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_clinica "
+        "USING fts5(titulo, contenido, paciente_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    # rowid = id * 4 + tipo (0 historia, 1 nota, 2 tratamiento, 3 pago)
+    for consulta in (
+        "SELECT id * 4 + 0, motivo, diagnostico || char(10) || notas || char(10) || evolucion, paciente_id "
+        "FROM historias_entradahistoria",
+        "SELECT id * 4 + 1, titulo, contenido, paciente_id FROM notas_nota",
+        "SELECT id * 4 + 2, nombre, descripcion, paciente_id FROM tratamientos_tratamiento",
+        "SELECT p.id * 4 + 3, '', p.nota, t.paciente_id "
+        "FROM tratamientos_pago p JOIN tratamientos_tratamiento t ON t.id = p.tratamiento_id "
+        "WHERE p.nota != ''",
+    ):
+        schema_editor.execute(
+            f"INSERT INTO busqueda_clinica(rowid, titulo, contenido, paciente_id) {consulta}"
+        )
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS busqueda_clinica")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historias', '0004_indices_listas'),
+        ('notas', '0006_indices_listas'),
+        ('tratamientos', '0007_antiguedad_deuda'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
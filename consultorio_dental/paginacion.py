@@ -0,0 +1,193 @@
+# consultorio_dental/paginacion.py
+"""
+Paginación por cursor (keyset) para las listas largas.
+
+En vez de `?page=N` (OFFSET: para mostrar la página 500 la base de datos lee y
+descarta las 499 anteriores, y además cuenta todas las filas en cada página),
+cada enlace lleva un `?cursor=` opaco con los valores de orden de la última (o
+primera) fila mostrada. La consulta siguiente empieza justo ahí usando el índice:
+
+    WHERE fecha <= '2024-03-01' AND (fecha < '2024-03-01' OR (fecha = '2024-03-01' AND id > 812))
+    ORDER BY fecha DESC, id ASC LIMIT 21
+
+así la página 500 cuesta lo mismo que la primera. No hay "Página X de Y": solo
+Anterior/Siguiente y, si se pide, un total aproximado (se cuenta hasta un tope).
+"""
+
+import base64
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+PARAMETRO_CURSOR = 'cursor'
+ADELANTE = 'n'
+ATRAS = 'p'
+
+
+class CursorInvalido(Exception):
+    pass
+
+
+def codificar_cursor(direccion, valores):
+    datos = json.dumps([direccion, *valores], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        direccion, *valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError):
+        raise CursorInvalido(cursor)
+    if direccion not in (ADELANTE, ATRAS):
+        raise CursorInvalido(cursor)
+    return direccion, valores
+
+
+def _invertir(campo):
+    return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+
+def filtro_despues_de(orden, valores):
+    """
+    Q de las filas que van después de `valores` según `orden` (comparación
+    lexicográfica). El primer campo se repite como `<=`/`>=` para que la base
+    de datos pueda saltar directo a esa posición del índice.
+    """
+    condicion = Q()
+    iguales = Q()
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        condicion |= iguales & Q(**{f'{nombre}__{operador}': valor})
+        iguales &= Q(**{nombre: valor})
+    primero = orden[0]
+    operador = 'lte' if primero.startswith('-') else 'gte'
+    return Q(**{f'{primero.lstrip("-")}__{operador}': valores[0]}) & condicion
+
+
+class PaginaPorCursor:
+    """Lo que las plantillas usan como `page_obj`."""
+
+    def __init__(self, object_list, url_anterior, url_siguiente, url_primera=None,
+                 total=None, total_es_minimo=False):
+        self.object_list = object_list
+        self.url_primera = url_primera
+        self.url_anterior = url_anterior
+        self.url_siguiente = url_siguiente
+        self.total = total
+        self.total_es_minimo = total_es_minimo
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self):
+        return self.url_anterior is not None
+
+    def has_next(self):
+        return self.url_siguiente is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class PaginacionPorCursorMixin:
+    """
+    Para ListView: reemplaza la paginación por OFFSET con cursores.
+
+    - `orden_cursor`: campos de orden; el último debe ser único ('pk'). Se puede
+      cambiar por petición redefiniendo `get_orden_cursor()`. El queryset de
+      `get_queryset()` se reordena con estos campos. En SQLite cada índice guarda
+      el id en orden ascendente: con un índice sobre '-fecha' el desempate debe
+      ser 'pk' para que el orden completo salga del índice sin ordenar aparte.
+    - `limite_conteo`: si no es None, `page_obj.total` tiene cuántas filas hay,
+      contando como mucho hasta ese número (`total_es_minimo` indica que hay más).
+
+    Un cursor inválido o manipulado muestra la primera página.
+    """
+    orden_cursor = ('-pk',)
+    limite_conteo = None
+
+    def get_orden_cursor(self):
+        return tuple(self.orden_cursor)
+
+    def _valor_de(self, objeto, campo):
+        return getattr(objeto, campo.lstrip('-'))
+
+    def _convertir(self, modelo, orden, valores):
+        """Los valores del cursor vuelven de JSON como texto: se pasan al tipo de cada campo."""
+        if len(valores) != len(orden):
+            raise CursorInvalido(valores)
+        convertidos = []
+        for campo, valor in zip(orden, valores):
+            nombre = campo.lstrip('-')
+            try:
+                campo_modelo = modelo._meta.pk if nombre == 'pk' else modelo._meta.get_field(nombre)
+                convertidos.append(None if valor is None else campo_modelo.to_python(valor))
+            except (FieldDoesNotExist, ValidationError):
+                raise CursorInvalido(valores)
+        return convertidos
+
+    def _url(self, direccion=None, objeto=None, orden=()):
+        # Conserva los filtros de la petición; sin dirección, enlace a la primera página
+        parametros = self.request.GET.copy()
+        parametros.pop('page', None)
+        parametros.pop(PARAMETRO_CURSOR, None)
+        if direccion:
+            parametros[PARAMETRO_CURSOR] = codificar_cursor(
+                direccion, [self._valor_de(objeto, campo) for campo in orden]
+            )
+        return f'?{parametros.urlencode()}'
+
+    def _contar(self, queryset):
+        if self.limite_conteo is None:
+            return None, False
+        total = queryset.order_by()[:self.limite_conteo + 1].count()
+        if total > self.limite_conteo:
+            return self.limite_conteo, True
+        return total, False
+
+    def paginate_queryset(self, queryset, page_size):
+        orden = self.get_orden_cursor()
+        total, total_es_minimo = self._contar(queryset)
+
+        direccion, valores = ADELANTE, None
+        cursor = self.request.GET.get(PARAMETRO_CURSOR)
+        if cursor:
+            try:
+                direccion, valores = decodificar_cursor(cursor)
+                valores = self._convertir(queryset.model, orden, valores)
+            except CursorInvalido:
+                direccion, valores = ADELANTE, None
+
+        if direccion == ATRAS:
+            # Hacia atrás: se recorre el índice al revés y luego se da vuelta la página
+            orden_consulta = tuple(_invertir(campo) for campo in orden)
+        else:
+            orden_consulta = orden
+        consulta = queryset.order_by(*orden_consulta)
+        if valores is not None:
+            consulta = consulta.filter(filtro_despues_de(orden_consulta, valores))
+        filas = list(consulta[:page_size + 1])
+        hay_mas = len(filas) > page_size
+        filas = filas[:page_size]
+
+        if direccion == ATRAS:
+            filas.reverse()
+            hay_anterior, hay_siguiente = hay_mas, True
+        else:
+            hay_anterior, hay_siguiente = valores is not None, hay_mas
+
+        pagina = PaginaPorCursor(
+            filas,
+            url_anterior=self._url(ATRAS, filas[0], orden) if hay_anterior and filas else None,
+            url_siguiente=self._url(ADELANTE, filas[-1], orden) if hay_siguiente and filas else None,
+            url_primera=self._url() if hay_anterior else None,
+            total=total,
+            total_es_minimo=total_es_minimo,
+        )
+        return None, pagina, filas, pagina.has_other_pages()
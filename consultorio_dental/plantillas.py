@@ -0,0 +1,79 @@
+# consultorio_dental/plantillas.py
+"""
+Precompilación de plantillas al iniciar cada proceso.
+
+TEMPLATES usa el cargador en caché (`django.template.loaders.cached.Loader`):
+cada plantilla se lee y se compila una vez por proceso y queda en memoria.
+Sin precompilar, esa primera vez le toca a la primera petición que usa la
+plantilla en cada worker (la base, los includes y sus etiquetas incluidas).
+
+`precompilar_plantillas()` recorre los directorios `templates/` (el global y
+los de cada app, también los de django.contrib) y compila todo lo que
+encuentra, así la caché queda llena antes de la primera petición. Se llama
+desde `ConsultorioDentalConfig.ready()` si PRECOMPILAR_PLANTILLAS está activo
+(por defecto con DEBUG=False) y a mano con `python manage.py precompilar_plantillas`.
+"""
+
+import logging
+import os
+import time
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+
+def _motores():
+    return [motor.engine for motor in engines.all() if isinstance(motor, DjangoTemplates)]
+
+
+def directorios_de_plantillas(motor):
+    """Directorios de los que carga `motor`: el global y los `templates/` de cada app."""
+    # Con 'loaders' explícitos (sin APP_DIRS) motor.dirs no incluye los de las apps;
+    # el cargador en caché devuelve los directorios de los que envuelve
+    return list(dict.fromkeys(
+        directorio for cargador in motor.template_loaders for directorio in cargador.get_dirs()
+    ))
+
+
+def nombres_de_plantillas(motor):
+    """Nombres de todas las plantillas que `motor` puede cargar, sin repetir."""
+    nombres = set()
+    for directorio in directorios_de_plantillas(motor):
+        for raiz, carpetas, archivos in os.walk(directorio):
+            carpetas[:] = [c for c in carpetas if not c.startswith('.')]
+            for archivo in archivos:
+                if not archivo.startswith('.'):
+                    ruta = os.path.relpath(os.path.join(raiz, archivo), directorio)
+                    nombres.add(ruta.replace(os.sep, '/'))
+    return sorted(nombres)
+
+
+def vaciar_cache_de_plantillas():
+    for motor in _motores():
+        for cargador in motor.template_loaders:
+            cargador.reset()
+
+
+def precompilar_plantillas():
+    """
+    Compila todas las plantillas en la caché del cargador. Devuelve
+    (compiladas, errores, segundos); `errores` es una lista de (nombre, mensaje)
+    con las que no compilan, que no detienen el arranque.
+    """
+    inicio = time.perf_counter()
+    compiladas, errores = 0, []
+    for motor in _motores():
+        for nombre in nombres_de_plantillas(motor):
+            try:
+                motor.get_template(nombre)
+            except (TemplateSyntaxError, UnicodeDecodeError) as e:
+                errores.append((nombre, str(e)))
+            else:
+                compiladas += 1
+    segundos = time.perf_counter() - inicio
+    logger.info("%d plantillas precompiladas en %.0f ms", compiladas, segundos * 1000)
+    for nombre, mensaje in errores:
+        logger.warning("No se pudo compilar la plantilla %s: %s", nombre, mensaje)
+    return compiladas, errores, segundos
@@ -0,0 +1,85 @@
+# consultorio_dental/pruebas.py
+"""Ayudas para los tests de las apps."""
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.runner import DiscoverRunner
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """
+    Los tests usan una caché en memoria: la FileBasedCache de settings.py es la
+    misma carpeta que usa runserver y sobrevive entre ejecuciones.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._cache_en_memoria = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        })
+        self._cache_en_memoria.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._cache_en_memoria.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+class CacheVaciaMixin:
+    """
+    Vacía la caché antes de cada test. Para los que piden páginas cacheadas:
+    dentro de un TestCase la invalidación (on_commit) no corre, y los ids se
+    repiten entre tests.
+    """
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+
+def crear_paciente(dni='10000000', **campos):
+    from pacientes.models import Paciente
+    datos = {
+        'nombre_completo': f'Paciente {dni}', 'fecha_nacimiento': '1990-01-01',
+        'genero': 'O', 'estado_civil': 'S', **campos,
+    }
+    return Paciente.objects.create(dni=dni, **datos)
+
+
+def plan_de_consulta(queryset):
+    """Filas de `EXPLAIN QUERY PLAN` (solo el texto de cada paso) para `queryset`."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [fila[-1] for fila in cursor.fetchall()]
+
+
+def queryset_de_vista(vista, url='/', **kwargs):
+    """El queryset que arma una ListView para `url` (con sus parámetros GET)."""
+    instancia = vista()
+    instancia.setup(RequestFactory().get(url), **kwargs)
+    return instancia.get_queryset()
+
+
+class PlanDeConsultaMixin:
+    """
+    assertUsaIndice: falla si la consulta recorre una tabla entera (SCAN, con o
+    sin índice) y además ordena el resultado en un B-tree temporal, es decir, lee
+    y ordena todas las filas para mostrar una página.
+    """
+
+    def assertUsaIndice(self, queryset):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN es propio de SQLite')
+        plan = plan_de_consulta(queryset)
+        escaneo_completo = [
+            paso for paso in plan
+            if paso.startswith('SCAN ') and 'CONSTANT ROW' not in paso
+        ]
+        # También 'FOR RIGHT PART OF ORDER BY': el índice da solo las primeras columnas del orden
+        ordena_en_temporal = any('USE TEMP B-TREE' in paso for paso in plan)
+        if escaneo_completo and ordena_en_temporal:
+            self.fail(
+                "La consulta recorre toda la tabla y ordena en un B-tree temporal:\n  "
+                + "\n  ".join(plan)
+            )
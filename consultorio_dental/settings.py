@@ -22,6 +22,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     
     # Apps del sistema
+    'consultorio_dental',
     'pacientes',
     'historias',
     'tratamientos',
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir también el resto de middlewares (consultorio_dental/metricas.py)
+    'consultorio_dental.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -49,8 +52,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],  # Plantillas globales
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Cada plantilla se compila una vez por proceso (con DEBUG se recarga al editarla)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -62,16 +71,62 @@ TEMPLATES = [
     },
 ]
 
+# Compila todas las plantillas al iniciar cada proceso (consultorio_dental/plantillas.py)
+PRECOMPILAR_PLANTILLAS = config('PRECOMPILAR_PLANTILLAS', default=not DEBUG, cast=bool)
+
 WSGI_APPLICATION = 'consultorio_dental.wsgi.application'
 
 # Base de datos (SQLite para desarrollo)
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite con WAL y PRAGMA de producción (consultorio_dental/sqlite/base.py)
+        'ENGINE': 'consultorio_dental.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Reutiliza la conexión entre peticiones (segundos); 0 = una por petición
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=600, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'synchronous': config('SQLITE_SYNCHRONOUS', default='NORMAL'),
+            'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+            'mmap_size': config('SQLITE_MMAP_SIZE', default=64 * 1024 * 1024, cast=int),
+            'cache_size': config('SQLITE_CACHE_SIZE', default=-16000, cast=int),
+        },
     }
 }
 
+# Caché compartida entre procesos (páginas cacheadas: consultorio_dental/cache_paginas.py)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'cache' / 'django')),
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=2000, cast=int)},
+    }
+}
+
+# Métricas por vista (/metrics): mediciones que se guardan por vista para los percentiles
+METRICAS_MUESTRAS = config('METRICAS_MUESTRAS', default=1000, cast=int)
+
+# Una línea por petición con sus tiempos y consultas. En desarrollo el nivel es WARNING:
+# solo se ven las peticiones que repiten SQL (las demás con METRICAS_LOG_NIVEL=INFO)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'consultorio_dental.metricas': {
+            'handlers': ['consola'],
+            'level': config('METRICAS_LOG_NIVEL', default='WARNING' if DEBUG else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Tests con caché en memoria (consultorio_dental/pruebas.py)
+TEST_RUNNER = 'consultorio_dental.pruebas.EjecutorPruebas'
+
 # Contraseñas
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -91,13 +146,56 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# En producción: nombres con hash + versiones .gz/.br (consultorio_dental/estaticos.py).
+# En desarrollo se usa el almacenamiento simple para no depender de collectstatic.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'consultorio_dental.estaticos.AlmacenamientoEstaticoComprimido'
+        ),
+    },
+}
+
 # Archivos subidos por usuarios (radiografías, etc.)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Imágenes subidas: se reducen y recomprimen antes de guardarse (consultorio_dental/imagenes.py)
+IMAGENES_MAX_LADO = config('IMAGENES_MAX_LADO', default=2560, cast=int)
+IMAGENES_CALIDAD_JPEG = config('IMAGENES_CALIDAD_JPEG', default=85, cast=int)
+IMAGENES_MAX_MEGAPIXELES = config('IMAGENES_MAX_MEGAPIXELES', default=60, cast=int)
+
+# Copias locales de las imágenes de Google Drive de las notas (notas/imagenes_externas.py)
+IMAGENES_EXTERNAS_DIR = config('IMAGENES_EXTERNAS_DIR', default=str(BASE_DIR / 'cache' / 'imagenes_externas'))
+IMAGENES_EXTERNAS_TTL = config('IMAGENES_EXTERNAS_TTL', default=7 * 24 * 3600, cast=int)
+IMAGENES_EXTERNAS_MAX_MB = config('IMAGENES_EXTERNAS_MAX_MB', default=200, cast=int)
+IMAGENES_EXTERNAS_MAX_DESCARGA_MB = config('IMAGENES_EXTERNAS_MAX_DESCARGA_MB', default=20, cast=int)
+IMAGENES_EXTERNAS_TIMEOUT = config('IMAGENES_EXTERNAS_TIMEOUT', default=10, cast=int)
+# Hosts (por https) de los que el servidor descarga imágenes; '.dominio' incluye subdominios.
+# Los enlaces de Drive siempre se aceptan; estos cubren sus redirecciones de descarga
+IMAGENES_EXTERNAS_HOSTS = config(
+    'IMAGENES_EXTERNAS_HOSTS',
+    default='drive.google.com,drive.usercontent.google.com,.googleusercontent.com',
+    cast=Csv(),
+)
+
+# Calendario de citas (Google Calendar ICS), sincronizado con `manage.py sincronizar_citas`
+CITAS_ICS_URL = config(
+    'CITAS_ICS_URL',
+    default='https://calendar.google.com/calendar/ical/juancarloscn%40gmail.com/private-7c3dfb4a8b649579159a76228916d6cf/basic.ics'
+)
+CITAS_ICS_TIMEOUT = config('CITAS_ICS_TIMEOUT', default=10, cast=int)
+# Ventana de eventos que se guarda localmente (los filtros de la lista piden como máximo 30 días atrás y 365 adelante)
+CITAS_SINCRONIZAR_DIAS_ATRAS = config('CITAS_SINCRONIZAR_DIAS_ATRAS', default=45, cast=int)
+CITAS_SINCRONIZAR_DIAS_ADELANTE = config('CITAS_SINCRONIZAR_DIAS_ADELANTE', default=400, cast=int)
+
 # Redirecciones tras login/logout
 LOGIN_URL = '/usuarios/login/'
-LOGIN_REDIRECT_URL = '/usuarios/dashboard/'
+LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/usuarios/login/'
 
 # Tipo de campo por defecto para claves primarias
@@ -0,0 +1,82 @@
+# consultorio_dental/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from historias.models import EntradaHistoria, ImagenHistoria
+from notas.models import ImagenNota, Nota
+from pacientes.models import Paciente
+from tratamientos.models import Pago, Tratamiento
+from .busqueda import desindexar, indexar
+from .cache_paginas import dependencia_paciente, invalidar
+
+# Índice de búsqueda clínica (consultorio_dental/busqueda.py): campos que van al índice
+CAMPOS_INDEXADOS = {
+    EntradaHistoria: {'motivo', 'diagnostico', 'notas', 'evolucion', 'paciente'},
+    Nota: {'titulo', 'contenido', 'paciente'},
+    Tratamiento: {'nombre', 'descripcion', 'paciente'},
+    Pago: {'nota', 'tratamiento'},
+}
+
+
+@receiver(post_save, sender=EntradaHistoria)
+@receiver(post_save, sender=Nota)
+@receiver(post_save, sender=Tratamiento)
+@receiver(post_save, sender=Pago)
+def actualizar_indice_busqueda(sender, instance, update_fields=None, **kwargs):
+    # save(update_fields=...) que no toca el texto (p. ej. saldos del tratamiento): nada que reindexar
+    if update_fields is not None and not CAMPOS_INDEXADOS[sender] & set(update_fields):
+        return
+    indexar(instance)
+
+
+@receiver(post_delete, sender=EntradaHistoria)
+@receiver(post_delete, sender=Nota)
+@receiver(post_delete, sender=Tratamiento)
+@receiver(post_delete, sender=Pago)
+def quitar_de_indice_busqueda(sender, instance, **kwargs):
+    desindexar(instance)
+
+
+# Caché de páginas (consultorio_dental/cache_paginas.py)
+
+def _dependencias(instance):
+    """Páginas cacheadas que dejan de valer cuando `instance` cambia o se borra."""
+    if isinstance(instance, Paciente):
+        # El nombre del paciente también aparece en las listas de tratamientos y pagos
+        return [dependencia_paciente(instance.pk), 'pacientes', 'tratamientos', 'pagos']
+    if isinstance(instance, Tratamiento):
+        return [dependencia_paciente(instance.paciente_id), 'tratamientos', 'pagos']
+    if isinstance(instance, Pago):
+        # El pago cambia el saldo que muestra la lista de tratamientos
+        return [dependencia_paciente(instance.tratamiento.paciente_id), 'pagos', 'tratamientos']
+    if isinstance(instance, ImagenHistoria):
+        return [dependencia_paciente(instance.entrada.paciente_id)]
+    if isinstance(instance, ImagenNota):
+        instance = instance.nota
+    if instance.paciente_id is None:
+        return []
+    return [dependencia_paciente(instance.paciente_id)]
+
+
+@receiver(post_save, sender=Paciente)
+@receiver(post_delete, sender=Paciente)
+@receiver(post_save, sender=Tratamiento)
+@receiver(post_delete, sender=Tratamiento)
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+@receiver(post_save, sender=EntradaHistoria)
+@receiver(post_delete, sender=EntradaHistoria)
+@receiver(post_save, sender=ImagenHistoria)
+@receiver(post_delete, sender=ImagenHistoria)
+@receiver(post_save, sender=Nota)
+@receiver(post_delete, sender=Nota)
+@receiver(post_save, sender=ImagenNota)
+@receiver(post_delete, sender=ImagenNota)
+def invalidar_paginas(sender, instance, **kwargs):
+    dependencias = _dependencias(instance)
+    if dependencias:
+        # Al confirmar, no antes: Pago.save() recalcula los saldos después de esta
+        # señal, y otro proceso podría cachear la página con los datos viejos
+        transaction.on_commit(lambda: invalidar(*dependencias))
@@ -0,0 +1,61 @@
+# consultorio_dental/sqlite/base.py
+"""
+Backend SQLite de Django con ajustes para producción.
+
+Al abrir cada conexión aplica los PRAGMA de DATABASES[...]['PRAGMAS'] (sobre los
+valores de PRAGMAS_POR_DEFECTO):
+
+- journal_mode=WAL: quien lee no espera a quien escribe ni al revés (solo los
+  que escriben se turnan entre sí).
+- synchronous=NORMAL: en WAL sigue siendo seguro ante caídas del proceso y evita
+  un fsync por cada commit.
+- busy_timeout: milisegundos que un escritor espera el turno antes de fallar
+  con "database is locked".
+- mmap_size, cache_size y temp_store=MEMORY: menos lecturas a disco.
+
+Con CONN_MAX_AGE la conexión (y estos ajustes) se reutiliza entre peticiones.
+
+Las transacciones (`atomic`) empiezan con BEGIN IMMEDIATE: toman el turno de
+escritura al empezar y lo esperan con busy_timeout. Con un BEGIN normal, una
+transacción que lee y después escribe falla con "database is locked" (sin
+esperar) si otro proceso escribió entre medio. Es lo que hace
+OPTIONS={'transaction_mode': 'IMMEDIATE'} desde Django 5.1, también en 4.2.
+"""
+
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMAS_POR_DEFECTO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 64 * 1024 * 1024,
+    'cache_size': -16000,  # negativo = KiB (≈16 MB)
+    'temp_store': 'MEMORY',
+}
+
+_VALOR_VALIDO = re.compile(r'^-?\w+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def pragmas(self):
+        pragmas = {**PRAGMAS_POR_DEFECTO, **self.settings_dict.get('PRAGMAS', {})}
+        for nombre, valor in pragmas.items():
+            # Los PRAGMA no aceptan parámetros: se validan antes de armar el SQL
+            if nombre not in PRAGMAS_POR_DEFECTO or not _VALOR_VALIDO.match(str(valor)):
+                raise ImproperlyConfigured(
+                    f"PRAGMA no permitido en DATABASES[{self.alias!r}]['PRAGMAS']: {nombre}={valor!r}"
+                )
+        return pragmas
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for nombre, valor in self.pragmas().items():
+            conn.execute(f'PRAGMA {nombre} = {valor}')
+        return conn
@@ -0,0 +1,373 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import RequestFactory
+from django.urls import reverse
+
+from historias.models import EntradaHistoria
+from notas.models import Nota
+from tratamientos.models import Pago, Tratamiento
+from .busqueda import buscar_en_historial, reconstruir_indice
+from . import estaticos
+from .estaticos import ArchivosEstaticos, comprimir_variantes, referencias_estaticas, verificar_brotli, verificar_referencias_estaticas
+from .metricas import MetricasMiddleware, registro
+from .plantillas import precompilar_plantillas, vaciar_cache_de_plantillas
+from .pruebas import CacheVaciaMixin, crear_paciente
+from .sqlite.base import DatabaseWrapper
+
+
+class ArchivosEstaticosTest(SimpleTestCase):
+    def setUp(self):
+        self.raiz = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.raiz)
+        (self.raiz / 'css').mkdir()
+        self.css = b'body { color: #333; }\n' * 200
+        for nombre in ('custom.css', 'custom.0123456789ab.css'):
+            (self.raiz / 'css' / nombre).write_bytes(self.css)
+        comprimir_variantes(self.raiz / 'css' / 'custom.0123456789ab.css')
+        (self.raiz / 'staticfiles.json').write_text(json.dumps({
+            'paths': {'css/custom.css': 'css/custom.0123456789ab.css'}, 'version': '1.1',
+        }))
+        self.handler = ArchivosEstaticos(self.aplicacion, raiz=self.raiz, prefijo='/static/')
+
+    def aplicacion(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def pedir(self, ruta, **cabeceras):
+        respuesta = {}
+
+        def start_response(estado, headers):
+            respuesta['estado'] = estado
+            respuesta['cabeceras'] = dict(headers)
+
+        environ = RequestFactory().get(ruta, **cabeceras).environ
+        cuerpo = b''.join(self.handler(environ, start_response))
+        return respuesta['estado'], respuesta['cabeceras'], cuerpo
+
+    def test_sirve_gzip_con_cache_inmutable(self):
+        estado, cabeceras, cuerpo = self.pedir(
+            '/static/css/custom.0123456789ab.css', HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(estado, '200 OK')
+        self.assertEqual(cabeceras['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(cuerpo), self.css)
+        self.assertIn('immutable', cabeceras['Cache-Control'])
+        self.assertEqual(cabeceras['Vary'], 'Accept-Encoding')
+
+    def test_sin_hash_se_revalida_y_sin_gzip_va_plano(self):
+        estado, cabeceras, cuerpo = self.pedir('/static/css/custom.css')
+        self.assertEqual(cuerpo, self.css)
+        self.assertNotIn('Content-Encoding', cabeceras)
+        self.assertIn('must-revalidate', cabeceras['Cache-Control'])
+        estado, _, _ = self.pedir('/static/css/custom.css', HTTP_IF_NONE_MATCH=cabeceras['ETag'])
+        self.assertEqual(estado, '304 Not Modified')
+
+    def test_if_none_match_compara_etags_completas(self):
+        etag = self.pedir('/static/css/custom.css')[1]['ETag']
+        for valor, esperado in (
+            (f'"otra", W/{etag}', '304 Not Modified'),
+            ('*', '304 Not Modified'),
+            (f'"x{etag}"', '200 OK'),
+            (etag[:-1] + '-gzip"', '200 OK'),
+        ):
+            self.assertEqual(self.pedir('/static/css/custom.css', HTTP_IF_NONE_MATCH=valor)[0], esperado, valor)
+
+    def test_lo_demas_pasa_a_django(self):
+        self.assertEqual(self.pedir('/static/no-existe.css')[2], b'django')
+        self.assertEqual(self.pedir('/static/../staticfiles.json')[2], b'django')
+        self.assertEqual(self.pedir('/pacientes/')[2], b'django')
+
+
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'consultorio_dental.estaticos.AlmacenamientoEstaticoComprimido'},
+})
+class CollectstaticComprimidoTest(SimpleTestCase):
+    def setUp(self):
+        self.raiz = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.raiz)
+        ajuste = override_settings(STATIC_ROOT=self.raiz)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    @skipUnless(estaticos.brotli, "requiere el paquete brotli (requirements.txt)")
+    def test_escribe_br_y_lo_sirve_a_quien_acepta_br(self):
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+        nombre = json.loads((self.raiz / 'staticfiles.json').read_text())['paths']['css/custom.css']
+        self.assertTrue((self.raiz / f'{nombre}.br').is_file())
+
+        respuesta = {}
+        handler = ArchivosEstaticos(lambda environ, start_response: [b'django'], raiz=self.raiz, prefijo='/static/')
+        environ = RequestFactory().get(f'/static/{nombre}', HTTP_ACCEPT_ENCODING='gzip, br').environ
+        cuerpo = b''.join(handler(environ, lambda estado, cabeceras: respuesta.update(cabeceras)))
+        self.assertEqual(respuesta['Content-Encoding'], 'br')
+        self.assertEqual(estaticos.brotli.decompress(cuerpo), (self.raiz / nombre).read_bytes())
+
+    def test_check_deploy_avisa_si_falta_brotli(self):
+        with mock.patch.object(estaticos, 'brotli', None):
+            self.assertEqual([a.id for a in verificar_brotli(None)], ['consultorio_dental.W001'])
+
+
+class ReferenciasEstaticasTest(SimpleTestCase):
+    def test_plantillas_del_proyecto_resuelven(self):
+        self.assertEqual(verificar_referencias_estaticas(None), [])
+
+    def test_revisa_tambien_las_plantillas_de_las_apps(self):
+        with mock.patch.object(Path, 'rglob', autospec=True, return_value=[]) as rglob:
+            list(referencias_estaticas())
+        carpetas = {llamada.args[0] for llamada in rglob.call_args_list}
+        self.assertIn(Path(settings.BASE_DIR, 'pacientes', 'templates').resolve(), carpetas)
+
+    @override_settings(STATICFILES_DIRS=[])
+    def test_avisa_si_falta_un_archivo(self):
+        errores = verificar_referencias_estaticas(None)
+        self.assertIn('consultorio_dental.E001', {e.id for e in errores})
+
+
+class PrecompilarPlantillasTest(SimpleTestCase):
+    def setUp(self):
+        vaciar_cache_de_plantillas()
+        self.cache = engines['django'].engine.template_loaders[0].get_template_cache
+
+    def test_compila_todas_sin_errores(self):
+        compiladas, errores, _ = precompilar_plantillas()
+        self.assertEqual(errores, [])
+        self.assertGreater(compiladas, 0)
+        for nombre in ('base.html', 'pacientes/pestanas/notas.html', 'admin/base.html'):
+            self.assertIn(nombre, self.cache)
+
+    @override_settings(PRECOMPILAR_PLANTILLAS=True)
+    def test_al_iniciar(self):
+        apps.get_app_config('consultorio_dental').ready()
+        self.assertIn('pacientes/detalle_paciente.html', self.cache)
+
+    def test_comando_benchmark(self):
+        salida = io.StringIO()
+        call_command('precompilar_plantillas', '--benchmark', stdout=salida)
+        self.assertIn('precompilado', salida.getvalue())
+
+
+class SQLiteConcurrenciaTest(SimpleTestCase):
+    """Con WAL, leer mientras otra conexión escribe no espera ni falla."""
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta)
+        self.crear_base('wal.sqlite3')
+
+    def crear_base(self, nombre, **pragmas):
+        self.settings_dict = {
+            **connection.settings_dict,
+            'NAME': os.path.join(self.carpeta, nombre),
+            'PRAGMAS': {'busy_timeout': 200, **pragmas},
+        }
+        conn = self.conectar()
+        conn.execute('CREATE TABLE pago (id INTEGER PRIMARY KEY, monto INTEGER)')
+        conn.execute('INSERT INTO pago (monto) VALUES (100)')
+
+    def conectar(self):
+        wrapper = DatabaseWrapper(self.settings_dict, alias='concurrencia')
+        conn = wrapper.get_new_connection(wrapper.get_connection_params())
+        conn.isolation_level = None  # autocommit, como lo deja Django
+        self.addCleanup(conn.close)
+        return conn
+
+    def test_pragmas_aplicados(self):
+        conn = self.conectar()
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute('PRAGMA busy_timeout').fetchone()[0], 200)
+        self.assertEqual(conn.execute('PRAGMA temp_store').fetchone()[0], 2)  # MEMORY
+
+    def test_lectores_no_esperan_a_un_escritor(self):
+        escritor = self.conectar()
+        escritor.execute('BEGIN IMMEDIATE')
+        escritor.execute('INSERT INTO pago (monto) VALUES (50)')
+        escritor.execute('UPDATE pago SET monto = 0')
+
+        tiempos = []
+        errores = []
+
+        def leer():
+            lector = sqlite3.connect(self.settings_dict['NAME'], timeout=0)
+            try:
+                inicio = time.perf_counter()
+                total = lector.execute('SELECT SUM(monto) FROM pago').fetchone()[0]
+                tiempos.append(time.perf_counter() - inicio)
+                # Ve la última versión confirmada, no la escritura en curso
+                self.assertEqual(total, 100)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                lector.close()
+
+        hilos = [threading.Thread(target=leer) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        escritor.execute('COMMIT')
+
+        self.assertEqual(errores, [])
+        self.assertLess(max(tiempos), 0.1)
+
+    def test_escritor_confirma_con_una_lectura_abierta(self):
+        lector = self.conectar()
+        lector.execute('BEGIN')
+        self.assertEqual(lector.execute('SELECT COUNT(*) FROM pago').fetchone()[0], 1)
+
+        escritor = self.conectar()
+        escritor.execute('INSERT INTO pago (monto) VALUES (50)')  # autocommit: no espera al lector
+
+        self.assertEqual(lector.execute('SELECT COUNT(*) FROM pago').fetchone()[0], 1)
+        lector.execute('COMMIT')
+        self.assertEqual(lector.execute('SELECT COUNT(*) FROM pago').fetchone()[0], 2)
+
+    def test_atomic_toma_el_turno_de_escritura_al_empezar(self):
+        wrapper = DatabaseWrapper(self.settings_dict, alias='concurrencia')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        # Lo que hace atomic() al entrar: la transacción lee y escribiría después
+        wrapper.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+        wrapper.cursor().execute('SELECT COUNT(*) FROM pago')
+
+        otro = sqlite3.connect(self.settings_dict['NAME'], timeout=0)
+        self.addCleanup(otro.close)
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            otro.execute('INSERT INTO pago (monto) VALUES (50)')
+        wrapper.rollback()
+
+    def test_sin_wal_el_escritor_espera_al_lector(self):
+        # Referencia: con el journal por defecto la misma situación falla
+        self.crear_base('sin_wal.sqlite3', journal_mode='DELETE')
+        lector = self.conectar()
+        lector.execute('BEGIN')
+        lector.execute('SELECT COUNT(*) FROM pago').fetchone()
+        escritor = self.conectar()
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'locked'):
+            escritor.execute('INSERT INTO pago (monto) VALUES (50)')
+        lector.execute('COMMIT')
+
+
+class BusquedaClinicaTest(TestCase):
+    def setUp(self):
+        self.ana = crear_paciente('10000001', nombre_completo='Ana')
+        self.beto = crear_paciente('10000002', nombre_completo='Beto')
+        self.entrada = EntradaHistoria.objects.create(
+            paciente=self.ana, motivo='Dolor en pieza 36', diagnostico='Pulpitis irreversible: endodóncia <urgente>',
+        )
+        self.tratamiento = Tratamiento.objects.create(
+            paciente=self.ana, nombre='Endodoncia 36', costo_total=500, fecha_inicio='2025-01-01',
+        )
+        Tratamiento.objects.create(paciente=self.beto, nombre='Endodoncia 360', costo_total=500, fecha_inicio='2025-01-01')
+        self.nota = Nota.objects.create(titulo='Recordatorio', contenido='Llamar por la endodoncia')
+
+    def buscar(self, texto):
+        return [
+            (grupo['paciente'], [r['objeto'] for r in grupo['resultados']])
+            for grupo in buscar_en_historial(texto)
+        ]
+
+    def test_agrupa_por_paciente_sin_tildes_y_numeros_exactos(self):
+        grupos = self.buscar('ENDODONCIA 36')
+        self.assertEqual(len(grupos), 1)
+        paciente, objetos = grupos[0]
+        self.assertEqual(paciente, self.ana)
+        # El título pesa más: primero el tratamiento, luego la entrada que lo dice en el diagnóstico
+        self.assertEqual(objetos, [self.tratamiento, self.entrada])
+
+        pacientes = [paciente for paciente, _ in self.buscar('endodon')]
+        self.assertCountEqual(pacientes, [self.ana, self.beto, None])
+
+    def test_resalta_y_escapa_el_texto(self):
+        resultado = buscar_en_historial('pulpitis')[0]['resultados'][0]
+        self.assertIn('<mark>Pulpitis</mark>', resultado['fragmento'])
+        self.assertIn('&lt;urgente&gt;', resultado['fragmento'])
+        self.assertEqual(resultado['url'], self.entrada.get_absolute_url())
+
+    def test_indice_sigue_a_los_cambios(self):
+        pago = Pago.objects.create(tratamiento=self.tratamiento, monto=100, nota='Pagó con tarjeta prestada')
+        self.assertEqual(self.buscar('prestada'), [(self.ana, [pago])])
+        pago.nota = ''
+        pago.save()
+        self.assertEqual(self.buscar('prestada'), [])
+
+        self.nota.contenido = 'Confirmar cita'
+        self.nota.save()
+        self.assertEqual(self.buscar('cita'), [(None, [self.nota])])
+        self.ana.delete()
+        self.assertEqual(self.buscar('pulpitis'), [])
+
+    def test_reconstruir_indice(self):
+        self.assertEqual(reconstruir_indice(), 4)
+        self.assertEqual(self.buscar('pulpitis'), [(self.ana, [self.entrada])])
+
+    def test_vista(self):
+        response = self.client.get(reverse('buscar') + '?q=pulpitis')
+        self.assertContains(response, '<mark>Pulpitis</mark>')
+        self.assertContains(response, 'Ana')
+
+
+class MetricasTest(CacheVaciaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        registro.vaciar()
+        self.paciente = crear_paciente('10000001', nombre_completo='Ana')
+
+    def test_mide_por_nombre_de_vista(self):
+        self.client.get(reverse('pacientes:detalle', args=[self.paciente.pk]) + '?notas_page=1')
+        self.client.get(reverse('pacientes:detalle', args=[self.paciente.pk]) + '?notas_page=2')
+        tiempo = registro.resumen('tiempo', 'pacientes:detalle')
+        self.assertGreater(tiempo[0.99], 0)
+        self.assertGreaterEqual(tiempo[0.99], tiempo[0.5])
+        self.assertGreater(registro.resumen('sql', 'pacientes:detalle')[0.5], 0)
+        self.assertGreater(registro.resumen('plantillas', 'pacientes:detalle')[0.5], 0)
+        self.assertEqual(registro.resumen('duplicadas', 'pacientes:detalle')[0.99], 0)
+
+    def test_detecta_consultas_duplicadas(self):
+        def vista(request):
+            for _ in range(3):
+                list(Tratamiento.objects.filter(paciente=self.paciente))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = type('Coincidencia', (), {'view_name': 'prueba:n_mas_1'})()
+        with self.assertLogs('consultorio_dental.metricas', 'WARNING') as logs:
+            MetricasMiddleware(vista)(request)
+        self.assertIn('vista=prueba:n_mas_1', logs.output[0])
+        self.assertIn('duplicadas=2', logs.output[0])
+        self.assertIn('repetida=3x', logs.output[0])
+        self.assertIn('plantillas_ms=-', logs.output[0])
+
+    def test_endpoint_prometheus_solo_staff(self):
+        self.client.get(reverse('pacientes:lista'))
+        url = reverse('metricas')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(User.objects.create_user('recepcion', password='clave-segura'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_login(User.objects.create_user('admin', password='clave-segura', is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        texto = response.content.decode()
+        self.assertIn('# TYPE consultorio_peticion_segundos summary', texto)
+        self.assertIn('consultorio_peticion_segundos{vista="pacientes:lista",quantile="0.95"}', texto)
+        self.assertIn('consultorio_sql_consultas_count{vista="pacientes:lista"} 1', texto)
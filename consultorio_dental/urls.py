@@ -3,9 +3,12 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.views.generic import RedirectView
 
+from .media import servir_media
+from .metricas import MetricasView
+from .views import BusquedaClinicaView
+
 urlpatterns = [
     path('', RedirectView.as_view(url='/pacientes/', permanent=False)),  # Redirigir raíz a pacientes
     path('admin/', admin.site.urls),
@@ -14,8 +17,10 @@ urlpatterns = [
     path('tratamientos/', include('tratamientos.urls')),
     path('notas/', include('notas.urls')),
     path('citas/', include('citas.urls')),
+    path('usuarios/', include('usuarios.urls')),
+    path('buscar/', BusquedaClinicaView.as_view(), name='buscar'),
+    # Percentiles por vista para Prometheus (solo staff)
+    path('metrics', MetricasView.as_view(), name='metricas'),
+    # Archivos subidos (también en producción): requiere sesión, ver media.py
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:ruta>", servir_media, name='media'),
 ]
-
-# Servir archivos de medios en desarrollo
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,22 @@
+# consultorio_dental/views.py
+
+from django.views.generic import TemplateView
+
+from .busqueda import buscar_en_historial
+
+
+class BusquedaClinicaView(TemplateView):
+    template_name = 'consultorio_dental/busqueda.html'
+    limite = 100
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        q = self.request.GET.get('q', '').strip()
+        grupos = buscar_en_historial(q, limite=self.limite) if q else []
+        context.update({
+            'q': q,
+            'grupos': grupos,
+            'total': sum(len(grupo['resultados']) for grupo in grupos),
+            'limite': self.limite,
+        })
+        return context
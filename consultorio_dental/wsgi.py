@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'consultorio_dental.settings')
 
 application = get_wsgi_application()
+
+if not settings.DEBUG:
+    # Sirve /static/ (con .br/.gz y caché inmutable) antes de llegar a Django
+    from consultorio_dental.estaticos import ArchivosEstaticos
+    application = ArchivosEstaticos(application)
@@ -18,11 +18,25 @@ $rutaBackup = "backups\$nombreCarpeta"
 Write-Host "Creando backup en: $rutaBackup" -ForegroundColor Green
 New-Item -ItemType Directory -Path $rutaBackup -Force | Out-Null
 
+# Las bases SQLite no se copian archivo por archivo: en modo WAL los ultimos cambios
+# estan en db.sqlite3-wal. La API de backup de sqlite3 (la de ".backup") lee la
+# base completa y consistente aunque la app este escribiendo.
+function Copiar-BaseSqlite($origen, $destino) {
+    python -c "import sqlite3, sys; o = sqlite3.connect(sys.argv[1]); d = sqlite3.connect(sys.argv[2]); o.backup(d); d.close(); o.close()" $origen $destino
+    if ($LASTEXITCODE -ne 0) {
+        throw "No se pudo respaldar la base de datos $origen"
+    }
+}
+
 # Copiar archivos
 foreach ($archivo in $Archivos) {
     if (Test-Path $archivo) {
         $nombreArchivo = Split-Path $archivo -Leaf
-        Copy-Item $archivo "$rutaBackup\$nombreArchivo"
+        if ($archivo -like "*.sqlite3") {
+            Copiar-BaseSqlite $archivo "$rutaBackup\$nombreArchivo"
+        } else {
+            Copy-Item $archivo "$rutaBackup\$nombreArchivo"
+        }
         Write-Host "  OK Copiado: $archivo" -ForegroundColor Cyan
     } else {
         Write-Host "  X No encontrado: $archivo" -ForegroundColor Yellow
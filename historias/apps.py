@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class HistoriasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'historias'
-    verbose_name = '2. Historias Clínicas'
\ No newline at end of file
+    verbose_name = '2. Historias Clínicas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
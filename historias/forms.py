@@ -1,6 +1,7 @@
 # historias/forms.py
 
 from django import forms
+from consultorio_dental.imagenes import ImagenOptimizadaField
 from .models import EntradaHistoria, ImagenHistoria
 
 class EntradaHistoriaForm(forms.ModelForm):
@@ -30,11 +31,17 @@ class EntradaHistoriaForm(forms.ModelForm):
         }
 
 class ImagenHistoriaForm(forms.ModelForm):
+    # Se reduce y recomprime al subir (ver consultorio_dental/imagenes.py)
+    imagen = ImagenOptimizadaField(
+        required=False,
+        label="Imagen (radiografía, foto, etc.)",
+        widget=forms.FileInput(attrs={'class': 'form-control'})
+    )
+
     class Meta:
         model = ImagenHistoria
         fields = ['imagen', 'descripcion']
         widgets = {
-            'imagen': forms.FileInput(attrs={'class': 'form-control'}),
             'descripcion': forms.TextInput(attrs={
                 'class': 'form-control',
                 'placeholder': 'Ej: Radiografía de muela 36'
@@ -0,0 +1,108 @@
+# historias/management/commands/deduplicar_imagenes.py
+
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from consultorio_dental.almacenamiento import almacenamiento_imagenes, digest_de, nombre_por_contenido
+from consultorio_dental.imagenes import TAMANOS, eliminar_derivadas, ruta_derivada
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las imágenes ya subidas al almacenamiento por contenido: "
+        "cada imagen repetida queda en un solo archivo"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra qué archivos se unirían, sin moverlos'
+        )
+        parser.add_argument(
+            '--borrar-huerfanos',
+            action='store_true',
+            help='Borra además los archivos de las carpetas antiguas que ninguna fila usa'
+        )
+
+    def nombres_en_uso(self, storage):
+        nombres = set()
+        for modelo, campo in storage.campos_que_lo_usan():
+            nombres |= set(
+                modelo._default_manager.exclude(**{campo.name: ''})
+                .exclude(**{f'{campo.name}__isnull': True})
+                .values_list(campo.name, flat=True)
+            )
+        return sorted(nombres)
+
+    def huerfanos(self, storage):
+        en_uso = set(self.nombres_en_uso(storage))
+        for _, campo in storage.campos_que_lo_usan():
+            carpeta = campo.upload_to.rstrip('/')
+            if not storage.exists(carpeta):
+                continue
+            for archivo in storage.listdir(carpeta)[1]:
+                nombre = f'{carpeta}/{archivo}'
+                if nombre not in en_uso:
+                    yield nombre
+
+    def mover(self, storage, origen, destino):
+        os.makedirs(os.path.dirname(storage.path(destino)), exist_ok=True)
+        os.replace(storage.path(origen), storage.path(destino))
+
+    def handle(self, *args, **options):
+        storage = almacenamiento_imagenes
+        destinos = {}
+        for nombre in self.nombres_en_uso(storage):
+            if not storage.exists(nombre):
+                self.stderr.write(f"No existe el archivo {nombre}")
+                continue
+            with storage.open(nombre, 'rb') as archivo:
+                destino = nombre_por_contenido(nombre, digest_de(archivo))
+            if destino != nombre:
+                destinos[nombre] = destino
+
+        liberados = 0
+        vistos = set()
+        for nombre, destino in destinos.items():
+            repetida = destino in vistos or storage.exists(destino)
+            vistos.add(destino)
+            if repetida:
+                liberados += storage.size(nombre)
+            self.stdout.write(f"{nombre} → {destino}{' (repetida)' if repetida else ''}")
+            if options['dry_run']:
+                continue
+
+            if repetida:
+                storage.delete(nombre)
+            else:
+                self.mover(storage, nombre, destino)
+            for tamano in TAMANOS:
+                derivada = ruta_derivada(nombre, tamano)
+                if not storage.exists(derivada):
+                    continue
+                if storage.exists(ruta_derivada(destino, tamano)):
+                    storage.delete(derivada)
+                else:
+                    self.mover(storage, derivada, ruta_derivada(destino, tamano))
+            listas = all(storage.exists(ruta_derivada(destino, t)) for t in TAMANOS)
+            with transaction.atomic():
+                for modelo, campo in storage.campos_que_lo_usan():
+                    modelo._default_manager.filter(**{campo.name: nombre}).update(
+                        **{campo.name: destino, 'derivadas_listas': listas}
+                    )
+
+        if options['borrar_huerfanos']:
+            for nombre in sorted(set(self.huerfanos(storage))):
+                liberados += storage.size(nombre)
+                self.stdout.write(f"{nombre} (sin usar)")
+                if not options['dry_run']:
+                    storage.delete(nombre)
+                    eliminar_derivadas(nombre, storage)
+
+        accion = "se liberarían" if options['dry_run'] else "liberados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(destinos)} imágenes revisadas, {liberados / 1024:.0f} KB {accion} por archivos repetidos o sin usar."
+        ))
@@ -0,0 +1,72 @@
+# historias/management/commands/generar_derivadas.py
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import django
+from django.core.management.base import BaseCommand
+
+from consultorio_dental.almacenamiento import almacenamiento_imagenes
+from consultorio_dental.imagenes import TAMANOS, generar_derivadas, ruta_derivada
+from historias.models import ImagenHistoria
+from notas.models import ImagenNota
+
+
+def marcar_derivadas_listas(nombre):
+    ImagenHistoria.objects.filter(imagen=nombre).update(derivadas_listas=True)
+    ImagenNota.objects.filter(imagen_local=nombre).update(derivadas_listas=True)
+
+
+def _procesar(nombre):
+    # Se ejecuta en otro proceso: devuelve (nombre, bytes escritos, error)
+    try:
+        return nombre, generar_derivadas(nombre, almacenamiento_imagenes), None
+    except Exception as e:
+        return nombre, 0, str(e)
+
+
+class Command(BaseCommand):
+    help = "Genera miniaturas y versiones medianas de las imágenes de historias y notas ya subidas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+        parser.add_argument(
+            '--rehacer',
+            action='store_true',
+            help='Regenera también las imágenes que ya tienen derivadas'
+        )
+
+    def pendientes(self, rehacer):
+        historias = ImagenHistoria.objects.exclude(imagen='')
+        notas = ImagenNota.objects.exclude(imagen_local='').exclude(imagen_local__isnull=True)
+        if not rehacer:
+            historias = historias.filter(derivadas_listas=False)
+            notas = notas.filter(derivadas_listas=False)
+        nombres = set(historias.values_list('imagen', flat=True)) | set(
+            notas.values_list('imagen_local', flat=True)
+        )
+        for nombre in sorted(nombres):
+            if not almacenamiento_imagenes.exists(nombre):
+                self.stderr.write(f"No existe el archivo {nombre}")
+                continue
+            if rehacer or not all(almacenamiento_imagenes.exists(ruta_derivada(nombre, t)) for t in TAMANOS):
+                yield nombre
+            else:
+                marcar_derivadas_listas(nombre)
+
+    def handle(self, *args, **options):
+        nombres = list(self.pendientes(options['rehacer']))
+        total_bytes = 0
+        errores = 0
+        with ProcessPoolExecutor(max_workers=options['procesos'], initializer=django.setup) as pool:
+            for nombre, escritos, error in pool.map(_procesar, nombres):
+                if error:
+                    errores += 1
+                    self.stderr.write(f"{nombre}: {error}")
+                else:
+                    marcar_derivadas_listas(nombre)
+                    total_bytes += escritos
+                    self.stdout.write(f"{nombre}: {escritos / 1024:.0f} KB en derivadas")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(nombres) - errores} imágenes procesadas ({total_bytes / 1024:.0f} KB), {errores} con error."
+        ))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:50
+
+import consultorio_dental.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historias', '0002_alter_imagenhistoria_imagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagenhistoria',
+            name='imagen',
+            field=models.ImageField(blank=True, db_index=True, storage=consultorio_dental.almacenamiento.AlmacenamientoDeduplicado(), upload_to='historias/imagenes/', verbose_name='Imagen (radiografía, foto, etc.)'),
+        ),
+    ]
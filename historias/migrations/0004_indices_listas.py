@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('historias', '0003_imagen_deduplicada'),
+        ('pacientes', '0004_indices_listas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entradahistoria',
+            index=models.Index(fields=['-fecha'], name='entrada_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entradahistoria',
+            index=models.Index(fields=['paciente', '-fecha'], name='entrada_paciente_fecha_idx'),
+        ),
+    ]
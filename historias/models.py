@@ -3,6 +3,8 @@
 from django.db import models
 from django.urls import reverse
 from pacientes.models import Paciente
+from consultorio_dental.almacenamiento import almacenamiento_imagenes
+from consultorio_dental.imagenes import ImagenConDerivadasMixin
 
 class EntradaHistoria(models.Model):
     paciente = models.ForeignKey(
@@ -35,6 +37,10 @@ class EntradaHistoria(models.Model):
         verbose_name = "Entrada de Historia Clínica"
         verbose_name_plural = "Entradas de Historia Clínica"
         ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['-fecha'], name='entrada_fecha_idx'),
+            models.Index(fields=['paciente', '-fecha'], name='entrada_paciente_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Entrada del {self.fecha.strftime('%d/%m/%Y %H:%M')} - {self.paciente.nombre_completo}"
@@ -43,7 +49,7 @@ class EntradaHistoria(models.Model):
         return reverse('historias:detalle_entrada', kwargs={'pk': self.pk})
 
 
-class ImagenHistoria(models.Model):
+class ImagenHistoria(ImagenConDerivadasMixin, models.Model):
     entrada = models.ForeignKey(
         EntradaHistoria,
         on_delete=models.CASCADE,
@@ -52,9 +58,16 @@ class ImagenHistoria(models.Model):
     )
     imagen = models.ImageField(
         upload_to='historias/imagenes/',
+        storage=almacenamiento_imagenes,
+        db_index=True,  # las filas que lo usan son su contador de referencias
         verbose_name="Imagen (radiografía, foto, etc.)",
         blank=True  # ← ¡Añade esta línea!
     )
+    derivadas_listas = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Ya existen la miniatura y la versión mediana de la imagen"
+    )
     descripcion = models.CharField(
         max_length=100,
         blank=True,
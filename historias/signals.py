@@ -0,0 +1,12 @@
+# historias/signals.py
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import ImagenHistoria
+
+
+@receiver(post_delete, sender=ImagenHistoria)
+def liberar_imagen(sender, instance, **kwargs):
+    # El archivo se borra solo si ninguna otra fila usa el mismo contenido
+    instance.liberar_archivo()
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from notas.models import Nota, ImagenNota
+from pacientes.models import Paciente
+from consultorio_dental.imagenes import ruta_derivada
+from consultorio_dental.pruebas import PlanDeConsultaMixin, crear_paciente, queryset_de_vista
+from .forms import ImagenHistoriaForm
+from .management.commands import generar_derivadas
+from .models import EntradaHistoria, ImagenHistoria
+from .views import ListaEntradasView
+
+
+def jpeg_de_prueba(ancho=3000, alto=2000, orientacion=None):
+    imagen = Image.new('RGB', (ancho, alto), 'white')
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camara de prueba'
+    if orientacion:
+        exif[0x0112] = orientacion
+    imagen.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class DerivadasImagenTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        paciente = Paciente.objects.create(
+            nombre_completo='Paciente Imagen', dni='40000001', fecha_nacimiento='1990-01-01',
+            genero='F', estado_civil='S',
+        )
+        self.entrada = EntradaHistoria.objects.create(
+            paciente=paciente, motivo='Control', diagnostico='Sano'
+        )
+
+    def subir(self, contenido):
+        return ImagenHistoria.objects.create(
+            entrada=self.entrada,
+            imagen=SimpleUploadedFile('radiografia.jpg', contenido, content_type='image/jpeg'),
+        )
+
+    def test_genera_miniatura_y_media_al_subir(self):
+        imagen = self.subir(jpeg_de_prueba())
+        self.assertIn('/derivadas/', imagen.thumbnail_url)
+        self.assertTrue(imagen.thumbnail_url.endswith('_miniatura.webp'))
+        with Image.open(imagen.imagen.storage.path(ruta_derivada(imagen.imagen.name, 'media'))) as media:
+            self.assertEqual(media.size, (1280, 853))
+            self.assertEqual(media.format, 'WEBP')
+            self.assertEqual(len(media.getexif()), 0)
+        self.assertIn('320w', imagen.srcset)
+
+    def test_respeta_la_orientacion_exif(self):
+        # Orientación 6: la cámara guardó la foto girada 90°
+        imagen = self.subir(jpeg_de_prueba(orientacion=6))
+        ruta = imagen.imagen.storage.path(ruta_derivada(imagen.imagen.name, 'miniatura'))
+        with Image.open(ruta) as miniatura:
+            self.assertEqual(miniatura.size, (213, 320))
+
+    def test_archivo_no_valido_no_rompe_la_subida(self):
+        with self.assertLogs('consultorio_dental.imagenes', 'WARNING'):
+            imagen = self.subir(b'no es una imagen')
+        self.assertEqual(imagen.thumbnail_url, imagen.imagen.url)
+        self.assertFalse(imagen.derivadas_listas)
+
+    def test_derivadas_distintas_por_extension(self):
+        self.assertNotEqual(
+            ruta_derivada('historias/imagenes/a.jpg', 'miniatura'),
+            ruta_derivada('historias/imagenes/a.png', 'miniatura'),
+        )
+
+    def test_urls_sin_consultar_el_disco(self):
+        imagen = ImagenHistoria.objects.get(pk=self.subir(jpeg_de_prueba(400, 300)).pk)
+        self.assertTrue(imagen.derivadas_listas)
+        with mock.patch.object(imagen.imagen.storage, 'exists') as exists:
+            self.assertIn('_jpg_miniatura.webp 320w', imagen.srcset)
+        exists.assert_not_called()
+
+    def test_comando_usa_el_almacenamiento_de_imagenes(self):
+        imagen = self.subir(jpeg_de_prueba(400, 300))
+        nombre = imagen.imagen.name
+        shutil.rmtree(os.path.join(self.media, os.path.dirname(ruta_derivada(nombre, 'miniatura'))))
+        ImagenHistoria.objects.filter(pk=imagen.pk).update(derivadas_listas=False)
+        # default_storage no debe tocarse: las imágenes viven en almacenamiento_imagenes
+        sin_uso = mock.Mock(spec=[])
+        with mock.patch('consultorio_dental.imagenes.default_storage', sin_uso), \
+                mock.patch.object(generar_derivadas, 'default_storage', sin_uso, create=True):
+            self.assertEqual(list(generar_derivadas.Command().pendientes(rehacer=False)), [nombre])
+            _, escritos, error = generar_derivadas._procesar(nombre)
+        self.assertIsNone(error)
+        self.assertGreater(escritos, 0)
+        self.assertTrue(imagen.imagen.storage.exists(ruta_derivada(nombre, 'media')))
+
+
+@override_settings(IMAGENES_MAX_LADO=1000, IMAGENES_CALIDAD_JPEG=80, IMAGENES_MAX_MEGAPIXELES=10)
+class SubidaImagenFormTest(TestCase):
+    def formulario(self, nombre, contenido):
+        archivo = SimpleUploadedFile(nombre, contenido, content_type='image/jpeg')
+        return ImagenHistoriaForm(data={'descripcion': 'Foto'}, files={'imagen': archivo})
+
+    def test_reduce_y_recomprime_al_subir(self):
+        original = jpeg_de_prueba(3000, 2000, orientacion=6)
+        form = self.formulario('foto.jpg', original)
+        with self.assertLogs('consultorio_dental.imagenes', 'INFO') as logs:
+            self.assertTrue(form.is_valid(), form.errors)
+        archivo = form.cleaned_data['imagen']
+        self.assertLess(archivo.size, len(original))
+        self.assertIn('bytes ahorrados', logs.output[0])
+        with Image.open(archivo) as imagen:
+            self.assertEqual(imagen.size, (667, 1000))
+            self.assertEqual(len(imagen.getexif()), 0)
+
+    def test_rechaza_imagenes_con_demasiados_pixeles(self):
+        form = self.formulario('enorme.jpg', jpeg_de_prueba(4000, 3000))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['imagen'][0].code, 'imagen_demasiado_grande')
+
+    def test_rechaza_archivos_que_no_son_imagenes(self):
+        form = self.formulario('falso.jpg', b'no es una imagen')
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['imagen'][0].code, 'invalid_image')
+
+    def test_png_con_transparencia_sigue_siendo_png(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (1500, 500), (0, 0, 0, 0)).save(buffer, 'PNG')
+        form = self.formulario('esquema.png', buffer.getvalue())
+        self.assertTrue(form.is_valid(), form.errors)
+        archivo = form.cleaned_data['imagen']
+        self.assertTrue(archivo.name.endswith('.png'))
+        with Image.open(archivo) as imagen:
+            self.assertEqual((imagen.format, imagen.size), ('PNG', (1000, 333)))
+
+
+class AlmacenamientoDeduplicadoTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        paciente = Paciente.objects.create(
+            nombre_completo='Paciente Repetido', dni='40000002', fecha_nacimiento='1990-01-01',
+            genero='F', estado_civil='S',
+        )
+        self.entrada = EntradaHistoria.objects.create(paciente=paciente, motivo='Control', diagnostico='Sano')
+        self.nota = Nota.objects.create(paciente=paciente, titulo='Nota', contenido='...')
+        self.contenido = jpeg_de_prueba(400, 300)
+
+    def test_misma_imagen_un_solo_archivo(self):
+        historia = ImagenHistoria.objects.create(
+            entrada=self.entrada, imagen=SimpleUploadedFile('a.jpg', self.contenido)
+        )
+        nota = ImagenNota.objects.create(
+            nota=self.nota, imagen_local=SimpleUploadedFile('otro_nombre.JPG', self.contenido)
+        )
+        self.assertEqual(historia.imagen.name, nota.imagen_local.name)
+        self.assertTrue(historia.imagen.name.startswith('imagenes/'))
+
+    def test_borra_el_archivo_con_la_ultima_referencia(self):
+        primera = ImagenHistoria.objects.create(
+            entrada=self.entrada, imagen=SimpleUploadedFile('a.jpg', self.contenido)
+        )
+        ImagenNota.objects.create(
+            nota=self.nota, imagen_local=SimpleUploadedFile('b.jpg', self.contenido)
+        )
+        storage = primera.imagen.storage
+        nombre = primera.imagen.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primera.delete()
+        self.assertTrue(storage.exists(nombre))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.nota.delete()
+        self.assertFalse(storage.exists(nombre))
+        self.assertFalse(storage.exists(ruta_derivada(nombre, 'miniatura')))
+
+    def test_vaciar_el_campo_libera_el_archivo(self):
+        imagen = ImagenHistoria.objects.create(
+            entrada=self.entrada, imagen=SimpleUploadedFile('a.jpg', self.contenido)
+        )
+        nombre = imagen.imagen.name
+        imagen.imagen = None
+        with self.captureOnCommitCallbacks(execute=True):
+            imagen.save()
+        self.assertFalse(imagen.imagen.storage.exists(nombre))
+        self.assertFalse(imagen.derivadas_listas)
+
+    def test_subida_que_reutiliza_el_archivo_antes_del_borrado(self):
+        primera = ImagenHistoria.objects.create(
+            entrada=self.entrada, imagen=SimpleUploadedFile('a.jpg', self.contenido)
+        )
+        storage = primera.imagen.storage
+        nombre = primera.imagen.name
+        with self.captureOnCommitCallbacks() as pendientes:
+            primera.delete()
+        # Otra subida del mismo contenido llega antes de que corra el borrado pendiente
+        ImagenNota.objects.create(nota=self.nota, imagen_local=SimpleUploadedFile('b.jpg', self.contenido))
+        for callback in pendientes:
+            callback()
+        self.assertTrue(storage.exists(nombre))
+        self.assertTrue(storage.exists(ruta_derivada(nombre, 'miniatura')))
+
+
+class ServirMediaTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        self.contenido = bytes(range(256)) * 40
+        self.digest = 'ab' * 32
+        os.makedirs(os.path.join(self.media, 'imagenes', 'ab'))
+        with open(os.path.join(self.media, 'imagenes', 'ab', f'{self.digest}.jpg'), 'wb') as archivo:
+            archivo.write(self.contenido)
+        with open(os.path.join(self.media, 'viejo.jpg'), 'wb') as archivo:
+            archivo.write(self.contenido)
+        usuario = User.objects.create_user('doctora', password='clave-segura')
+        self.client.force_login(usuario)
+        self.url = f'/media/imagenes/ab/{self.digest}.jpg'
+
+    def test_exige_sesion(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn('login', response['Location'])
+
+    def test_archivo_completo_con_cache_inmutable(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.contenido)
+        self.assertEqual(response['ETag'], f'"{self.digest}"')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_archivo_sin_hash_se_revalida(self):
+        response = self.client.get('/media/viejo.jpg')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        response = self.client.get('/media/viejo.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_derivada_se_revalida(self):
+        # generar_derivadas --rehacer reescribe la derivada con el mismo nombre
+        os.makedirs(os.path.join(self.media, 'imagenes', 'ab', 'derivadas'))
+        ruta = os.path.join(self.media, 'imagenes', 'ab', 'derivadas', f'{self.digest}_jpg_miniatura.webp')
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'version 1')
+        url = f'/media/imagenes/ab/derivadas/{self.digest}_jpg_miniatura.webp'
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        with open(ruta, 'wb') as archivo:
+            archivo.write(b'version 2, regenerada')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_rangos(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.contenido[100:200])
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.contenido)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.contenido[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.contenido)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # If-Range con otro ETag: el archivo cambió, se envía completo
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_sale_de_media_root(self):
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/no-existe.jpg').status_code, 404)
+
+
+class PlanesListaEntradasTest(PlanDeConsultaMixin, TestCase):
+    def test_lista_de_entradas(self):
+        self.assertUsaIndice(queryset_de_vista(ListaEntradasView, '/'))
+        self.assertUsaIndice(queryset_de_vista(ListaEntradasView, '/', paciente_id=crear_paciente().pk))
@@ -9,17 +9,20 @@ from django.http import HttpResponseRedirect
 from pacientes.models import Paciente
 from .models import EntradaHistoria, ImagenHistoria
 from .forms import EntradaHistoriaForm, ImagenHistoriaForm
+from consultorio_dental.paginacion import PaginacionPorCursorMixin
 
 # ===== VISTAS DE ENTRADAS =====
 
 from django.db.models import Q
 from datetime import date
 
-class ListaEntradasView(ListView):
+class ListaEntradasView(PaginacionPorCursorMixin, ListView):
     model = EntradaHistoria
     template_name = 'historias/lista_entradas.html'
     context_object_name = 'entradas'
     paginate_by = 10
+    orden_cursor = ('-fecha', 'pk')
+    limite_conteo = 1000
 
     def get_queryset(self):
         paciente_id = self.kwargs.get('paciente_id')
@@ -53,7 +56,7 @@ class ListaEntradasView(ListView):
         if fecha_fin:
             queryset = queryset.filter(fecha__date__lte=fecha_fin)
 
-        return queryset.order_by('-fecha')
+        return queryset.order_by(*self.orden_cursor)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
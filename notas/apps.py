@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class NotasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notas'
-    verbose_name = '4. Notas'
\ No newline at end of file
+    verbose_name = '4. Notas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,4 +1,5 @@
 from django import forms
+from consultorio_dental.imagenes import ImagenOptimizadaField
 from .models import Nota, ImagenNota
 from pacientes.models import Paciente
 
@@ -23,7 +24,7 @@ class NotaForm(forms.ModelForm):
 
 class ImagenNotaForm(forms.ModelForm):
     # Campos separados para cada tipo de imagen
-    imagen_local = forms.ImageField(
+    imagen_local = ImagenOptimizadaField(
         required=False,
         widget=forms.FileInput(attrs={'class': 'form-control'})
     )
@@ -0,0 +1,197 @@
+# notas/imagenes_externas.py
+"""
+Copia local de las imágenes externas (Google Drive) de las notas.
+
+En lugar de que cada navegador pida la imagen a Drive en cada visita, el servidor
+la descarga una vez, guarda una versión reducida en WebP y la sirve desde
+`notas:imagen_externa` con caché de navegador larga.
+
+- Una copia vale IMAGENES_EXTERNAS_TTL segundos (fecha de modificación del archivo);
+  vencida se vuelve a descargar, y si Drive falla se sigue usando la vieja.
+- La carpeta no pasa de IMAGENES_EXTERNAS_MAX_MB: al llenarse se borran primero las
+  copias usadas hace más tiempo (fecha de acceso, que se actualiza en cada uso).
+- Solo se descargan enlaces de Drive o de los hosts de IMAGENES_EXTERNAS_HOSTS, por
+  https, también al seguir redirecciones: la URL la escribe el usuario y el servidor
+  no debe pedir direcciones internas (localhost, 169.254.169.254...). Cualquier otra
+  lanza ImagenExternaNoDisponible y la vista redirige el navegador al original.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import time
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from django.conf import settings
+from PIL import Image, ImageOps
+
+from consultorio_dental.imagenes import TAMANOS
+
+logger = logging.getLogger(__name__)
+
+_DRIVE_ARCHIVO = re.compile(r'drive\.google\.com/(?:file/d/|open\?id=|uc\?(?:[^#]*&)?id=)([\w-]+)')
+
+CALIDAD_WEBP = 80
+ESQUEMAS_PERMITIDOS = {'https'}
+MAX_REDIRECCIONES = 5
+
+
+class ImagenExternaNoDisponible(Exception):
+    pass
+
+
+def permitida(url):
+    """Si el servidor puede pedir `url`: https y un host de IMAGENES_EXTERNAS_HOSTS."""
+    partes = urlsplit(url)
+    host = (partes.hostname or '').lower()
+    # Como en ALLOWED_HOSTS, '.dominio.com' acepta también los subdominios
+    return partes.scheme in ESQUEMAS_PERMITIDOS and any(
+        host == permitido or (permitido.startswith('.') and host.endswith(permitido))
+        for permitido in settings.IMAGENES_EXTERNAS_HOSTS
+    )
+
+
+def url_de_descarga(url):
+    """
+    Enlace de descarga directa de `url` (los enlaces de vista de Drive se convierten).
+    Lanza ImagenExternaNoDisponible si no es una URL que el servidor pueda pedir.
+    """
+    coincidencia = _DRIVE_ARCHIVO.search(url)
+    if coincidencia:
+        return f"https://drive.google.com/uc?export=download&id={coincidencia.group(1)}"
+    if not permitida(url):
+        raise ImagenExternaNoDisponible(f"No se descargan imágenes de {url}")
+    return url
+
+
+def _pedir(url):
+    """GET de `url` siguiendo a mano las redirecciones, cada una solo a una URL permitida."""
+    destino = url_de_descarga(url)
+    for _ in range(MAX_REDIRECCIONES + 1):
+        response = requests.get(
+            destino, stream=True, timeout=settings.IMAGENES_EXTERNAS_TIMEOUT, allow_redirects=False
+        )
+        if not response.is_redirect:
+            return response
+        response.close()
+        destino = urljoin(destino, response.headers['Location'])
+        if not permitida(destino):
+            raise ImagenExternaNoDisponible(f"Redirección a una URL no permitida: {destino}")
+    raise ImagenExternaNoDisponible(f"Demasiadas redirecciones al descargar {url}")
+
+
+def clave(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def _carpeta():
+    carpeta = settings.IMAGENES_EXTERNAS_DIR
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _ruta(url):
+    return os.path.join(_carpeta(), f'{clave(url)}.webp')
+
+
+def _descargar(url):
+    """Descarga la imagen y devuelve los bytes de su versión reducida en WebP."""
+    limite = settings.IMAGENES_EXTERNAS_MAX_DESCARGA_MB * 1024 * 1024
+    with _pedir(url) as response:
+        response.raise_for_status()
+        contenido = io.BytesIO()
+        for bloque in response.iter_content(64 * 1024):
+            contenido.write(bloque)
+            if contenido.tell() > limite:
+                raise ImagenExternaNoDisponible(f"La imagen supera {settings.IMAGENES_EXTERNAS_MAX_DESCARGA_MB} MB")
+
+    contenido.seek(0)
+    imagen = Image.open(contenido)
+    if imagen.width * imagen.height > settings.IMAGENES_MAX_MEGAPIXELES * 1_000_000:
+        raise ImagenExternaNoDisponible(f"Imagen demasiado grande ({imagen.width}×{imagen.height} px)")
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+    lado = TAMANOS['media']
+    imagen.thumbnail((lado, lado), Image.LANCZOS)
+    salida = io.BytesIO()
+    imagen.save(salida, 'WEBP', quality=CALIDAD_WEBP, method=4)
+    return salida.getvalue()
+
+
+def _guardar(ruta, datos):
+    # Archivo temporal + replace: otra petición nunca ve una copia a medio escribir
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as archivo:
+        archivo.write(datos)
+    os.replace(temporal, ruta)
+
+
+def recortar_cache(max_bytes=None, conservar=None):
+    """
+    Borra las copias usadas hace más tiempo hasta quedar bajo el límite (nunca
+    `conservar`, la que se está por servir). Devuelve cuántas borró.
+    """
+    if max_bytes is None:
+        max_bytes = settings.IMAGENES_EXTERNAS_MAX_MB * 1024 * 1024
+    copias = []
+    total = 0
+    with os.scandir(_carpeta()) as entradas:
+        for entrada in entradas:
+            if entrada.is_file() and entrada.name.endswith('.webp'):
+                datos = entrada.stat()
+                total += datos.st_size
+                if entrada.path != conservar:
+                    copias.append((datos.st_atime, datos.st_size, entrada.path))
+    if total <= max_bytes:
+        return 0
+
+    borradas = 0
+    for _, tamano, ruta in sorted(copias):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamano
+        borradas += 1
+        if total <= max_bytes:
+            break
+    logger.info(f"Caché de imágenes externas: {borradas} copias borradas por espacio")
+    return borradas
+
+
+def obtener_imagen(url):
+    """
+    Ruta local de la copia de `url`, descargándola si no existe o ya venció.
+    Lanza ImagenExternaNoDisponible si no hay copia y no se pudo descargar.
+    """
+    ruta = _ruta(url)
+    ahora = time.time()
+    try:
+        modificada = os.stat(ruta).st_mtime
+    except FileNotFoundError:
+        modificada = None
+
+    descargada = False
+    if modificada is None or ahora - modificada > settings.IMAGENES_EXTERNAS_TTL:
+        try:
+            _guardar(ruta, _descargar(url))
+            modificada = ahora
+            descargada = True
+        except Exception as e:
+            if modificada is None:
+                raise ImagenExternaNoDisponible(str(e)) from e
+            logger.warning(f"No se pudo actualizar la copia de {url}, se usa la anterior: {e}")
+
+    # Marca el uso para el LRU sin tocar la fecha de descarga (que controla el TTL)
+    try:
+        os.utime(ruta, (ahora, modificada))
+    except FileNotFoundError:
+        raise ImagenExternaNoDisponible(f"La copia de {url} se borró mientras se usaba")
+    if descargada:
+        recortar_cache(conservar=ruta)
+    return ruta
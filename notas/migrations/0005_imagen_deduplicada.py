@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:50
+
+import consultorio_dental.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notas', '0004_remove_imagennota_imagen_imagennota_imagen_local_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagennota',
+            name='imagen_local',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=consultorio_dental.almacenamiento.AlmacenamientoDeduplicado(), upload_to='notas/imagenes/', verbose_name='Imagen local (opcional)'),
+        ),
+    ]
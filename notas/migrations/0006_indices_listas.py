@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notas', '0005_imagen_deduplicada'),
+        ('pacientes', '0004_indices_listas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['-creado_en'], name='nota_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nota',
+            index=models.Index(fields=['paciente', '-creado_en'], name='nota_paciente_creado_idx'),
+        ),
+    ]
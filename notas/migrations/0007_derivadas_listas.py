@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notas', '0006_indices_listas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagennota',
+            name='derivadas_listas',
+            field=models.BooleanField(default=False, editable=False, help_text='Ya existen la miniatura y la versión mediana de la imagen'),
+        ),
+    ]
@@ -1,8 +1,12 @@
 # notas/models.py
 
+import hashlib
+
 from django.db import models
 from django.urls import reverse
 from pacientes.models import Paciente
+from consultorio_dental.almacenamiento import almacenamiento_imagenes
+from consultorio_dental.imagenes import ImagenConDerivadasMixin
 
 class Nota(models.Model):
     paciente = models.ForeignKey(
@@ -33,6 +37,10 @@ class Nota(models.Model):
         verbose_name = "Nota"
         verbose_name_plural = "Notas"
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['-creado_en'], name='nota_creado_idx'),
+            models.Index(fields=['paciente', '-creado_en'], name='nota_paciente_creado_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titulo} - {self.creado_en.strftime('%d/%m/%Y')}"
@@ -41,7 +49,9 @@ class Nota(models.Model):
         return reverse('notas:detalle', kwargs={'pk': self.pk})
 
 
-class ImagenNota(models.Model):
+class ImagenNota(ImagenConDerivadasMixin, models.Model):
+    campo_imagen = 'imagen_local'
+
     nota = models.ForeignKey(
         Nota,
         on_delete=models.CASCADE,
@@ -50,10 +60,17 @@ class ImagenNota(models.Model):
     )
     imagen_local = models.ImageField(
         upload_to='notas/imagenes/',
+        storage=almacenamiento_imagenes,
+        db_index=True,  # las filas que lo usan son su contador de referencias
         verbose_name="Imagen local (opcional)",
         blank=True,
         null=True
     )
+    derivadas_listas = models.BooleanField(
+        default=False,
+        editable=False,
+        help_text="Ya existen la miniatura y la versión mediana de la imagen"
+    )
     imagen_url = models.URLField(
         verbose_name="URL de imagen (Google Drive o servicio externo)",
         blank=True,
@@ -105,12 +122,8 @@ class ImagenNota(models.Model):
         if self.imagen_local:
             return self.imagen_local.url
         elif self.imagen_url:
-            # Convertir enlace de vista a imagen directa si es de Google Drive
-            if 'drive.google.com' in self.imagen_url and '/file/d/' in self.imagen_url:
-                # Convertir: /file/d/ID/view → /uc?id=ID
-                import re
-                match = re.search(r'/file/d/([^/]+)/', self.imagen_url)
-                if match:
-                    return f"https://drive.google.com/uc?id={match.group(1)}"
-            return self.imagen_url
-        return None
\ No newline at end of file
+            # Copia local servida por el propio sitio (ver notas/imagenes_externas.py);
+            # `v` cambia con la URL (la caché del navegador dura lo que le queda a la copia)
+            version = hashlib.sha256(self.imagen_url.encode()).hexdigest()[:12]
+            return f"{reverse('notas:imagen_externa', kwargs={'pk': self.pk})}?v={version}"
+        return None
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from consultorio_dental.pruebas import PlanDeConsultaMixin, crear_paciente, queryset_de_vista
+from . import imagenes_externas
+from .imagenes_externas import ImagenExternaNoDisponible, obtener_imagen, recortar_cache, url_de_descarga
+from .models import Nota, ImagenNota
+from .views import ListaNotasView
+
+
+def png_de_prueba(ancho, alto):
+    buffer = io.BytesIO()
+    Image.new('RGB', (ancho, alto), 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ServidorImagenes:
+    """Servidor HTTP local que hace de Google Drive."""
+
+    def __init__(self):
+        self.imagenes = {'/a.png': png_de_prueba(2000, 1000), '/b.png': png_de_prueba(50, 50)}
+        self.peticiones = []
+        self.redirecciones = {}
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor.peticiones.append(self.path)
+                if self.path in servidor.redirecciones:
+                    self.send_response(302)
+                    self.send_header('Location', servidor.redirecciones[self.path])
+                    self.end_headers()
+                    return
+                contenido = servidor.imagenes.get(self.path)
+                if contenido is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.end_headers()
+                self.wfile.write(contenido)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ImagenesExternasTest(TestCase):
+    def setUp(self):
+        self.servidor = ServidorImagenes()
+        self.addCleanup(self.servidor.cerrar)
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta)
+        # El servidor de prueba hace de host permitido, aunque sea http y local
+        ajuste = override_settings(
+            IMAGENES_EXTERNAS_DIR=carpeta, IMAGENES_EXTERNAS_TTL=3600, IMAGENES_EXTERNAS_HOSTS=['127.0.0.1'],
+        )
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        esquemas = mock.patch.object(imagenes_externas, 'ESQUEMAS_PERMITIDOS', {'http', 'https'})
+        esquemas.start()
+        self.addCleanup(esquemas.stop)
+        nota = Nota.objects.create(titulo='Nota', contenido='...')
+        self.imagen = ImagenNota.objects.create(nota=nota, imagen_url=f'{self.servidor.base}/a.png')
+        self.client.force_login(User.objects.create_user('doctora', password='clave-segura'))
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        response = self.client.get(self.imagen.imagen_para_mostrar)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+        self.assertEqual(self.servidor.peticiones, [])
+
+    def test_enlaces_de_drive(self):
+        self.assertEqual(
+            url_de_descarga('https://drive.google.com/file/d/1AbC-d_E/view?usp=sharing'),
+            'https://drive.google.com/uc?export=download&id=1AbC-d_E',
+        )
+        with override_settings(IMAGENES_EXTERNAS_HOSTS=['.example.com']):
+            self.assertEqual(url_de_descarga('https://img.example.com/x.jpg'), 'https://img.example.com/x.jpg')
+
+    @override_settings(IMAGENES_EXTERNAS_HOSTS=['drive.google.com'])
+    def test_no_pide_urls_internas_ni_ajenas(self):
+        with mock.patch.object(imagenes_externas, 'ESQUEMAS_PERMITIDOS', {'https'}):
+            for url in (self.imagen.imagen_url, 'https://localhost/a.png',
+                        'https://169.254.169.254/latest/meta-data/', 'https://example.com/x.jpg'):
+                with self.subTest(url=url), self.assertRaises(ImagenExternaNoDisponible):
+                    url_de_descarga(url)
+            with self.assertLogs('notas.views', 'WARNING'):
+                response = self.client.get(reverse('notas:imagen_externa', kwargs={'pk': self.imagen.pk}))
+        self.assertRedirects(response, self.imagen.imagen_url, fetch_redirect_response=False)
+        self.assertEqual(self.servidor.peticiones, [])
+
+    def test_no_sigue_redirecciones_a_hosts_no_permitidos(self):
+        # 'localhost' es el mismo servidor, pero no está en IMAGENES_EXTERNAS_HOSTS
+        puerto = self.servidor.httpd.server_address[1]
+        self.servidor.redirecciones['/redirige'] = f'http://localhost:{puerto}/a.png'
+        with self.assertRaises(ImagenExternaNoDisponible):
+            obtener_imagen(f'{self.servidor.base}/redirige')
+        self.assertEqual(self.servidor.peticiones, ['/redirige'])
+
+    def test_descarga_una_vez_y_sirve_copia_reducida(self):
+        url = self.imagen.imagen_para_mostrar
+        self.assertTrue(url.startswith(reverse('notas:imagen_externa', kwargs={'pk': self.imagen.pk})))
+        for _ in range(2):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.servidor.peticiones, ['/a.png'])
+        # Sin immutable: el navegador la guarda lo que le queda del TTL de la copia
+        self.assertRegex(response['Cache-Control'], r'^private, max-age=3(599|600)$')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as copia:
+            self.assertEqual((copia.format, copia.size), ('WEBP', (1280, 640)))
+
+    def test_copia_vencida_se_vuelve_a_descargar(self):
+        ruta = obtener_imagen(self.imagen.imagen_url)
+        os.utime(ruta, (0, 0))
+        obtener_imagen(self.imagen.imagen_url)
+        self.assertEqual(len(self.servidor.peticiones), 2)
+
+    def test_si_falla_la_descarga_redirige_al_original(self):
+        self.imagen.imagen_url = f'{self.servidor.base}/no-existe.png'
+        self.imagen.save()
+        response = self.client.get(reverse('notas:imagen_externa', kwargs={'pk': self.imagen.pk}))
+        self.assertRedirects(response, self.imagen.imagen_url, fetch_redirect_response=False)
+
+    def test_recorte_borra_las_menos_usadas(self):
+        vieja = obtener_imagen(f'{self.servidor.base}/a.png')
+        nueva = obtener_imagen(f'{self.servidor.base}/b.png')
+        os.utime(vieja, (1, os.stat(vieja).st_mtime))
+        self.assertEqual(recortar_cache(max_bytes=os.path.getsize(nueva)), 1)
+        self.assertFalse(os.path.exists(vieja))
+        self.assertTrue(os.path.exists(nueva))
+
+
+class PlanesListaNotasTest(PlanDeConsultaMixin, TestCase):
+    def test_lista_de_notas(self):
+        self.assertUsaIndice(queryset_de_vista(ListaNotasView, '/'))
+        self.assertUsaIndice(queryset_de_vista(ListaNotasView, '/', paciente_id=crear_paciente().pk))
+
+
+class PaginacionPorCursorTest(TestCase):
+    def setUp(self):
+        paciente = crear_paciente()
+        notas = [Nota.objects.create(paciente=paciente, titulo=f'Nota {i}', contenido='.') for i in range(25)]
+        # Varias notas con la misma fecha: el desempate por id no debe saltar ni repetir filas
+        Nota.objects.filter(pk__in=[n.pk for n in notas[5:15]]).update(creado_en=notas[5].creado_en)
+        self.esperado = list(Nota.objects.order_by('-creado_en', 'pk').values_list('pk', flat=True))
+
+    def recorrer(self, url, enlace):
+        paginas = []
+        while url:
+            page_obj = self.client.get(url).context['page_obj']
+            paginas.append([nota.pk for nota in page_obj])
+            url = getattr(page_obj, enlace) and reverse('notas:lista') + getattr(page_obj, enlace)
+        return paginas
+
+    def test_recorre_todas_las_filas_en_orden(self):
+        paginas = self.recorrer(reverse('notas:lista') + '?q=Nota', 'url_siguiente')
+        self.assertEqual([len(p) for p in paginas], [10, 10, 5])
+        self.assertEqual(sum(paginas, []), self.esperado)
+
+        # Y desde la última, hacia atrás, las mismas páginas
+        ultima = self.client.get(reverse('notas:lista') + '?q=Nota').context['page_obj']
+        ultima = self.client.get(reverse('notas:lista') + ultima.url_siguiente).context['page_obj']
+        ultima = self.client.get(reverse('notas:lista') + ultima.url_siguiente).context['page_obj']
+        self.assertIn('q=Nota', ultima.url_anterior)
+        hacia_atras = self.recorrer(reverse('notas:lista') + ultima.url_anterior, 'url_anterior')
+        self.assertEqual(hacia_atras, paginas[:2][::-1])
+
+    def test_pagina_profunda_misma_cantidad_de_consultas(self):
+        primera = self.client.get(reverse('notas:lista')).context['page_obj']
+        with self.assertNumQueries(2):  # conteo acotado + la página, sin OFFSET
+            self.client.get(reverse('notas:lista') + primera.url_siguiente)
+
+    def test_total_aproximado_y_cursor_invalido(self):
+        with mock.patch.object(ListaNotasView, 'limite_conteo', 20):
+            page_obj = self.client.get(reverse('notas:lista') + '?cursor=basura').context['page_obj']
+        self.assertEqual([n.pk for n in page_obj], self.esperado[:10])
+        self.assertEqual((page_obj.total, page_obj.total_es_minimo), (20, True))
+        self.assertFalse(page_obj.has_previous())
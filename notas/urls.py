@@ -14,4 +14,5 @@ urlpatterns = [
     path('<int:pk>/editar/', views.EditarNotaView.as_view(), name='editar'),
     path('<int:pk>/eliminar/', views.EliminarNotaView.as_view(), name='eliminar'),
     path('subir-imagen-drive/<int:pk>/', views.subir_imagen_drive_view, name='subir_imagen_drive'),
+    path('imagen-externa/<int:pk>/', views.imagen_externa_view, name='imagen_externa'),
 ]
\ No newline at end of file
@@ -1,5 +1,12 @@
 # notas/views.py
 
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.urls import reverse_lazy
@@ -12,6 +19,10 @@ from django.urls import reverse
 from pacientes.models import Paciente
 from .models import Nota, ImagenNota
 from .forms import NotaForm, ImagenNotaForm  # ✅ Importa ambos formularios aquí
+from .imagenes_externas import obtener_imagen, ImagenExternaNoDisponible
+from consultorio_dental.paginacion import PaginacionPorCursorMixin
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -47,11 +58,13 @@ from .forms import NotaForm, ImagenNotaForm
 
 
 
-class ListaNotasView(ListView):
+class ListaNotasView(PaginacionPorCursorMixin, ListView):
     model = Nota
     template_name = 'notas/lista_notas.html'
     context_object_name = 'notas'
     paginate_by = 10
+    orden_cursor = ('-creado_en', 'pk')
+    limite_conteo = 1000
 
     def get_queryset(self):
         paciente_id = self.kwargs.get('paciente_id')
@@ -84,7 +97,7 @@ class ListaNotasView(ListView):
         if fecha_fin:
             queryset = queryset.filter(creado_en__date__lte=fecha_fin)
 
-        return queryset.order_by('-creado_en')
+        return queryset.order_by(*self.orden_cursor)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -252,3 +265,27 @@ def subir_imagen_drive_view(request, pk):
     return render(request, 'notas/subir_imagen_drive.html', {
         'nota': nota
     })
+
+
+@login_required
+def imagen_externa_view(request, pk):
+    """
+    Sirve la copia local de una imagen externa (Drive) de una nota.
+    Solo acepta imágenes ya guardadas en una nota, y solo las descarga de Drive o de
+    IMAGENES_EXTERNAS_HOSTS; las demás redirigen al original (ver imagenes_externas.py).
+    Como /media/, requiere sesión: son imágenes clínicas.
+    """
+    imagen = get_object_or_404(ImagenNota.objects.only('imagen_url'), pk=pk, imagen_url__gt='')
+    try:
+        ruta = obtener_imagen(imagen.imagen_url)
+    except ImagenExternaNoDisponible as e:
+        logger.warning(f"Imagen externa {pk} no disponible: {e}")
+        return redirect(imagen.imagen_url)
+    archivo = open(ruta, 'rb')
+    # La URL lleva ?v=<hash de imagen_url>, que no cambia al renovar la copia: el
+    # navegador la guarda solo lo que le queda de IMAGENES_EXTERNAS_TTL
+    edad = time.time() - os.fstat(archivo.fileno()).st_mtime
+    vigencia = max(int(settings.IMAGENES_EXTERNAS_TTL - edad), 0)
+    response = FileResponse(archivo, content_type='image/webp')
+    response['Cache-Control'] = f'private, max-age={vigencia}'
+    return response
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class PacientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pacientes'
-    verbose_name = '1. Pacientes'
\ No newline at end of file
+    verbose_name = '1. Pacientes'
+
+    def ready(self):
+        from . import signals  # noqa: F401
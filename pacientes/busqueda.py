@@ -0,0 +1,114 @@
+# pacientes/busqueda.py
+"""
+Búsqueda de pacientes por nombre o DNI.
+
+En SQLite los nombres se indexan en una tabla virtual FTS5 (`pacientes_busqueda`)
+cuyo tokenizador ya ignora tildes y mayúsculas, así "perez juan" encuentra a
+"Juan Pérez". La tabla se mantiene con las señales de `pacientes.signals` y se
+puede regenerar con `python manage.py reconstruir_busqueda_pacientes`.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Paciente
+
+TABLA = 'pacientes_busqueda'
+
+
+def usa_fts():
+    return connection.vendor == 'sqlite'
+
+
+def _expresion_fts(texto):
+    # Cada palabra como prefijo entre comillas: evita que el usuario escriba sintaxis FTS
+    palabras = re.findall(r'\w+', texto)
+    return ' '.join(f'"{p}"*' for p in palabras)
+
+
+def _rango_dni(prefijo):
+    # dni >= '4512' AND dni < '4513': usa el índice único de dni (LIKE no lo usa)
+    siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+    return Q(dni__gte=prefijo, dni__lt=siguiente)
+
+
+def buscar_pacientes(texto, queryset=None):
+    """Devuelve los pacientes que coinciden con `texto`, los más relevantes primero."""
+    if queryset is None:
+        queryset = Paciente.objects.all()
+    texto = texto.strip()
+
+    if texto.isdigit():
+        return queryset.filter(_rango_dni(texto)).order_by('dni')
+
+    expresion = _expresion_fts(texto)
+    if not expresion:
+        return queryset.none()
+
+    if not usa_fts():
+        filtro = Q()
+        for palabra in re.findall(r'\w+', texto):
+            filtro &= Q(nombre_completo__icontains=palabra)
+        return queryset.filter(filtro)
+
+    # Un solo JOIN con la tabla FTS: el MATCH filtra y da el `rank` (bm25) de cada fila
+    return (
+        queryset.filter(busqueda__nombre__coincide=expresion)
+        .annotate(rango=F('busqueda__rank'))
+        .order_by('rango', 'nombre_completo')
+    )
+
+
+def indexar_paciente(paciente):
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [paciente.pk])
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, nombre) VALUES (%s, %s)",
+            [paciente.pk, paciente.nombre_completo],
+        )
+
+
+def indexar_pacientes_por_dni(dnis):
+    """Reindexa de una vez los pacientes con esos DNI (las cargas con bulk_create no envían señales)."""
+    if not usa_fts() or not dnis:
+        return
+    tabla_pacientes = Paciente._meta.db_table
+    marcadores = ', '.join(['%s'] * len(dnis))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLA} WHERE rowid IN "
+            f"(SELECT id FROM {tabla_pacientes} WHERE dni IN ({marcadores}))",
+            list(dnis),
+        )
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, nombre) "
+            f"SELECT id, nombre_completo FROM {tabla_pacientes} WHERE dni IN ({marcadores})",
+            list(dnis),
+        )
+
+
+def desindexar_paciente(pk):
+    if not usa_fts():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA} WHERE rowid = %s", [pk])
+
+
+def reconstruir_indice():
+    """Vacía y vuelve a llenar el índice. Devuelve el número de pacientes indexados."""
+    if not usa_fts():
+        return 0
+    tabla_pacientes = Paciente._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLA}")
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, nombre) "
+            f"SELECT id, nombre_completo FROM {tabla_pacientes}"
+        )
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLA}")
+        return cursor.fetchone()[0]
@@ -1,14 +1,45 @@
 # pacientes/context_processors.py
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .models import Paciente
-from datetime import date
+
+
+def _clave_cumpleanos(hoy):
+    return f"pacientes:cumpleanos_hoy:{settings.TIME_ZONE}:{hoy.isoformat()}"
+
+
+def cumpleaneros_del_dia():
+    """
+    Lista (cacheada por día) de los pacientes que cumplen años hoy, como dicts
+    con pk, nombre_completo y edad. Se invalida desde pacientes.signals.
+    """
+    hoy = timezone.localdate()
+    clave = _clave_cumpleanos(hoy)
+    cumpleaneros = cache.get(clave)
+    if cumpleaneros is None:
+        cumpleaneros = [
+            {'pk': p.pk, 'nombre_completo': p.nombre_completo, 'edad': p.edad}
+            for p in Paciente.objects.cumplen_hoy(hoy).only('pk', 'nombre_completo', 'fecha_nacimiento')
+        ]
+        # Caduca como máximo a medianoche; la clave del día siguiente es otra
+        ahora = timezone.localtime()
+        manana = ahora.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        segundos = max(int((manana - ahora).total_seconds()), 1)
+        cache.set(clave, cumpleaneros, segundos)
+    return cumpleaneros
+
+
+def invalidar_cumpleaneros_del_dia():
+    cache.delete(_clave_cumpleanos(timezone.localdate()))
+
 
 def cumpleanos_hoy(request):
-    hoy = date.today()
-    cumpleaneros = Paciente.objects.filter(
-        fecha_nacimiento__month=hoy.month,
-        fecha_nacimiento__day=hoy.day
-    )
+    # Perezoso: las páginas que no muestran el aviso no consultan nada
+    cumpleaneros = SimpleLazyObject(cumpleaneros_del_dia)
     return {
-        'cumpleaneros_hoy_count': cumpleaneros.count(),
-        'cumpleaneros_hoy': cumpleaneros
-    }
\ No newline at end of file
+        'cumpleaneros_hoy_count': lambda: len(cumpleaneros),
+        'cumpleaneros_hoy': cumpleaneros,
+    }
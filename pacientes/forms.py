@@ -1,6 +1,8 @@
 # pacientes/forms.py
 
 from django import forms
+from django.core.exceptions import ValidationError
+from consultorio_dental.importar import ArchivoInvalido, formato_de
 from .models import Paciente
 
 class PacienteForm(forms.ModelForm):
@@ -76,4 +78,32 @@ class PacienteForm(forms.ModelForm):
                 'rows': 3,
                 'placeholder': 'Cualquier información adicional'
             }),
-        }
\ No newline at end of file
+        }
+
+    def clean_dni(self):
+        dni = self.cleaned_data['dni']
+        if not (dni.isdigit() and len(dni) == 8):
+            raise ValidationError("El DNI debe tener 8 dígitos.")
+        return dni
+
+
+class ImportarPacientesForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo",
+        help_text="CSV o XLSX con una fila de títulos: DNI, Nombre completo, Fecha de nacimiento, Género, Estado civil y opcionalmente el resto de datos.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    actualizar = forms.BooleanField(
+        required=False,
+        initial=True,
+        label="Actualizar los pacientes cuyo DNI ya existe",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        try:
+            formato_de(archivo.name)
+        except ArchivoInvalido as e:
+            raise ValidationError(str(e))
+        return archivo
@@ -0,0 +1,236 @@
+# pacientes/importar.py
+"""
+Importación masiva de pacientes desde CSV o XLSX.
+
+Cada fila se valida con las reglas de `PacienteForm` (DNI de 8 dígitos,
+opciones de género, estado civil, grupo sanguíneo...). Las filas válidas se
+guardan por lotes: una consulta `dni IN (...)` para saber cuáles ya existen y
+un `bulk_create(update_conflicts=True)` por lote dentro de una transacción, en
+vez de un INSERT/UPDATE (y sus señales) por paciente. Lo que hacen las señales
+se repite a mano una vez por lote (índice de búsqueda, `dia_cumple`, páginas
+cacheadas de los pacientes actualizados) o al final (caché de cumpleaños y de
+las listas).
+
+Los títulos de columna pueden ser el nombre del campo (`fecha_nacimiento`) o
+su título en pantalla (`Fecha de nacimiento`), así un archivo exportado desde
+la lista de pacientes se puede volver a importar tal cual. Las columnas que no
+están en el archivo no se tocan en los pacientes que ya existían.
+"""
+
+import re
+import unicodedata
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from consultorio_dental.cache_paginas import dependencia_paciente, invalidar
+from consultorio_dental.importar import ArchivoInvalido
+from .busqueda import indexar_pacientes_por_dni
+from .context_processors import invalidar_cumpleaneros_del_dia
+from .forms import PacienteForm
+from .models import Paciente, _mes_dia
+
+TAM_LOTE = 1000
+CAMPOS_OBLIGATORIOS = ('dni', 'nombre_completo', 'fecha_nacimiento', 'genero', 'estado_civil')
+
+
+class _PacienteImportadoForm(PacienteForm):
+    """
+    Un solo formulario para todas las filas: crear uno por fila copia (deepcopy)
+    todos sus campos y widgets, y eso era la mitad del tiempo de importación.
+    """
+
+    def validar(self, datos):
+        self.data = datos
+        self.is_bound = True
+        self.instance = Paciente()
+        self._errors = None
+        self._bound_fields_cache = {}
+        return self.is_valid()
+
+    def validate_unique(self):
+        # Un DNI existente no es un error: se actualiza al guardar el lote
+        pass
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.sub(r'[^a-z0-9]+', ' ', texto.lower()).strip()
+
+
+def _titulos_de_campos():
+    titulos = {}
+    for nombre, campo in PacienteForm.base_fields.items():
+        titulos[_normalizar(nombre)] = nombre
+        titulos[_normalizar(Paciente._meta.get_field(nombre).verbose_name)] = nombre
+    return titulos
+
+
+def _opciones_por_etiqueta():
+    # 'Masculino' → 'M', 'Soltero/a' → 'S': se aceptan el código o la etiqueta
+    opciones = {}
+    for nombre in PacienteForm.base_fields:
+        campo = Paciente._meta.get_field(nombre)
+        if campo.choices:
+            opciones[nombre] = {_normalizar(etiqueta): codigo for codigo, etiqueta in campo.flatchoices}
+    return opciones
+
+
+def _fecha_de_excel(valor):
+    # Excel guarda las fechas como días desde el 30/12/1899 si la celda tiene formato de fecha
+    if re.fullmatch(r'\d{4,5}(\.\d+)?', valor):
+        return (date(1899, 12, 30) + timedelta(days=int(float(valor)))).isoformat()
+    return valor
+
+
+class ErrorDeFila:
+    def __init__(self, fila, dni, mensajes):
+        self.fila = fila
+        self.dni = dni
+        self.mensajes = mensajes
+
+    def __str__(self):
+        return '; '.join(self.mensajes)
+
+
+class ResultadoImportacion:
+    def __init__(self, columnas_ignoradas=()):
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+        self.columnas_ignoradas = list(columnas_ignoradas)
+
+    def agregar_error(self, fila, dni, mensajes):
+        self.errores.append(ErrorDeFila(fila, dni, mensajes))
+
+    @property
+    def guardados(self):
+        return self.creados + self.actualizados
+
+
+class ImportadorPacientes:
+    """
+    Uso: `ImportadorPacientes(actualizar=True).importar(filas)` con `filas`
+    como las devuelve `consultorio_dental.importar.leer_filas` (la primera es
+    la de títulos). Con `actualizar=False` un DNI que ya existe es un error.
+    """
+
+    def __init__(self, actualizar=True, tam_lote=TAM_LOTE):
+        self.actualizar = actualizar
+        self.tam_lote = tam_lote
+        self.opciones = _opciones_por_etiqueta()
+
+    def _columnas(self, encabezados):
+        titulos = _titulos_de_campos()
+        columnas, ignoradas = {}, []
+        for indice, encabezado in enumerate(encabezados):
+            campo = titulos.get(_normalizar(encabezado))
+            if campo and campo not in columnas.values():
+                columnas[indice] = campo
+            elif encabezado.strip():
+                ignoradas.append(encabezado.strip())
+        faltan = [
+            str(Paciente._meta.get_field(campo).verbose_name)
+            for campo in CAMPOS_OBLIGATORIOS if campo not in columnas.values()
+        ]
+        if faltan:
+            raise ArchivoInvalido(f"Faltan columnas obligatorias: {', '.join(faltan)}.")
+        return columnas, ignoradas
+
+    def _datos(self, columnas, valores):
+        datos = {}
+        for indice, campo in columnas.items():
+            valor = valores[indice].strip() if indice < len(valores) else ''
+            if campo in self.opciones and valor:
+                valor = self.opciones[campo].get(_normalizar(valor), valor)
+            datos[campo] = valor
+        if datos.get('fecha_nacimiento'):
+            datos['fecha_nacimiento'] = _fecha_de_excel(datos['fecha_nacimiento'])
+        return datos
+
+    def _mensajes(self, form):
+        return [
+            f"{form.fields[campo].label if campo in form.fields else 'Fila'}: {error}"
+            for campo, errores in form.errors.items() for error in errores
+        ]
+
+    def importar(self, filas):
+        filas = iter(filas)
+        encabezados = next(filas, None)
+        if not encabezados:
+            raise ArchivoInvalido("El archivo está vacío.")
+        columnas, ignoradas = self._columnas(encabezados)
+        resultado = ResultadoImportacion(ignoradas)
+
+        # Columnas a sobrescribir en los pacientes existentes: solo las que trae el archivo
+        campos = [campo for campo in columnas.values() if campo != 'dni']
+        if 'fecha_nacimiento' in campos:
+            campos.append('dia_cumple')
+        campos.append('actualizado_en')
+
+        form = _PacienteImportadoForm()
+        vistos = {}
+        lote = []
+        for numero, valores in enumerate(filas, start=2):
+            if not any(valor.strip() for valor in valores):
+                continue
+            datos = self._datos(columnas, valores)
+            if not form.validar(datos):
+                resultado.agregar_error(numero, datos.get('dni', ''), self._mensajes(form))
+                continue
+            paciente = form.instance
+            if paciente.dni in vistos:
+                resultado.agregar_error(
+                    numero, paciente.dni, [f"DNI repetido en el archivo (ya está en la fila {vistos[paciente.dni]})."]
+                )
+                continue
+            vistos[paciente.dni] = numero
+            # save() no se llama: dia_cumple se calcula aquí
+            paciente.dia_cumple = _mes_dia(paciente.fecha_nacimiento)
+            lote.append((numero, paciente))
+            if len(lote) >= self.tam_lote:
+                self._guardar(lote, campos, resultado)
+                lote = []
+        if lote:
+            self._guardar(lote, campos, resultado)
+
+        if resultado.guardados:
+            transaction.on_commit(invalidar_cumpleaneros_del_dia)
+            transaction.on_commit(lambda: invalidar('pacientes', 'tratamientos', 'pagos'))
+        return resultado
+
+    def _guardar(self, lote, campos, resultado):
+        pk_de_existentes = dict(
+            Paciente.objects.filter(dni__in=[paciente.dni for _, paciente in lote])
+            .values_list('dni', 'pk')
+        )
+        existentes = set(pk_de_existentes)
+        if not self.actualizar:
+            for numero, paciente in lote:
+                if paciente.dni in existentes:
+                    resultado.agregar_error(numero, paciente.dni, ["Ya existe un paciente con este DNI."])
+            lote = [(numero, paciente) for numero, paciente in lote if paciente.dni not in existentes]
+            existentes = set()
+            pk_de_existentes = {}
+        if not lote:
+            return
+
+        pacientes = [paciente for _, paciente in lote]
+        with transaction.atomic():
+            Paciente.objects.bulk_create(
+                pacientes,
+                update_conflicts=True,
+                unique_fields=['dni'],
+                update_fields=campos,
+            )
+            indexar_pacientes_por_dni([paciente.dni for paciente in pacientes])
+        # Páginas cacheadas: las fichas de los actualizados (los nuevos no tenían ficha)
+        dependencias = [dependencia_paciente(pk) for pk in pk_de_existentes.values()]
+        if dependencias:
+            transaction.on_commit(lambda: invalidar(*dependencias))
+        resultado.actualizados += len(existentes)
+        resultado.creados += len(pacientes) - len(existentes)
+
+
+def importar_pacientes(filas, actualizar=True):
+    return ImportadorPacientes(actualizar=actualizar).importar(filas)
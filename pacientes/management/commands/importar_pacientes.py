@@ -0,0 +1,55 @@
+# pacientes/management/commands/importar_pacientes.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from consultorio_dental.exportar import filas_csv
+from consultorio_dental.importar import ArchivoInvalido, leer_filas
+from pacientes.importar import importar_pacientes
+
+
+class Command(BaseCommand):
+    help = "Importa pacientes desde un CSV o XLSX (crea los nuevos y actualiza por DNI los existentes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Archivo .csv o .xlsx; la primera fila son los títulos')
+        parser.add_argument(
+            '--solo-nuevos',
+            action='store_true',
+            help='No modifica los pacientes cuyo DNI ya existe (se informan como error)'
+        )
+        parser.add_argument(
+            '--reporte',
+            help='Guarda en este CSV las filas con error (fila, DNI y motivo)'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = importar_pacientes(
+                    leer_filas(archivo, options['archivo']),
+                    actualizar=not options['solo_nuevos'],
+                )
+        except (OSError, ArchivoInvalido) as e:
+            raise CommandError(str(e))
+
+        if resultado.columnas_ignoradas:
+            self.stdout.write(f"Columnas ignoradas: {', '.join(resultado.columnas_ignoradas)}")
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8', newline='') as reporte:
+                reporte.writelines(filas_csv(
+                    ['Fila', 'DNI', 'Errores'],
+                    ((error.fila, error.dni, str(error)) for error in resultado.errores),
+                ))
+        else:
+            for error in resultado.errores[:20]:
+                self.stdout.write(f"Fila {error.fila} (DNI {error.dni or '—'}): {error}")
+            if len(resultado.errores) > 20:
+                self.stdout.write(f"... y {len(resultado.errores) - 20} errores más (use --reporte).")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.creados} pacientes creados y {resultado.actualizados} actualizados; "
+            f"{len(resultado.errores)} filas con error ({time.monotonic() - inicio:.1f} s)."
+        ))
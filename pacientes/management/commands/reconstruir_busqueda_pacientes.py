@@ -0,0 +1,17 @@
+# pacientes/management/commands/reconstruir_busqueda_pacientes.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from pacientes.busqueda import reconstruir_indice, usa_fts
+
+
+class Command(BaseCommand):
+    help = "Regenera el índice de búsqueda de pacientes (FTS5) desde la tabla de pacientes"
+
+    def handle(self, *args, **options):
+        if not usa_fts():
+            self.stdout.write("La base de datos no es SQLite: la búsqueda no usa índice FTS5.")
+            return
+        with transaction.atomic():
+            total = reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(f"{total} pacientes indexados."))
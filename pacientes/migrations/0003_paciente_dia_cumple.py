@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:43
+
+from django.db import migrations, models
+from django.db.models.functions import ExtractDay, ExtractMonth
+
+
+def calcular_dia_cumple(apps, schema_editor):
+    Paciente = apps.get_model('pacientes', 'Paciente')
+    Paciente.objects.update(
+        dia_cumple=ExtractMonth('fecha_nacimiento') * 100 + ExtractDay('fecha_nacimiento')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0002_paciente_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='dia_cumple',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False, verbose_name='Día de cumpleaños (MMDD)'),
+        ),
+        migrations.RunPython(calcular_dia_cumple, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:57
+
+import django.db.models.deletion
+import pacientes.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0004_indices_listas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusquedaPaciente',
+            fields=[
+                ('paciente', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='busqueda', serialize=False, to='pacientes.paciente')),
+                ('nombre', pacientes.models.TextoFTS()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'pacientes_busqueda',
+                'managed': False,
+            },
+        ),
+    ]
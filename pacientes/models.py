@@ -3,7 +3,66 @@
 from django.db import models
 from django.urls import reverse
 from django.core.validators import MinLengthValidator
-from datetime import date
+from django.db.models import Case, Q, Value, When
+from calendar import isleap
+from datetime import date, timedelta
+
+MARZO_1, FEBRERO_29 = 301, 229
+
+
+def _mes_dia(fecha):
+    """Cumpleaños como entero MMDD (ej: 14 de marzo → 314), comparable en SQL."""
+    return fecha.month * 100 + fecha.day
+
+
+def _cumple_29_el_1_de_marzo(desde, dias):
+    """True si la ventana [desde, desde + dias] pasa por el 1 de marzo de un año no bisiesto."""
+    fin = desde + timedelta(days=dias)
+    for anio in (desde.year, desde.year + 1):
+        if desde <= date(anio, 3, 1) <= fin:
+            return not isleap(anio)
+    return False
+
+
+class PacienteQuerySet(models.QuerySet):
+    def cumpleanos_en(self, dias, desde=None):
+        """
+        Pacientes que cumplen años en los próximos `dias` días (incluido hoy),
+        ordenados por cercanía del cumpleaños. Resuelve el cambio de año en SQL
+        y usa el índice de `dia_cumple`, así la paginación solo trae una página.
+
+        Los nacidos un 29 de febrero caen entre el 28/02 y el 01/03, es decir,
+        en años no bisiestos se cuentan el 1 de marzo.
+        """
+        hoy = desde or date.today()
+        inicio = _mes_dia(hoy)
+        con_29 = _cumple_29_el_1_de_marzo(hoy, min(dias, 365))
+        # Antes o después del cambio de año: los del 29/02 van donde caiga el 1 de marzo
+        grupo = [When(dia_cumple=FEBRERO_29, then=Value(0 if MARZO_1 >= inicio else 1))] if con_29 else []
+        if dias >= 365:
+            return self.order_by(
+                Case(*grupo, When(dia_cumple__gte=inicio, then=Value(0)), default=Value(1)),
+                'dia_cumple', 'nombre_completo'
+            )
+        fin = _mes_dia(hoy + timedelta(days=dias))
+        extra = Q(dia_cumple=FEBRERO_29) if con_29 else Q()
+        if fin >= inicio:
+            # La ventana no cruza el 31 de diciembre
+            return self.filter(Q(dia_cumple__gte=inicio, dia_cumple__lte=fin) | extra).order_by(
+                'dia_cumple', 'nombre_completo'
+            )
+        return self.filter(Q(dia_cumple__gte=inicio) | Q(dia_cumple__lte=fin) | extra).order_by(
+            Case(*grupo, When(dia_cumple__gte=inicio, then=Value(0)), default=Value(1)),
+            'dia_cumple', 'nombre_completo'
+        )
+
+    def cumplen_hoy(self, hoy=None):
+        hoy = hoy or date.today()
+        dias = [_mes_dia(hoy)]
+        if _cumple_29_el_1_de_marzo(hoy, 0):
+            dias.append(FEBRERO_29)
+        return self.filter(dia_cumple__in=dias)
+
 
 class Paciente(models.Model):
     # === DATOS PERSONALES ===
@@ -110,25 +169,45 @@ class Paciente(models.Model):
     )
 
 
+    @staticmethod
+    def _cumple_en_anio(fecha_nacimiento, anio):
+        try:
+            return fecha_nacimiento.replace(year=anio)
+        except ValueError:
+            # 29 de febrero en año no bisiesto: se celebra el 1 de marzo
+            return date(anio, 3, 1)
+
     @property
     def dias_hasta_cumple(self):
         hoy = date.today()
-        cumple = self.fecha_nacimiento.replace(year=hoy.year)
+        cumple = self._cumple_en_anio(self.fecha_nacimiento, hoy.year)
         # Si el cumple ya pasó este año, es el del próximo año
         if cumple < hoy:
-            cumple = cumple.replace(year=hoy.year + 1)
+            cumple = self._cumple_en_anio(self.fecha_nacimiento, hoy.year + 1)
         return (cumple - hoy).days
 
     
 
     # === METADATOS ===
+    # Mes y día de nacimiento como MMDD, calculado en save() para buscar cumpleaños por índice
+    dia_cumple = models.PositiveSmallIntegerField(
+        editable=False,
+        db_index=True,
+        default=0,
+        verbose_name="Día de cumpleaños (MMDD)"
+    )
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = PacienteQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
         ordering = ['nombre_completo']
+        indexes = [
+            models.Index(fields=['nombre_completo'], name='paciente_nombre_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nombre_completo} (DNI: {self.dni})"
@@ -136,6 +215,16 @@ class Paciente(models.Model):
     def get_absolute_url(self):
         return reverse('pacientes:detalle', kwargs={'pk': self.pk})
 
+    def save(self, *args, **kwargs):
+        if self.fecha_nacimiento:
+            # Acepta también 'AAAA-MM-DD' (fixtures, shell, importaciones)
+            self.fecha_nacimiento = self._meta.get_field('fecha_nacimiento').to_python(self.fecha_nacimiento)
+            self.dia_cumple = _mes_dia(self.fecha_nacimiento)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'fecha_nacimiento' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'dia_cumple'}
+        super().save(*args, **kwargs)
+
     @property
     def edad(self):
         if self.fecha_nacimiento:
@@ -143,4 +232,42 @@ class Paciente(models.Model):
             return today.year - self.fecha_nacimiento.year - (
                 (today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day)
             )
-        return None
\ No newline at end of file
+        return None
+
+class Coincide(models.Lookup):
+    """`campo__coincide=expresion` → `campo MATCH expresion` (consulta FTS5)."""
+    lookup_name = 'coincide'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+class TextoFTS(models.TextField):
+    pass
+
+
+TextoFTS.register_lookup(Coincide)
+
+
+class BusquedaPaciente(models.Model):
+    """
+    Tabla virtual FTS5 `pacientes_busqueda` (solo SQLite, la crea la migración 0002).
+    No la gestiona Django: existe para hacer el JOIN con los pacientes desde el ORM.
+    """
+    paciente = models.OneToOneField(
+        Paciente,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='busqueda',
+    )
+    nombre = TextoFTS()
+    # Columna oculta de FTS5: bm25 de la fila para el MATCH de la consulta
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'pacientes_busqueda'
@@ -0,0 +1,27 @@
+# pacientes/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Paciente
+from .busqueda import indexar_paciente, desindexar_paciente
+from .context_processors import invalidar_cumpleaneros_del_dia
+
+
+@receiver(post_save, sender=Paciente)
+def actualizar_indice_busqueda(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'nombre_completo' not in update_fields:
+        return
+    indexar_paciente(instance)
+
+
+@receiver(post_delete, sender=Paciente)
+def quitar_de_indice_busqueda(sender, instance, **kwargs):
+    desindexar_paciente(instance.pk)
+
+
+@receiver(post_save, sender=Paciente)
+@receiver(post_delete, sender=Paciente)
+def invalidar_cumpleanos(sender, instance, **kwargs):
+    # Cambia la fecha de nacimiento, el nombre o desaparece un cumpleañero de hoy
+    invalidar_cumpleaneros_del_dia()
@@ -1,3 +1,363 @@
-from django.test import TestCase
+import io
+from unittest import mock
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from consultorio_dental.importar import ArchivoInvalido, leer_filas
+from consultorio_dental.pruebas import CacheVaciaMixin, PlanDeConsultaMixin, crear_paciente, plan_de_consulta, queryset_de_vista
+from historias.models import EntradaHistoria, ImagenHistoria
+from notas.models import Nota, ImagenNota
+from tratamientos.models import Tratamiento, Pago
+from .models import Paciente
+from .views import ListaPacientesView
+from .busqueda import buscar_pacientes
+from .importar import importar_pacientes
+from .context_processors import cumpleaneros_del_dia
+
+
+class DetallePacienteConsultasTest(CacheVaciaMixin, TestCase):
+    """El detalle del paciente hace siempre el mismo número de consultas."""
+
+    # paciente con totales + la pestaña visible + cumpleaños de hoy (context processor)
+    CONSULTAS_ESPERADAS = 3
+    # Las pestañas vacías no consultan: el total anotado ya es 0
+    CONSULTAS_SIN_REGISTROS = 2
+
+    def crear_paciente(self, dni, registros):
+        # Fecha de nacimiento lejos de hoy para no activar el aviso de cumpleaños
+        nacimiento = date.today() - timedelta(days=365 * 30 + 100)
+        paciente = Paciente.objects.create(
+            nombre_completo=f"Paciente {dni}",
+            dni=dni,
+            fecha_nacimiento=nacimiento,
+            genero='F',
+            estado_civil='S',
+        )
+        for i in range(registros):
+            entrada = EntradaHistoria.objects.create(
+                paciente=paciente, motivo=f"Control {i}", diagnostico="Caries"
+            )
+            ImagenHistoria.objects.create(entrada=entrada, descripcion="Radiografía")
+            tratamiento = Tratamiento.objects.create(
+                paciente=paciente, nombre=f"Endodoncia {i}",
+                costo_total=300, fecha_inicio=date.today()
+            )
+            Pago.objects.create(tratamiento=tratamiento, monto=100)
+            nota = Nota.objects.create(paciente=paciente, titulo=f"Nota {i}", contenido="...")
+            ImagenNota.objects.create(nota=nota, imagen_url="https://example.com/a.jpg")
+        return paciente
+
+    def assertConsultasDetalle(self, paciente, consultas=CONSULTAS_ESPERADAS):
+        with self.assertNumQueries(consultas):
+            response = self.client.get(reverse('pacientes:detalle', kwargs={'pk': paciente.pk}))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_paciente_sin_registros(self):
+        paciente = self.crear_paciente('10000000', 0)
+        response = self.assertConsultasDetalle(paciente, self.CONSULTAS_SIN_REGISTROS)
+        self.assertEqual(response.context['paciente'].total_historias, 0)
+
+    def test_paciente_con_muchos_registros(self):
+        paciente = self.crear_paciente('20000000', 25)
+        response = self.assertConsultasDetalle(paciente)
+        paciente = response.context['paciente']
+        self.assertEqual(paciente.total_historias, 25)
+        self.assertEqual(paciente.total_tratamientos, 25)
+        self.assertEqual(paciente.total_notas, 25)
+        self.assertEqual(paciente.deuda_total, 25 * 200)
+        self.assertEqual(len(response.context['historias_paginadas']), 20)
+        self.assertTrue(response.context['historias_paginadas'][0].tiene_imagenes)
+        # Las otras pestañas no se consultan: se cargan al abrirlas
+        self.assertNotIn('notas_paginadas', response.context)
+        self.assertContains(response, reverse('pacientes:pestana', args=[paciente.pk, 'notas']))
+
+    def test_segunda_pagina(self):
+        paciente = self.crear_paciente('30000000', 25)
+        with self.assertNumQueries(self.CONSULTAS_ESPERADAS):
+            response = self.client.get(
+                reverse('pacientes:detalle', kwargs={'pk': paciente.pk}) + '?tratamientos_page=2'
+            )
+        self.assertEqual(len(response.context['tratamientos_paginados']), 5)
+        self.assertEqual(response.context['pestana_activa'], 'tratamientos')
+
+    def test_pestana_sola(self):
+        paciente = self.crear_paciente('40000000', 3)
+        url = reverse('pacientes:pestana', args=[paciente.pk, 'notas'])
+        # paciente con totales + notas (sin la plantilla base no se piden los cumpleaños)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertTrue(response.context['notas_paginadas'][0].tiene_imagenes)
+        self.assertContains(response, 'Nota 2')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            self.client.get(reverse('pacientes:pestana', args=[paciente.pk, 'pagos'])).status_code, 404
+        )
+
+
+class BusquedaPacientesTest(TestCase):
+    def setUp(self):
+        datos = [
+            ('Juan Pérez López', '45120001'),
+            ('María Núñez', '45990002'),
+            ('Pedro Juanes', '70000003'),
+        ]
+        for nombre, dni in datos:
+            Paciente.objects.create(
+                nombre_completo=nombre, dni=dni, fecha_nacimiento=date(1990, 1, 1),
+                genero='O', estado_civil='S',
+            )
+
+    def nombres(self, texto):
+        return [p.nombre_completo for p in buscar_pacientes(texto)]
+
+    def test_palabras_en_cualquier_orden_y_sin_tildes(self):
+        self.assertEqual(self.nombres('perez juan'), ['Juan Pérez López'])
+        self.assertEqual(self.nombres('NUNEZ'), ['María Núñez'])
+
+    def test_prefijo_de_palabra(self):
+        self.assertCountEqual(self.nombres('juan'), ['Juan Pérez López', 'Pedro Juanes'])
+
+    def test_prefijo_de_dni(self):
+        self.assertEqual(self.nombres('451'), ['Juan Pérez López'])
+        self.assertEqual(self.nombres('45'), ['Juan Pérez López', 'María Núñez'])
+
+    def test_indice_sigue_a_los_cambios(self):
+        paciente = Paciente.objects.get(dni='70000003')
+        paciente.nombre_completo = 'Pedro Gómez'
+        paciente.save()
+        self.assertEqual(self.nombres('gomez'), ['Pedro Gómez'])
+        self.assertEqual(self.nombres('juanes'), [])
+        paciente.delete()
+        self.assertEqual(self.nombres('pedro'), [])
+
+    def test_un_solo_match_por_busqueda(self):
+        # El rango sale del mismo JOIN que filtra, no de una subconsulta por fila
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.nombres('maria'), ['María Núñez'])
+        self.assertEqual(len(consultas), 1)
+        self.assertEqual(consultas[0]['sql'].count('MATCH'), 1)
+        plan = plan_de_consulta(buscar_pacientes('maria'))
+        self.assertTrue(any('VIRTUAL TABLE' in paso for paso in plan), plan)
+        self.assertFalse(any('SUBQUERY' in paso for paso in plan), plan)
+
+    def test_sintaxis_fts_no_rompe_la_busqueda(self):
+        self.assertCountEqual(self.nombres('juan" ('), ['Juan Pérez López', 'Pedro Juanes'])
+
+
+class CumpleanosProximosTest(TestCase):
+    def crear(self, nombre, dni, nacimiento):
+        return Paciente.objects.create(
+            nombre_completo=nombre, dni=dni, fecha_nacimiento=nacimiento,
+            genero='O', estado_civil='S',
+        )
+
+    def nombres(self, **kwargs):
+        return [p.nombre_completo for p in Paciente.objects.cumpleanos_en(**kwargs)]
+
+    def test_ventana_que_cruza_el_anio(self):
+        self.crear('Enero', '10000001', date(1980, 1, 5))
+        self.crear('Diciembre', '10000002', date(1985, 12, 28))
+        self.crear('Junio', '10000003', date(1990, 6, 1))
+        self.assertEqual(
+            self.nombres(dias=30, desde=date(2025, 12, 20)), ['Diciembre', 'Enero']
+        )
+
+    def test_nacidos_el_29_de_febrero(self):
+        self.crear('Bisiesto', '10000004', date(2000, 2, 29))
+        self.assertEqual(self.nombres(dias=0, desde=date(2025, 2, 28)), [])
+        self.assertEqual(self.nombres(dias=1, desde=date(2025, 2, 28)), ['Bisiesto'])
+        self.assertEqual(self.nombres(dias=0, desde=date(2024, 2, 29)), ['Bisiesto'])
+        # En años no bisiestos se cuentan el 1 de marzo
+        self.assertEqual(self.nombres(dias=0, desde=date(2025, 3, 1)), ['Bisiesto'])
+        self.assertEqual(self.nombres(dias=0, desde=date(2024, 3, 1)), [])
+        self.assertEqual(self.nombres(dias=3, desde=date(2025, 2, 26)), ['Bisiesto'])
+        self.assertEqual(self.nombres(dias=0, desde=date(2025, 3, 2)), [])
+        self.assertEqual(list(Paciente.objects.cumplen_hoy(date(2025, 3, 1))), list(Paciente.objects.all()))
+        self.assertFalse(Paciente.objects.cumplen_hoy(date(2024, 3, 1)).exists())
+
+    def test_29_de_febrero_al_ordenar_con_cambio_de_anio(self):
+        self.crear('Marzo', '10000006', date(1990, 3, 5))
+        self.crear('Bisiesto', '10000004', date(2000, 2, 29))
+        self.crear('Enero', '10000001', date(1980, 1, 5))
+        self.assertEqual(self.nombres(dias=340, desde=date(2025, 3, 1)), ['Bisiesto', 'Marzo', 'Enero'])
+        self.assertEqual(self.nombres(dias=365, desde=date(2025, 3, 1)), ['Bisiesto', 'Marzo', 'Enero'])
+
+    def test_fecha_de_nacimiento_como_texto(self):
+        # Fixtures, shell o importaciones pueden traer 'AAAA-MM-DD'
+        self.assertEqual(self.crear('Texto', '10000007', '1992-02-29').dia_cumple, 229)
+
+    def test_cambio_de_fecha_actualiza_dia_cumple(self):
+        paciente = self.crear('Ana', '10000005', date(1990, 3, 14))
+        self.assertEqual(paciente.dia_cumple, 314)
+        paciente.fecha_nacimiento = date(1990, 11, 2)
+        paciente.save(update_fields=['fecha_nacimiento'])
+        paciente.refresh_from_db()
+        self.assertEqual(paciente.dia_cumple, 1102)
+
+
+class CumpleanosHoyContextProcessorTest(TestCase):
+    # Fecha fija: un 1 de marzo de año no bisiesto, el cumpleaños de los nacidos un 29/02
+    HOY = date(2025, 3, 1)
+
+    def setUp(self):
+        congelar = mock.patch('django.utils.timezone.localdate', return_value=self.HOY)
+        congelar.start()
+        self.addCleanup(congelar.stop)
+        self.paciente = Paciente.objects.create(
+            nombre_completo='Cumpleañera', dni='55500001', fecha_nacimiento=date(1992, 2, 29),
+            genero='F', estado_civil='S',
+        )
+
+    def test_una_consulta_por_dia(self):
+        url = reverse('pacientes:cumpleanos_proximos')
+        response = self.client.get(url)
+        self.assertContains(response, 'Cumpleañera (')
+        # Segunda visita: el aviso sale de la caché
+        with self.assertNumQueries(0):
+            self.assertEqual(len(cumpleaneros_del_dia()), 1)
+
+    def test_cambio_de_fecha_invalida_la_cache(self):
+        self.assertEqual(len(cumpleaneros_del_dia()), 1)
+        self.paciente.fecha_nacimiento = self.paciente.fecha_nacimiento + timedelta(days=2)
+        self.paciente.save()
+        self.assertEqual(cumpleaneros_del_dia(), [])
+
+
+class PlanesListaPacientesTest(PlanDeConsultaMixin, TestCase):
+    def test_lista_de_pacientes(self):
+        self.assertUsaIndice(queryset_de_vista(ListaPacientesView, '/'))
+
+    def test_pestanas_del_detalle(self):
+        self.assertUsaIndice(EntradaHistoria.objects.filter(paciente_id=1))
+        self.assertUsaIndice(Tratamiento.objects.filter(paciente_id=1))
+        self.assertUsaIndice(Nota.objects.filter(paciente_id=1))
+
+
+class ImportacionPacientesTest(CacheVaciaMixin, TestCase):
+    ENCABEZADOS = 'DNI;Nombre completo;Fecha de nacimiento;Género;Estado civil;Teléfono\n'
+
+    def importar(self, contenido, **opciones):
+        archivo = io.BytesIO(contenido.encode('utf-8-sig'))
+        return importar_pacientes(leer_filas(archivo, 'pacientes.csv'), **opciones)
+
+    def test_crea_valida_y_reporta_por_fila(self):
+        resultado = self.importar(
+            self.ENCABEZADOS
+            + '45120001;José Ñique;14/03/1990;Masculino;S;987654321\n'
+            + '4512;Sin DNI;1990-01-01;M;S;\n'
+            + '45120002;Ana Ruiz;1985-07-02;X;S;\n'
+            + '45120001;José Repetido;1990-01-01;M;S;\n'
+        )
+        self.assertEqual((resultado.creados, resultado.actualizados), (1, 0))
+        self.assertEqual([error.fila for error in resultado.errores], [3, 4, 5])
+        self.assertIn('8 dígitos', str(resultado.errores[0]))
+        self.assertIn('Género', str(resultado.errores[1]))
+        self.assertIn('fila 2', str(resultado.errores[2]))
+
+        paciente = Paciente.objects.get(dni='45120001')
+        self.assertEqual((paciente.genero, paciente.fecha_nacimiento, paciente.dia_cumple), ('M', date(1990, 3, 14), 314))
+        # bulk_create no envía señales: el índice de búsqueda se actualiza igual
+        self.assertEqual(list(buscar_pacientes('nique jose')), [paciente])
+
+    def test_actualiza_solo_las_columnas_del_archivo(self):
+        crear_paciente('45120001', nombre_completo='José', alergias='Penicilina')
+        resultado = self.importar(self.ENCABEZADOS + '45120001;José Ñique;1990-03-14;M;C;999\n')
+        self.assertEqual((resultado.creados, resultado.actualizados), (0, 1))
+        paciente = Paciente.objects.get(dni='45120001')
+        self.assertEqual((paciente.nombre_completo, paciente.estado_civil, paciente.alergias), ('José Ñique', 'C', 'Penicilina'))
+
+        resultado = self.importar(self.ENCABEZADOS + '45120001;Otro;1990-03-14;M;C;\n', actualizar=False)
+        self.assertEqual(resultado.guardados, 0)
+        self.assertEqual(Paciente.objects.get(dni='45120001').nombre_completo, 'José Ñique')
+
+    def test_faltan_columnas_obligatorias(self):
+        with self.assertRaisesMessage(ArchivoInvalido, 'Fecha de nacimiento'):
+            self.importar('DNI;Nombre completo;Género;Estado civil\n')
+
+    def test_reimporta_la_exportacion_xlsx(self):
+        crear_paciente('45120001', nombre_completo='José Ñique', alergias='Látex')
+        response = self.client.get(reverse('pacientes:lista') + '?formato=xlsx')
+        contenido = b''.join(response.streaming_content)
+        Paciente.objects.all().delete()
+
+        response = self.client.post(reverse('pacientes:importar'), {
+            'archivo': SimpleUploadedFile('pacientes.xlsx', contenido), 'actualizar': 'on',
+        })
+        self.assertEqual(response.context['resultado'].creados, 1)
+        paciente = Paciente.objects.get(dni='45120001')
+        self.assertEqual((paciente.nombre_completo, paciente.alergias), ('José Ñique', 'Látex'))
+
+
+class CachePaginasTest(CacheVaciaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ana = crear_paciente('10000001', nombre_completo='Ana')
+        self.beto = crear_paciente('10000002', nombre_completo='Beto')
+        self.tratamiento_ana = Tratamiento.objects.create(
+            paciente=self.ana, nombre='Limpieza', costo_total=100, fecha_inicio='2025-01-01'
+        )
+        self.tratamiento_beto = Tratamiento.objects.create(
+            paciente=self.beto, nombre='Corona', costo_total=300, fecha_inicio='2025-01-01'
+        )
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(consultas)
+
+    def test_un_pago_invalida_solo_su_paciente_y_las_listas(self):
+        urls = {
+            'ana': reverse('pacientes:detalle', args=[self.ana.pk]),
+            'beto': reverse('pacientes:detalle', args=[self.beto.pk]),
+            'pacientes': reverse('pacientes:lista'),
+            'pagos': reverse('tratamientos:lista_pagos'),
+        }
+        for url in urls.values():
+            self.assertGreater(self.consultas(url), 0)
+            self.assertEqual(self.consultas(url), 0)
+
+        # La invalidación espera a que se confirme la transacción
+        with self.captureOnCommitCallbacks() as al_confirmar:
+            Pago.objects.create(tratamiento=self.tratamiento_beto, monto=50)
+            self.assertEqual(self.consultas(urls['beto']), 0)
+        for callback in al_confirmar:
+            callback()
+        self.assertEqual(self.consultas(urls['ana']), 0)
+        self.assertEqual(self.consultas(urls['pacientes']), 0)
+        self.assertGreater(self.consultas(urls['beto']), 0)
+        self.assertGreater(self.consultas(urls['pagos']), 0)
+        self.assertContains(self.client.get(urls['beto']), '50')
+
+    def test_la_consulta_es_parte_de_la_clave(self):
+        url = reverse('pacientes:lista')
+        self.assertContains(self.client.get(url + '?q=ana'), 'Ana')
+        self.assertNotContains(self.client.get(url + '?q=beto'), '>Ana<')
+
+    def test_fragmento_de_pestana_cacheado(self):
+        Nota.objects.create(paciente=self.ana, titulo='Control anual', contenido='...')
+        self.consultas(reverse('pacientes:detalle', args=[self.ana.pk]) + '?notas_page=1')
+        # Otra URL (otra página cacheada), mismo fragmento: solo se consulta el paciente
+        url = reverse('pacientes:pestana', args=[self.ana.pk, 'notas'])
+        self.assertEqual(self.consultas(url), 1)
+        self.assertContains(self.client.get(url), 'Control anual')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Nota.objects.create(paciente=self.ana, titulo='Blanqueamiento', contenido='...')
+        self.assertContains(self.client.get(url + '?notas_page=1'), 'Blanqueamiento')
+
+    def test_no_cachea_con_mensajes_pendientes(self):
+        url = reverse('pacientes:detalle', args=[self.ana.pk])
+        self.client.post(reverse('pacientes:editar', args=[self.ana.pk]), {
+            'nombre_completo': 'Ana María', 'dni': '10000001', 'fecha_nacimiento': '1990-01-01',
+            'genero': 'F', 'estado_civil': 'S',
+        })
+        self.assertContains(self.client.get(url), 'Paciente actualizado exitosamente.')
+        self.assertNotContains(self.client.get(url), 'Paciente actualizado exitosamente.')
@@ -2,57 +2,160 @@
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
-from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.http import Http404
+from django.urls import reverse, reverse_lazy
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
 from .models import Paciente
-from .forms import PacienteForm
-
-class ListaPacientesView(ListView):
+from .forms import ImportarPacientesForm, PacienteForm
+from .importar import importar_pacientes
+from .busqueda import buscar_pacientes
+from consultorio_dental.cache_paginas import CachePaginaMixin, dependencia_paciente, versiones
+from consultorio_dental.exportar import ExportarMixin
+from consultorio_dental.importar import ArchivoInvalido, leer_filas
+
+class ListaPacientesView(CachePaginaMixin, ExportarMixin, ListView):
     model = Paciente
     template_name = 'pacientes/lista_pacientes.html'
     context_object_name = 'pacientes'
     paginate_by = 10
+    # Todos los datos del formulario, con los mismos títulos (sirve para importar)
+    columnas_exportacion = [
+        (campo.name, str(campo.verbose_name))
+        for campo in Paciente._meta.concrete_fields
+        if campo.editable and not campo.primary_key
+    ]
+    nombre_exportacion = 'pacientes'
+
+    def get_dependencias_cache(self):
+        return ['pacientes']
 
     def get_queryset(self):
         query = self.request.GET.get('q')
         if query:
-            return Paciente.objects.filter(
-                nombre_completo__icontains=query
-            ) | Paciente.objects.filter(
-                dni__icontains=query
-            )
+            return buscar_pacientes(query)
         return Paciente.objects.all()
 
 # pacientes/views.py
 from django.core.paginator import Paginator
-
-class DetallePacienteView(DetailView):
+from django.db.models import Count, DecimalField, Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from historias.models import EntradaHistoria, ImagenHistoria
+from notas.models import Nota, ImagenNota
+from tratamientos.models import Tratamiento
+
+
+def _por_paciente(modelo, agregado):
+    """Subconsulta correlacionada con un agregado de `modelo` para cada paciente."""
+    return Subquery(
+        modelo.objects.filter(paciente=OuterRef('pk'))
+        .order_by()
+        .values('paciente')
+        .annotate(valor=agregado)
+        .values('valor')
+    )
+
+
+class PestanasPacienteMixin:
+    """
+    Pestañas del detalle del paciente (historias, tratamientos, notas). Cada
+    una se pagina con su propio parámetro (`historias_page`...) y su HTML se
+    guarda con `{% cache %}` por paciente, pestaña, página y versión del
+    paciente: la versión cambia con las señales de los modelos relacionados.
+    """
     model = Paciente
-    template_name = 'pacientes/detalle_paciente.html'
     context_object_name = 'paciente'
+    por_pagina = 20
+    PESTANAS = ('historias', 'tratamientos', 'notas')
+
+    def get_dependencias_cache(self):
+        return [dependencia_paciente(self.kwargs['pk'])]
+
+    def get_queryset(self):
+        # Totales de las pestañas en la misma consulta que el paciente
+        return Paciente.objects.annotate(
+            total_historias=Coalesce(_por_paciente(EntradaHistoria, Count('pk')), 0),
+            total_tratamientos=Coalesce(_por_paciente(Tratamiento, Count('pk')), 0),
+            total_notas=Coalesce(_por_paciente(Nota, Count('pk')), 0),
+            deuda_total=Coalesce(
+                _por_paciente(Tratamiento, Sum('deuda')), Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+
+    def paginar(self, queryset, total, parametro):
+        paginator = Paginator(queryset, self.por_pagina)
+        # El total ya viene anotado en el paciente: evita un COUNT(*) por pestaña
+        paginator.count = total
+        return paginator.get_page(self.request.GET.get(parametro))
+
+    def contexto_pestana(self, pestana):
+        """
+        Página de `pestana`. Los querysets son perezosos: si el fragmento está
+        en la caché, la plantilla no los evalúa y no se consulta nada.
+        """
+        paciente = self.object
+        if pestana == 'historias':
+            historias = EntradaHistoria.objects.filter(paciente=paciente).annotate(
+                tiene_imagenes=Exists(ImagenHistoria.objects.filter(entrada=OuterRef('pk')))
+            )
+            contexto = {'historias_paginadas': self.paginar(
+                historias, paciente.total_historias, 'historias_page'
+            )}
+        elif pestana == 'tratamientos':
+            # Saldos ya guardados en cada tratamiento
+            tratamientos = Tratamiento.objects.filter(paciente=paciente)
+            contexto = {'tratamientos_paginados': self.paginar(
+                tratamientos, paciente.total_tratamientos, 'tratamientos_page'
+            )}
+        else:
+            notas = Nota.objects.filter(paciente=paciente).annotate(
+                tiene_imagenes=Exists(ImagenNota.objects.filter(nota=OuterRef('pk')))
+            )
+            contexto = {'notas_paginadas': self.paginar(
+                notas, paciente.total_notas, 'notas_page'
+            )}
+        contexto['version_paciente'] = versiones([dependencia_paciente(paciente.pk)])[0]
+        return contexto
+
+
+class DetallePacienteView(PestanasPacienteMixin, CachePaginaMixin, DetailView):
+    template_name = 'pacientes/detalle_paciente.html'
+
+    def pestana_activa(self):
+        # La pestaña que se está paginando; si no, la primera
+        for pestana in ('tratamientos', 'notas', 'historias'):
+            if f'{pestana}_page' in self.request.GET:
+                return pestana
+        return self.PESTANAS[0]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        paciente = self.object
+        activa = self.pestana_activa()
+        context.update(self.contexto_pestana(activa))
+        context['pestana_activa'] = activa
+        context['pestana_template'] = f'pacientes/pestanas/{activa}.html'
+        # Las demás se cargan al abrirlas, en la primera página
+        context['urls_pestanas'] = {
+            pestana: reverse('pacientes:pestana', args=[self.object.pk, pestana])
+            for pestana in self.PESTANAS
+        }
+        return context
+
 
-        # Paginación para historias
-        historias = paciente.entradas_historia.all()
-        historias_paginator = Paginator(historias, 20)  # 2 por página
-        historias_page = self.request.GET.get('historias_page')
-        context['historias_paginadas'] = historias_paginator.get_page(historias_page)
+class PestanaPacienteView(PestanasPacienteMixin, CachePaginaMixin, DetailView):
+    """Solo el HTML de una pestaña, para cargarla cuando se abre."""
 
-        # Paginación para tratamientos
-        tratamientos = paciente.tratamientos.all()
-        tratamientos_paginator = Paginator(tratamientos, 20)
-        tratamientos_page = self.request.GET.get('tratamientos_page')
-        context['tratamientos_paginados'] = tratamientos_paginator.get_page(tratamientos_page)
+    def get_template_names(self):
+        return [f"pacientes/pestanas/{self.kwargs['pestana']}.html"]
 
-        # Paginación para notas
-        notas = paciente.notas.all()
-        notas_paginator = Paginator(notas, 20)
-        notas_page = self.request.GET.get('notas_page')
-        context['notas_paginadas'] = notas_paginator.get_page(notas_page)
+    def get(self, request, *args, **kwargs):
+        if kwargs['pestana'] not in self.PESTANAS:
+            raise Http404("Pestaña inexistente.")
+        return super().get(request, *args, **kwargs)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update(self.contexto_pestana(self.kwargs['pestana']))
         return context
 
 class CrearPacienteView(CreateView):
@@ -65,6 +168,33 @@ class CrearPacienteView(CreateView):
         messages.success(self.request, "Paciente creado exitosamente.")
         return super().form_valid(form)
 
+class ImportarPacientesView(FormView):
+    form_class = ImportarPacientesForm
+    template_name = 'pacientes/importar_pacientes.html'
+    errores_mostrados = 200
+
+    def form_valid(self, form):
+        archivo = form.cleaned_data['archivo']
+        try:
+            resultado = importar_pacientes(
+                leer_filas(archivo, archivo.name),
+                actualizar=form.cleaned_data['actualizar'],
+            )
+        except ArchivoInvalido as e:
+            form.add_error('archivo', str(e))
+            return self.form_invalid(form)
+
+        messages.success(
+            self.request,
+            f"{resultado.creados} pacientes creados y {resultado.actualizados} actualizados."
+        )
+        # Se muestra el reporte en la misma página (sin redirigir) para ver las filas con error
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(),
+            resultado=resultado,
+            errores=resultado.errores[:self.errores_mostrados],
+        ))
+
 class EditarPacienteView(UpdateView):
     model = Paciente
     form_class = PacienteForm
@@ -87,9 +217,6 @@ class EliminarPacienteView(DeleteView):
 
 
 
-from datetime import date, timedelta
-from django.db.models import Q
-
 class CumpleanosProximosView(ListView):
     model = Paciente
     template_name = 'pacientes/cumpleanos_proximos.html'
@@ -97,17 +224,5 @@ class CumpleanosProximosView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        hoy = date.today()
-        dias_a_mirar = 180  # Próximos 30 días
-        pacientes = []
-
-        for paciente in Paciente.objects.all():
-            cumple = paciente.fecha_nacimiento.replace(year=hoy.year)
-            if cumple < hoy:
-                cumple = cumple.replace(year=hoy.year + 1)
-            if (cumple - hoy).days <= dias_a_mirar:
-                pacientes.append((paciente, (cumple - hoy).days))
-
-        # Ordenar por días hasta el cumpleaños
-        pacientes.sort(key=lambda x: x[1])
-        return [p[0] for p in pacientes]
\ No newline at end of file
+        dias_a_mirar = 180
+        return Paciente.objects.cumpleanos_en(dias=dias_a_mirar)
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class TratamientosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tratamientos'
-    verbose_name = '3. Tratamientos y Pagos'
\ No newline at end of file
+    verbose_name = '3. Tratamientos y Pagos'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,33 @@
+# tratamientos/management/commands/reconciliar_pagos.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tratamientos.models import Tratamiento
+
+
+class Command(BaseCommand):
+    help = "Recalcula total pagado, deuda y estado de pago de los tratamientos a partir de sus pagos"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra los tratamientos desincronizados, sin modificarlos'
+        )
+
+    def handle(self, *args, **options):
+        desincronizados = Tratamiento.objects.desincronizados().only(
+            'pk', 'nombre', 'costo_total', 'total_pagado', 'deuda', 'estado_pago'
+        )
+        for t in desincronizados.iterator():
+            self.stdout.write(
+                f"#{t.pk} {t.nombre}: guardado S/ {t.total_pagado} ({t.estado_pago}), "
+                f"según pagos S/ {t.total_calculado:.2f} ({t.estado_pago_calculado})"
+            )
+
+        if options['dry_run']:
+            return
+
+        with transaction.atomic():
+            actualizados = Tratamiento.objects.recalcular_saldos()
+        self.stdout.write(self.style.SUCCESS(f"{actualizados} tratamientos reconciliados."))
@@ -0,0 +1,39 @@
+# tratamientos/management/commands/reconstruir_resumen_pagos.py
+
+from django.core.management.base import BaseCommand
+from tratamientos.models import PagoResumenDiario
+
+
+class Command(BaseCommand):
+    help = "Rehace desde cero los resúmenes diarios de pagos que usan los reportes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra los días cuyo resumen no coincide con los pagos, sin modificarlos'
+        )
+
+    def handle(self, *args, **options):
+        guardados = {
+            (r.fecha, r.metodo_pago): (r.cantidad, r.total)
+            for r in PagoResumenDiario.objects.iterator()
+        }
+        calculados = {
+            (f['fecha'], f['metodo_pago']): (f['cantidad'], f['total'])
+            for f in PagoResumenDiario.objects.calculados().iterator()
+        }
+        for fecha, metodo in sorted(guardados.keys() | calculados.keys()):
+            guardado = guardados.get((fecha, metodo), (0, 0))
+            calculado = calculados.get((fecha, metodo), (0, 0))
+            if guardado != calculado:
+                self.stdout.write(
+                    f"{fecha} {metodo}: guardado {guardado[0]} pagos / S/ {guardado[1]}, "
+                    f"según pagos {calculado[0]} / S/ {calculado[1]}"
+                )
+
+        if options['dry_run']:
+            return
+
+        creados = PagoResumenDiario.objects.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{creados} resúmenes diarios creados."))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:40
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+
+
+def calcular_saldos(apps, schema_editor):
+    Tratamiento = apps.get_model('tratamientos', 'Tratamiento')
+    Pago = apps.get_model('tratamientos', 'Pago')
+    suma_pagos = Subquery(
+        Pago.objects.filter(tratamiento=OuterRef('pk'))
+        .order_by()
+        .values('tratamiento')
+        .annotate(total=Sum('monto'))
+        .values('total')
+    )
+    total = Coalesce(
+        suma_pagos, Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    Tratamiento.objects.update(
+        total_pagado=total,
+        deuda=F('costo_total') - total,
+        estado_pago=Case(
+            When(LessThanOrEqual(total, 0), then=Value('pendiente')),
+            When(GreaterThanOrEqual(total, F('costo_total')), then=Value('completado')),
+            default=Value('parcial'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tratamientos', '0003_alter_pago_fecha_pago'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tratamiento',
+            name='deuda',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Deuda (S/)'),
+        ),
+        migrations.AddField(
+            model_name='tratamiento',
+            name='estado_pago',
+            field=models.CharField(choices=[('pendiente', 'Sin pago'), ('parcial', 'Parcial'), ('completado', 'Pagado')], db_index=True, default='pendiente', editable=False, max_length=10, verbose_name='Estado del pago'),
+        ),
+        migrations.AddField(
+            model_name='tratamiento',
+            name='total_pagado',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Total pagado (S/)'),
+        ),
+        migrations.RunPython(calcular_saldos, migrations.RunPython.noop),
+    ]
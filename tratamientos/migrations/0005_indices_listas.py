@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:58
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0004_indices_listas'),
+        ('tratamientos', '0004_tratamiento_deuda_tratamiento_estado_pago_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tratamiento',
+            name='deuda',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=10, verbose_name='Deuda (S/)'),
+        ),
+        migrations.AlterField(
+            model_name='tratamiento',
+            name='estado_pago',
+            field=models.CharField(choices=[('pendiente', 'Sin pago'), ('parcial', 'Parcial'), ('completado', 'Pagado')], default='pendiente', editable=False, max_length=10, verbose_name='Estado del pago'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['-fecha_pago'], name='pago_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['metodo_pago', '-fecha_pago'], name='pago_metodo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['tratamiento', '-fecha_pago'], name='pago_tratamiento_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['-fecha_inicio'], name='trat_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['paciente', '-fecha_inicio'], name='trat_paciente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['paciente', '-creado_en'], name='trat_paciente_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['estado', '-fecha_inicio'], name='trat_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['estado_pago', '-fecha_inicio'], name='trat_estado_pago_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(fields=['deuda', 'fecha_inicio'], name='trat_deuda_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:02
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def completar_fechas_sin_hora(apps, schema_editor):
+    # Pagos guardados cuando fecha_pago era un DateField: '2025-11-21' sin hora.
+    # Django no los puede leer como fecha y hora; pasan a las 00:00 hora local.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Pago = apps.get_model('tratamientos', 'Pago')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, CAST(fecha_pago AS TEXT) FROM {Pago._meta.db_table} WHERE length(fecha_pago) = 10"
+        )
+        sin_hora = cursor.fetchall()
+    for pk, valor in sin_hora:
+        fecha = datetime.combine(date.fromisoformat(valor), time.min)
+        Pago.objects.filter(pk=pk).update(fecha_pago=timezone.make_aware(fecha))
+
+
+def crear_resumenes(apps, schema_editor):
+    Pago = apps.get_model('tratamientos', 'Pago')
+    PagoResumenDiario = apps.get_model('tratamientos', 'PagoResumenDiario')
+    filas = (
+        Pago.objects.order_by()
+        .annotate(fecha=TruncDate('fecha_pago', tzinfo=timezone.get_current_timezone()))
+        .values('fecha', 'metodo_pago')
+        .annotate(cantidad=Count('pk'), total=Sum('monto'))
+    )
+    PagoResumenDiario.objects.bulk_create(
+        (PagoResumenDiario(**fila) for fila in filas.iterator()), batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tratamientos', '0005_indices_listas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagoResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('metodo_pago', models.CharField(choices=[('efectivo', 'Efectivo'), ('yape', 'Yape'), ('plin', 'Plin'), ('transferencia', 'Transferencia bancaria'), ('tarjeta', 'Tarjeta'), ('otro', 'Otro')], max_length=15, verbose_name='Método de pago')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Cantidad de pagos')),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Total (S/)')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario de pagos',
+                'verbose_name_plural': 'Resúmenes diarios de pagos',
+                'ordering': ['fecha', 'metodo_pago'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'metodo_pago'), name='resumen_pago_fecha_metodo_unico')],
+            },
+        ),
+        migrations.RunPython(completar_fechas_sin_hora, migrations.RunPython.noop),
+        migrations.RunPython(crear_resumenes, migrations.RunPython.noop),
+    ]
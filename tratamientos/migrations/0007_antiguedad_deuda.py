@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def calcular_ultimo_pago(apps, schema_editor):
+    Tratamiento = apps.get_model('tratamientos', 'Tratamiento')
+    Pago = apps.get_model('tratamientos', 'Pago')
+    Tratamiento.objects.update(ultimo_pago=Subquery(
+        Pago.objects.filter(tratamiento=OuterRef('pk'))
+        .order_by('-fecha_pago')
+        .values('fecha_pago')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pacientes', '0004_indices_listas'),
+        ('tratamientos', '0006_resumen_diario_pagos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tratamiento',
+            name='ultimo_pago',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Último pago'),
+        ),
+        migrations.RunPython(calcular_ultimo_pago, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tratamiento',
+            index=models.Index(condition=models.Q(('deuda__gt', 0)), fields=['paciente', 'fecha_inicio', 'ultimo_pago', 'deuda'], name='trat_con_deuda_idx'),
+        ),
+    ]
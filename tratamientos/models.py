@@ -1,10 +1,115 @@
 # tratamientos/models.py
 
-from django.db import models
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
 from django.urls import reverse
 from pacientes.models import Paciente
 from django.utils import timezone
 
+
+def _ultimo_pago_calculado():
+    return Subquery(
+        Pago.objects.filter(tratamiento=OuterRef('pk'))
+        .order_by('-fecha_pago')
+        .values('fecha_pago')[:1]
+    )
+
+
+def _total_pagado_calculado():
+    """Suma de los pagos de cada tratamiento (0 si no tiene pagos)."""
+    suma_pagos = Subquery(
+        Pago.objects.filter(tratamiento=OuterRef('pk'))
+        .order_by()
+        .values('tratamiento')
+        .annotate(total=Sum('monto'))
+        .values('total')
+    )
+    return Coalesce(
+        suma_pagos, Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def _estado_pago_calculado(total):
+    # Mismas reglas que Tratamiento._actualizar_saldo()
+    return Case(
+        When(LessThanOrEqual(total, 0), then=Value('pendiente')),
+        When(GreaterThanOrEqual(total, F('costo_total')), then=Value('completado')),
+        default=Value('parcial'),
+    )
+
+
+class TratamientoQuerySet(models.QuerySet):
+    def recalcular_saldos(self):
+        """
+        Recalcula total_pagado, deuda, estado_pago y ultimo_pago a partir de
+        los pagos en un único UPDATE. Devuelve el número de tratamientos actualizados.
+        """
+        total = _total_pagado_calculado()
+        return self.update(
+            total_pagado=total,
+            ultimo_pago=_ultimo_pago_calculado(),
+            deuda=F('costo_total') - total,
+            estado_pago=_estado_pago_calculado(total),
+        )
+
+    def desincronizados(self):
+        """Tratamientos cuyos saldos guardados no coinciden con sus pagos."""
+        return self.annotate(
+            total_calculado=_total_pagado_calculado(),
+            estado_pago_calculado=_estado_pago_calculado(F('total_calculado')),
+        ).filter(
+            ~Q(total_pagado=F('total_calculado')) |
+            ~Q(deuda=F('costo_total') - F('total_calculado')) |
+            ~Q(estado_pago=F('estado_pago_calculado'))
+        )
+
+    def antiguedad_de_deuda(self, hoy=None):
+        """
+        Deuda por paciente repartida según los días desde el último movimiento de
+        cada tratamiento (su último pago o su fecha de inicio, lo más reciente),
+        en una sola consulta agrupada que solo lee trat_con_deuda_idx.
+        Una fila por paciente con deuda:
+        paciente_id, nombre, dni, tratamientos, deuda_0_30, deuda_31_60,
+        deuda_61_90, deuda_90_mas y deuda_total.
+        """
+        hoy = hoy or timezone.localdate()
+
+        def movido_desde(dias):
+            # "Hace como mucho `dias` días" sin restar fechas en SQL: se compara con el corte
+            corte = hoy - timedelta(days=dias)
+            return Q(fecha_inicio__gte=corte) | Q(ultimo_pago__gte=_inicio_del_dia(corte))
+
+        tramo = Case(
+            When(movido_desde(30), then=Value(0)),
+            When(movido_desde(60), then=Value(1)),
+            When(movido_desde(90), then=Value(2)),
+            default=Value(3),
+            output_field=IntegerField(),
+        )
+        cero = Value(Decimal('0.00'))
+        en_tramo = lambda n: Sum(Case(When(tramo=n, then=F('deuda')), default=cero))  # noqa: E731
+        return (
+            self.filter(deuda__gt=0)
+            .annotate(tramo=tramo)
+            .values('paciente_id')
+            .annotate(
+                nombre=F('paciente__nombre_completo'),
+                dni=F('paciente__dni'),
+                tratamientos=Count('pk'),
+                deuda_0_30=en_tramo(0),
+                deuda_31_60=en_tramo(1),
+                deuda_61_90=en_tramo(2),
+                deuda_90_mas=en_tramo(3),
+                deuda_total=Sum('deuda'),
+            )
+        )
+
+
 class Tratamiento(models.Model):
     paciente = models.ForeignKey(
         Paciente,
@@ -45,13 +150,65 @@ class Tratamiento(models.Model):
         default='pendiente',
         verbose_name="Estado del tratamiento"
     )
+
+    # === SALDOS (mantenidos por Pago.save()/delete() y `reconciliar_pagos`) ===
+    total_pagado = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name="Total pagado (S/)"
+    )
+    deuda = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        editable=False,
+        verbose_name="Deuda (S/)"
+    )
+    ESTADO_PAGO_CHOICES = [
+        ('pendiente', 'Sin pago'),
+        ('parcial', 'Parcial'),
+        ('completado', 'Pagado'),
+    ]
+    estado_pago = models.CharField(
+        max_length=10,
+        choices=ESTADO_PAGO_CHOICES,
+        default='pendiente',
+        editable=False,
+        verbose_name="Estado del pago"
+    )
+    ultimo_pago = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Último pago"
+    )
+
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = TratamientoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Tratamiento"
         verbose_name_plural = "Tratamientos"
         ordering = ['-creado_en']
+        # Un índice por cada filtro + orden de la lista de tratamientos y del detalle del paciente
+        indexes = [
+            models.Index(fields=['-fecha_inicio'], name='trat_fecha_idx'),
+            models.Index(fields=['paciente', '-fecha_inicio'], name='trat_paciente_fecha_idx'),
+            models.Index(fields=['paciente', '-creado_en'], name='trat_paciente_creado_idx'),
+            models.Index(fields=['estado', '-fecha_inicio'], name='trat_estado_fecha_idx'),
+            models.Index(fields=['estado_pago', '-fecha_inicio'], name='trat_estado_pago_fecha_idx'),
+            models.Index(fields=['deuda', 'fecha_inicio'], name='trat_deuda_fecha_idx'),
+            # Reporte de antigüedad de deuda: solo los tratamientos con saldo, ya agrupados por paciente
+            models.Index(
+                fields=['paciente', 'fecha_inicio', 'ultimo_pago', 'deuda'],
+                condition=Q(deuda__gt=0),
+                name='trat_con_deuda_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nombre} - {self.paciente.nombre_completo}"
@@ -59,14 +216,6 @@ class Tratamiento(models.Model):
     def get_absolute_url(self):
         return reverse('tratamientos:detalle', kwargs={'pk': self.pk})
 
-    @property
-    def total_pagado(self):
-        return sum(pago.monto for pago in self.pagos.all())
-
-    @property
-    def deuda(self):
-        return self.costo_total - self.total_pagado
-
     @property
     def porcentaje_pagado(self):
         if self.costo_total == 0:
@@ -74,19 +223,25 @@ class Tratamiento(models.Model):
         porcentaje = (self.total_pagado / self.costo_total) * 100
         return round(porcentaje, 1)  # Devuelve un float, ej: 86.5
 
-    @property
-    def estado_pago(self):
+    def _actualizar_saldo(self):
+        # Mismas reglas que TratamientoQuerySet.recalcular_saldos()
+        self.deuda = self.costo_total - self.total_pagado
         if self.total_pagado <= 0:
-            return 'pendiente'
+            self.estado_pago = 'pendiente'
         elif self.total_pagado >= self.costo_total:
-            return 'completado'
+            self.estado_pago = 'completado'
         else:
-            return 'parcial'
+            self.estado_pago = 'parcial'
 
     def save(self, *args, **kwargs):
         # Actualizar estado automáticamente si se marca fecha_fin
         if self.fecha_fin and self.estado != 'completado':
             self.estado = 'completado'
+        # El costo puede haber cambiado: la deuda se recalcula con el total ya pagado
+        self._actualizar_saldo()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'costo_total' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'deuda', 'estado_pago'}
         super().save(*args, **kwargs)
 
 
@@ -150,10 +305,135 @@ class Pago(models.Model):
         verbose_name = "Pago"
         verbose_name_plural = "Pagos"
         ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['-fecha_pago'], name='pago_fecha_idx'),
+            models.Index(fields=['metodo_pago', '-fecha_pago'], name='pago_metodo_fecha_idx'),
+            models.Index(fields=['tratamiento', '-fecha_pago'], name='pago_tratamiento_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"S/ {self.monto} - {self.get_metodo_pago_display()} ({self.fecha_pago})"
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Actualizar estado del tratamiento al guardar un pago
+        with transaction.atomic():
+            anterior = None
+            if self.pk:
+                anterior = (
+                    Pago.objects.filter(pk=self.pk)
+                    .values('tratamiento_id', 'fecha_pago', 'metodo_pago')
+                    .first()
+                )
+            super().save(*args, **kwargs)
+            # Actualizar saldos del tratamiento al guardar un pago
+            ids = {self.tratamiento_id}
+            claves = {self.clave_resumen()}
+            if anterior:
+                ids.add(anterior['tratamiento_id'])
+                claves.add(clave_resumen(anterior['fecha_pago'], anterior['metodo_pago']))
+            Tratamiento.objects.filter(pk__in=ids).recalcular_saldos()
+            # Y los resúmenes diarios del día/método nuevo y, si cambió, del anterior
+            PagoResumenDiario.objects.recalcular(claves)
+        self._refrescar_tratamiento()
+
+    def delete(self, *args, **kwargs):
+        # Los saldos se recalculan en tratamientos.signals (post_delete), que
+        # también corre con queryset.delete() y con los borrados en cascada
+        resultado = super().delete(*args, **kwargs)
+        self._refrescar_tratamiento()
+        return resultado
+
+    def _refrescar_tratamiento(self):
+        # Si el tratamiento ya está cargado en memoria, evitar mostrar saldos viejos
+        if Pago.tratamiento.is_cached(self):
+            self.tratamiento.refresh_from_db(fields=['total_pagado', 'deuda', 'estado_pago', 'ultimo_pago'])
+
+    def clave_resumen(self):
+        return clave_resumen(self.fecha_pago, self.metodo_pago)
+
+
+# ===== RESÚMENES DIARIOS DE PAGOS =====
+
+def clave_resumen(fecha_pago, metodo_pago):
+    """(día local, método) del resumen al que suma un pago."""
+    if timezone.is_aware(fecha_pago):
+        fecha_pago = timezone.localtime(fecha_pago)
+    return fecha_pago.date(), metodo_pago
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class PagoResumenDiarioQuerySet(models.QuerySet):
+    def recalcular(self, claves):
+        """
+        Rehace desde los pagos los resúmenes de las claves (fecha, método) dadas.
+        Cada clave es una búsqueda por rango sobre pago_metodo_fecha_idx.
+        """
+        for fecha, metodo in claves:
+            # Rango del día en hora local en vez de fecha_pago__date: así se usa el índice
+            totales = Pago.objects.filter(
+                metodo_pago=metodo,
+                fecha_pago__gte=_inicio_del_dia(fecha),
+                fecha_pago__lt=_inicio_del_dia(fecha + timedelta(days=1)),
+            ).aggregate(cantidad=Count('pk'), total=Sum('monto'))
+            if totales['cantidad']:
+                self.update_or_create(
+                    fecha=fecha, metodo_pago=metodo,
+                    defaults={'cantidad': totales['cantidad'], 'total': totales['total']},
+                )
+            else:
+                self.filter(fecha=fecha, metodo_pago=metodo).delete()
+
+    def calculados(self):
+        """Resúmenes según los pagos actuales (sin guardar): fecha, metodo_pago, cantidad, total."""
+        return (
+            Pago.objects.order_by()
+            .annotate(fecha=TruncDate('fecha_pago', tzinfo=timezone.get_current_timezone()))
+            .values('fecha', 'metodo_pago')
+            .annotate(cantidad=Count('pk'), total=Sum('monto'))
+        )
+
+    def reconstruir(self):
+        """Borra todos los resúmenes y los vuelve a crear desde cero. Devuelve cuántos creó."""
+        with transaction.atomic():
+            self.all().delete()
+            creados = self.bulk_create(
+                (PagoResumenDiario(**fila) for fila in self.calculados().iterator()),
+                batch_size=500,
+            )
+        return len(creados)
+
+
+class PagoResumenDiario(models.Model):
+    """
+    Cantidad y suma de los pagos de un día por método de pago. Se mantiene al
+    guardar o borrar cada Pago; los reportes leen solo esta tabla.
+    """
+    fecha = models.DateField(verbose_name="Fecha")
+    metodo_pago = models.CharField(
+        max_length=15,
+        choices=Pago.METODO_PAGO_CHOICES,
+        verbose_name="Método de pago"
+    )
+    cantidad = models.PositiveIntegerField(default=0, verbose_name="Cantidad de pagos")
+    total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name="Total (S/)"
+    )
+
+    objects = PagoResumenDiarioQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Resumen diario de pagos"
+        verbose_name_plural = "Resúmenes diarios de pagos"
+        ordering = ['fecha', 'metodo_pago']
+        constraints = [
+            # Su índice también sirve a los reportes, que filtran por rango de fechas
+            models.UniqueConstraint(fields=['fecha', 'metodo_pago'], name='resumen_pago_fecha_metodo_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.get_metodo_pago_display()}: {self.cantidad} pagos, S/ {self.total}"
@@ -0,0 +1,19 @@
+# tratamientos/signals.py
+
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Pago, PagoResumenDiario, Tratamiento
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_resumen_diario(sender, instance, **kwargs):
+    # También corre cuando el pago se borra en cascada con su tratamiento o paciente
+    PagoResumenDiario.objects.recalcular({instance.clave_resumen()})
+
+
+@receiver(post_delete, sender=Pago)
+def actualizar_saldos_al_borrar(sender, instance, **kwargs):
+    # Pago.delete(), Pago.objects.filter(...).delete() y cascadas: corre dentro de
+    # la transacción del borrado. En una cascada el tratamiento puede ya no existir
+    Tratamiento.objects.filter(pk=instance.tratamiento_id).recalcular_saldos()
@@ -1,3 +1,309 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.etree import ElementTree
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from consultorio_dental.paginacion import filtro_despues_de
+from consultorio_dental.pruebas import CacheVaciaMixin, PlanDeConsultaMixin, crear_paciente, plan_de_consulta, queryset_de_vista
+from .models import Pago, PagoResumenDiario, Tratamiento
+from .views import ListaTratamientosView, ListaPagosView
+
+
+class PlanesListasTratamientosTest(PlanDeConsultaMixin, TestCase):
+    def test_lista_de_tratamientos(self):
+        for url in ('/', '/?estado=en_progreso', '/?estado_pago=parcial', '/?orden=-deuda', '/?orden=deuda'):
+            with self.subTest(url=url):
+                self.assertUsaIndice(queryset_de_vista(ListaTratamientosView, url))
+
+    def test_tratamientos_de_un_paciente(self):
+        self.assertUsaIndice(queryset_de_vista(ListaTratamientosView, '/', paciente_id=crear_paciente().pk))
+
+    def test_lista_de_pagos(self):
+        for url in ('/', '/?metodo=yape', '/?paciente_id=1', '/?fecha_inicio=2025-01-01'):
+            with self.subTest(url=url):
+                self.assertUsaIndice(queryset_de_vista(ListaPagosView, url))
+
+    def test_pagina_con_cursor_sale_del_indice(self):
+        # Ni SCAN ni ordenamiento aparte: la página siguiente empieza en la posición del cursor
+        for vista, url, valores in (
+            (ListaPagosView, '/', ['2025-01-01 00:00:00+00:00', 50]),
+            (ListaTratamientosView, '/', ['2025-01-01', 50]),
+            (ListaTratamientosView, '/?orden=-deuda', ['100.00', '2025-01-01', 50]),
+            (ListaTratamientosView, '/?orden=deuda', ['100.00', '2025-01-01', 50]),
+        ):
+            with self.subTest(vista=vista.__name__, url=url):
+                instancia = vista()
+                instancia.setup(RequestFactory().get(url))
+                orden = instancia.get_orden_cursor()
+                pagina = instancia.get_queryset().filter(filtro_despues_de(orden, valores))[:21]
+                plan = plan_de_consulta(pagina)
+                self.assertTrue(plan[0].startswith('SEARCH'), plan)
+                self.assertFalse(any('TEMP B-TREE' in paso for paso in plan), plan)
+
+
+LIMA = ZoneInfo('America/Lima')
+
+
+class SaldosTratamientoTest(CacheVaciaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.paciente = crear_paciente()
+        self.tratamiento = self.crear_tratamiento('Ortodoncia', 1000)
+
+    def crear_tratamiento(self, nombre, costo):
+        return Tratamiento.objects.create(
+            paciente=self.paciente, nombre=nombre, costo_total=costo, fecha_inicio='2025-01-01'
+        )
+
+    def saldo(self, tratamiento=None):
+        t = Tratamiento.objects.get(pk=(tratamiento or self.tratamiento).pk)
+        return t.total_pagado, t.deuda, t.estado_pago
+
+    def test_se_mantienen_al_guardar_editar_y_borrar(self):
+        self.assertEqual(self.saldo(), (0, 1000, 'pendiente'))
+        pago = Pago.objects.create(tratamiento=self.tratamiento, monto=400)
+        self.assertEqual(self.saldo(), (400, 600, 'parcial'))
+
+        pago.monto = 1000
+        pago.save()
+        self.assertEqual(self.saldo(), (1000, 0, 'completado'))
+
+        # Pasar el pago a otro tratamiento actualiza los dos
+        otro = self.crear_tratamiento('Limpieza', 200)
+        pago.tratamiento = otro
+        pago.save()
+        self.assertEqual(self.saldo(), (0, 1000, 'pendiente'))
+        self.assertEqual(self.saldo(otro), (1000, -800, 'completado'))
+
+        pago.delete()
+        self.assertEqual(self.saldo(otro), (0, 200, 'pendiente'))
+
+        # Subir el costo recalcula la deuda con lo ya pagado
+        Pago.objects.create(tratamiento=self.tratamiento, monto=1000)
+        self.tratamiento.refresh_from_db()
+        self.tratamiento.costo_total = 1500
+        self.tratamiento.save(update_fields=['costo_total'])
+        self.assertEqual(self.saldo(), (1000, 500, 'parcial'))
+
+    def test_borrado_desde_un_queryset(self):
+        for monto in (100, 200, 300):
+            Pago.objects.create(tratamiento=self.tratamiento, monto=monto)
+        Pago.objects.filter(monto__gte=200).delete()
+        self.assertEqual(self.saldo(), (100, 900, 'parcial'))
+        self.assertFalse(Tratamiento.objects.desincronizados().exists())
+
+    def test_reconciliar_pagos(self):
+        Pago.objects.create(tratamiento=self.tratamiento, monto=400)
+        otro = self.crear_tratamiento('Limpieza', 200)
+        Pago.objects.create(tratamiento=otro, monto=200)
+        # Desfasados a mano: uno en los montos, otro solo en el estado
+        Tratamiento.objects.filter(pk=self.tratamiento.pk).update(total_pagado=0, deuda=1000)
+        Tratamiento.objects.filter(pk=otro.pk).update(estado_pago='parcial')
+        self.assertEqual(Tratamiento.objects.desincronizados().count(), 2)
+
+        salida = io.StringIO()
+        call_command('reconciliar_pagos', '--dry-run', stdout=salida)
+        self.assertIn('Ortodoncia', salida.getvalue())
+        self.assertIn('(parcial), según pagos S/ 200.00 (completado)', salida.getvalue())
+        self.assertEqual(self.saldo(), (0, 1000, 'parcial'))
+
+        call_command('reconciliar_pagos', stdout=io.StringIO())
+        self.assertEqual(self.saldo(), (400, 600, 'parcial'))
+        self.assertEqual(self.saldo(otro), (200, 0, 'completado'))
+        self.assertFalse(Tratamiento.objects.desincronizados().exists())
+
+    def test_lista_con_consultas_constantes(self):
+        url = reverse('tratamientos:lista')
+
+        def consultas():
+            cache.clear()
+            with CaptureQueriesContext(connection) as capturadas:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(capturadas)
+
+        Pago.objects.create(tratamiento=self.tratamiento, monto=100)
+        una_fila = consultas()
+        for i in range(25):
+            tratamiento = self.crear_tratamiento(f'Tratamiento {i}', 500)
+            Pago.objects.create(tratamiento=tratamiento, monto=100)
+            Pago.objects.create(tratamiento=tratamiento, monto=50)
+        self.assertEqual(consultas(), una_fila)
+
+
+class ResumenDiarioPagosTest(TestCase):
+    def setUp(self):
+        self.tratamiento = Tratamiento.objects.create(
+            paciente=crear_paciente(), nombre='Ortodoncia', costo_total=1000, fecha_inicio='2025-01-01'
+        )
+
+    def pagar(self, monto, cuando, metodo='efectivo'):
+        return Pago.objects.create(
+            tratamiento=self.tratamiento, monto=monto, metodo_pago=metodo,
+            fecha_pago=datetime(*cuando, tzinfo=LIMA),
+        )
+
+    def resumenes(self):
+        return list(PagoResumenDiario.objects.values_list('fecha', 'metodo_pago', 'cantidad', 'total'))
+
+    def test_se_mantiene_al_guardar_y_borrar(self):
+        self.pagar(100, (2025, 1, 10, 9))
+        pago = self.pagar(50, (2025, 1, 10, 23, 30))  # ya es 11 de enero en UTC: cuenta el día local
+        self.pagar(30, (2025, 1, 10, 12), metodo='yape')
+        self.assertEqual(self.resumenes(), [
+            (date(2025, 1, 10), 'efectivo', 2, Decimal('150.00')),
+            (date(2025, 1, 10), 'yape', 1, Decimal('30.00')),
+        ])
+
+        pago.metodo_pago = 'yape'
+        pago.fecha_pago = datetime(2025, 2, 1, 10, tzinfo=LIMA)
+        pago.save()
+        self.assertEqual(self.resumenes(), [
+            (date(2025, 1, 10), 'efectivo', 1, Decimal('100.00')),
+            (date(2025, 1, 10), 'yape', 1, Decimal('30.00')),
+            (date(2025, 2, 1), 'yape', 1, Decimal('50.00')),
+        ])
+
+        pago.delete()
+        self.assertEqual(len(self.resumenes()), 2)
+        # Los pagos borrados en cascada también se descuentan
+        self.tratamiento.delete()
+        self.assertEqual(self.resumenes(), [])
+
+    def test_reconstruir_da_lo_mismo(self):
+        self.pagar(100, (2025, 1, 10, 9))
+        self.pagar(20, (2025, 3, 5, 18), metodo='plin')
+        incremental = self.resumenes()
+        PagoResumenDiario.objects.update(cantidad=0)
+        call_command('reconstruir_resumen_pagos', stdout=io.StringIO())
+        self.assertEqual(self.resumenes(), incremental)
+
+    def test_reporte_mensual_solo_lee_los_resumenes(self):
+        self.pagar(100, (2025, 1, 10, 9))
+        self.pagar(40, (2025, 1, 20, 9), metodo='yape')
+        self.pagar(60, (2025, 2, 3, 9))
+        url = reverse('tratamientos:reporte_pagos') + '?agrupar=mes&desde=2025-01-01&hasta=2025-12-31'
+        with CaptureQueriesContext(connection) as consultas:
+            context = self.client.get(url).context
+        self.assertFalse([c['sql'] for c in consultas if '"tratamientos_pago"' in c['sql']])
+        meses = [(f['periodo'], f['cantidad'], f['total']) for f in context['periodos']]
+        self.assertEqual(meses, [
+            (date(2025, 1, 1), 2, Decimal('140.00')),
+            (date(2025, 2, 1), 1, Decimal('60.00')),
+        ])
+        self.assertEqual(context['total_general'], Decimal('200.00'))
+
+    def test_reporte_con_metodo_antiguo(self):
+        self.pagar(100, (2025, 1, 10, 9))
+        self.pagar(25, (2025, 1, 11, 9), metodo='cheque')  # ya no está en METODO_PAGO_CHOICES
+        response = self.client.get(reverse('tratamientos:reporte_pagos') + '?desde=2025-01-01&hasta=2025-12-31')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['metodos'][-1], ('cheque', 'cheque'))
+        self.assertEqual(response.context['totales_por_metodo'][-1], {'cantidad': 1, 'total': Decimal('25.00')})
+        self.assertEqual(response.context['total_general'], Decimal('125.00'))
+
+
+class AntiguedadDeudaTest(PlanDeConsultaMixin, TestCase):
+    def setUp(self):
+        self.ana = crear_paciente('10000001', nombre_completo='Ana')
+        self.beto = crear_paciente('10000002', nombre_completo='Beto')
+        self.hoy = date(2025, 6, 30)
+
+    def tratamiento(self, paciente, costo, inicio):
+        return Tratamiento.objects.create(paciente=paciente, nombre='Tto', costo_total=costo, fecha_inicio=inicio)
+
+    def test_tramos_por_ultimo_movimiento(self):
+        self.tratamiento(self.ana, 100, '2025-06-20')            # 10 días: 0-30
+        antiguo = self.tratamiento(self.ana, 300, '2025-01-01')  # pago hace 45 días: 31-60
+        Pago.objects.create(tratamiento=antiguo, monto=100, fecha_pago=datetime(2025, 5, 16, 10, tzinfo=LIMA))
+        self.tratamiento(self.beto, 50, '2025-04-15')            # 76 días: 61-90
+        self.tratamiento(self.beto, 70, '2024-12-01')            # más de 90
+        self.tratamiento(self.beto, 80, '2024-12-01').pagos.create(monto=80)  # pagado: no aparece
+
+        filas = {
+            f['nombre']: f for f in Tratamiento.objects.antiguedad_de_deuda(hoy=self.hoy)
+        }
+        self.assertEqual(
+            [filas['Ana'][k] for k in ('deuda_0_30', 'deuda_31_60', 'deuda_61_90', 'deuda_90_mas', 'deuda_total')],
+            [100, 200, 0, 0, 300],
+        )
+        self.assertEqual(
+            [filas['Beto'][k] for k in ('deuda_0_30', 'deuda_31_60', 'deuda_61_90', 'deuda_90_mas', 'deuda_total')],
+            [0, 0, 50, 70, 120],
+        )
+        self.assertEqual(filas['Beto']['tratamientos'], 2)
+
+    def test_una_consulta_sobre_el_indice_parcial(self):
+        plan = plan_de_consulta(Tratamiento.objects.antiguedad_de_deuda())
+        self.assertIn('trat_con_deuda_idx', ' '.join(plan))
+        self.assertFalse([paso for paso in plan if 'tratamientos_pago' in paso], plan)
+
+    def test_orden_y_descarga_csv(self):
+        self.tratamiento(self.ana, 100, '2025-06-20')
+        self.tratamiento(self.beto, 500, '2025-06-20')
+        url = reverse('tratamientos:antiguedad_deuda')
+        deudores = self.client.get(url + '?orden=deuda').context['deudores']
+        self.assertEqual([d['nombre'] for d in deudores], ['Ana', 'Beto'])
+
+        response = self.client.get(url + '?formato=csv')
+        lineas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lineas[0].split(',')[:2], ['DNI', 'Paciente'])
+        self.assertTrue(lineas[1].startswith('10000002,Beto,1,'))
+
+
+class ExportacionTest(CacheVaciaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        tratamiento = Tratamiento.objects.create(
+            paciente=crear_paciente(nombre_completo='Ana Pérez'), nombre='Limpieza', costo_total=500,
+            fecha_inicio='2025-01-01',
+        )
+        Pago.objects.create(tratamiento=tratamiento, monto=100, metodo_pago='yape',
+                            fecha_pago=datetime(2025, 1, 10, 9, 30, tzinfo=LIMA))
+        Pago.objects.create(tratamiento=tratamiento, monto=50, metodo_pago='efectivo',
+                            fecha_pago=datetime(2025, 1, 11, 9, tzinfo=LIMA))
+
+    def test_csv_con_los_filtros_de_la_lista(self):
+        response = self.client.get(reverse('tratamientos:lista_pagos') + '?metodo=yape&formato=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertIn('2025-01-10 09:30,10000000,Ana Pérez,Limpieza,100.00,yape', lineas[1])
+
+    def test_xlsx_es_un_libro_valido(self):
+        response = self.client.get(reverse('tratamientos:lista_pagos') + '?formato=xlsx')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as libro:
+            self.assertIn('xl/workbook.xml', libro.namelist())
+            hoja = libro.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(hoja.count('<row>'), 3)
+        self.assertIn('Ana Pérez', hoja)
+        self.assertIn('<c><v>100.00</v></c>', hoja)
+
+    def test_xlsx_sin_caracteres_de_control(self):
+        # Texto pegado desde otro programa: XML 1.0 no admite \x0b ni \x01
+        Tratamiento.objects.update(nombre='Limpieza\x0bprofunda\x01')
+        response = self.client.get(reverse('tratamientos:lista_pagos') + '?formato=xlsx')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as libro:
+            hoja = ElementTree.fromstring(libro.read('xl/worksheets/sheet1.xml'))
+        textos = [t.text for t in hoja.iter('{http://schemas.openxmlformats.org/spreadsheetml/2006/main}t')]
+        self.assertIn('Limpiezaprofunda', textos)
+
+    def test_comando_escribe_el_archivo(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            salida = os.path.join(carpeta, 'pagos.csv')
+            call_command('exportar', 'pagos', '--salida', salida, '--filtros', 'metodo=efectivo',
+                         stdout=io.StringIO())
+            with open(salida, encoding='utf-8-sig') as archivo:
+                lineas = archivo.read().splitlines()
+        self.assertEqual(len(lineas), 2)
+        self.assertIn(',50.00,efectivo,', lineas[1])
@@ -20,4 +20,6 @@ urlpatterns = [
     path('pago/<int:pk>/eliminar/', views.EliminarPagoView.as_view(), name='eliminar_pago'),
     # Añade esta línea en urlpatterns
     path('pagos/', views.ListaPagosView.as_view(), name='lista_pagos'),
+    path('pagos/reporte/', views.ReportePagosView.as_view(), name='reporte_pagos'),
+    path('deudas/', views.AntiguedadDeudaView.as_view(), name='antiguedad_deuda'),
 ]
\ No newline at end of file
@@ -4,24 +4,68 @@ import calendar
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.urls import reverse_lazy, reverse
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from consultorio_dental.cache_paginas import CachePaginaMixin, dependencia_paciente
+from consultorio_dental.exportar import ExportarMixin
+from consultorio_dental.paginacion import PaginacionPorCursorMixin
 from pacientes.models import Paciente
-from .models import Tratamiento, Pago
+from .models import Tratamiento, Pago, PagoResumenDiario
 from .forms import TratamientoForm, PagoForm
 
 # ===== TRATAMIENTOS =====
 
-from django.db.models import Q
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 
-class ListaTratamientosView(ListView):
+class ListaTratamientosView(CachePaginaMixin, ExportarMixin, PaginacionPorCursorMixin, ListView):
     model = Tratamiento
     template_name = 'tratamientos/lista_tratamientos.html'
     context_object_name = 'tratamientos'
     paginate_by = 20
+    orden_cursor = ('-fecha_inicio', 'pk')
+    limite_conteo = 1000
+    columnas_exportacion = [
+        ('pk', 'ID'),
+        ('paciente__dni', 'DNI'),
+        ('paciente__nombre_completo', 'Paciente'),
+        ('nombre', 'Tratamiento'),
+        ('fecha_inicio', 'Fecha de inicio'),
+        ('fecha_fin', 'Fecha de finalización'),
+        ('estado', 'Estado'),
+        ('costo_total', 'Costo total'),
+        ('total_pagado', 'Total pagado'),
+        ('deuda', 'Deuda'),
+        ('estado_pago', 'Estado del pago'),
+        ('cantidad_pagos', 'Pagos'),
+        ('ultimo_pago', 'Último pago'),
+    ]
+    nombre_exportacion = 'tratamientos'
+
+    # Valores permitidos para ?orden= (con desempate hasta la clave primaria).
+    # Todas las columnas en la dirección de trat_deuda_fecha_idx (o todas al revés):
+    # con direcciones mezcladas SQLite ordena aparte el desempate (TEMP B-TREE)
+    ORDENES = {
+        'deuda': ('deuda', 'fecha_inicio', 'pk'),
+        '-deuda': ('-deuda', '-fecha_inicio', '-pk'),
+    }
+
+    def get_dependencias_cache(self):
+        # La lista de un paciente solo cambia con sus tratamientos y pagos
+        paciente_id = self.kwargs.get('paciente_id')
+        return [dependencia_paciente(paciente_id)] if paciente_id else ['tratamientos']
 
     def get_queryset(self):
         paciente_id = self.kwargs.get('paciente_id')
-        queryset = Tratamiento.objects.all()
+        # Los saldos están guardados en el tratamiento: solo falta contar los pagos.
+        # Subconsulta en vez de JOIN + GROUP BY: así el orden puede salir de un índice
+        cantidad_pagos = Subquery(
+            Pago.objects.filter(tratamiento=OuterRef('pk')).order_by()
+            .values('tratamiento').annotate(n=Count('pk')).values('n'),
+            output_field=IntegerField(),
+        )
+        queryset = Tratamiento.objects.select_related('paciente').annotate(
+            cantidad_pagos=Coalesce(cantidad_pagos, 0)
+        )
         
         if paciente_id:
             self.paciente = get_object_or_404(Paciente, pk=paciente_id)
@@ -32,6 +76,7 @@ class ListaTratamientosView(ListView):
         # Filtros
         q = self.request.GET.get('q')
         estado = self.request.GET.get('estado')
+        estado_pago = self.request.GET.get('estado_pago')
         fecha_inicio = self.request.GET.get('fecha_inicio')
         fecha_fin = self.request.GET.get('fecha_fin')
 
@@ -43,6 +88,9 @@ class ListaTratamientosView(ListView):
         
         if estado:
             queryset = queryset.filter(estado=estado)
+
+        if estado_pago:
+            queryset = queryset.filter(estado_pago=estado_pago)
         
         if fecha_inicio:
             queryset = queryset.filter(fecha_inicio__gte=fecha_inicio)
@@ -50,9 +98,10 @@ class ListaTratamientosView(ListView):
         if fecha_fin:
             queryset = queryset.filter(fecha_inicio__lte=fecha_fin)
 
-        return queryset.order_by('-fecha_inicio')
-
+        return queryset.order_by(*self.get_orden_cursor())
 
+    def get_orden_cursor(self):
+        return self.ORDENES.get(self.request.GET.get('orden'), self.orden_cursor)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -222,11 +271,28 @@ class EliminarPagoView(DeleteView):
 
 
 # Añade esta vista en tratamientos/views.py
-class ListaPagosView(ListView):
+class ListaPagosView(CachePaginaMixin, ExportarMixin, PaginacionPorCursorMixin, ListView):
     model = Pago
     template_name = 'tratamientos/lista_pagos.html'
     context_object_name = 'pagos'
     paginate_by = 20
+    orden_cursor = ('-fecha_pago', 'pk')
+    limite_conteo = 1000
+    columnas_exportacion = [
+        ('pk', 'ID'),
+        ('fecha_pago', 'Fecha del pago'),
+        ('tratamiento__paciente__dni', 'DNI'),
+        ('tratamiento__paciente__nombre_completo', 'Paciente'),
+        ('tratamiento__nombre', 'Tratamiento'),
+        ('monto', 'Monto'),
+        ('metodo_pago', 'Método de pago'),
+        ('nota', 'Nota'),
+        ('registrado_en', 'Registrado en'),
+    ]
+    nombre_exportacion = 'pagos'
+
+    def get_dependencias_cache(self):
+        return ['pagos']
 
     def get_queryset(self):
         queryset = Pago.objects.select_related('tratamiento__paciente', 'tratamiento').all()
@@ -257,9 +323,144 @@ class ListaPagosView(ListView):
         if paciente_id:
             queryset = queryset.filter(tratamiento__paciente_id=paciente_id)
 
-        return queryset.order_by('-fecha_pago')
+        return queryset.order_by(*self.orden_cursor)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Para el filtro por paciente (opcional: podrías usar un select con pacientes)
-        return context
\ No newline at end of file
+        return context
+
+
+# ===== REPORTE DE PAGOS =====
+
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+
+
+class ReportePagosView(TemplateView):
+    """
+    Ingresos por día, mes o año y método de pago. Lee solo PagoResumenDiario
+    (una fila por día y método), nunca la tabla de pagos.
+    """
+    template_name = 'tratamientos/reporte_pagos.html'
+
+    # ?agrupar= → (función de truncado, formato del periodo en la plantilla)
+    AGRUPACIONES = {
+        'dia': (None, 'd/m/Y'),
+        'mes': (TruncMonth, 'F Y'),
+        'anio': (TruncYear, 'Y'),
+    }
+
+    def _fecha(self, parametro, por_defecto):
+        try:
+            return date.fromisoformat(self.request.GET.get(parametro, ''))
+        except ValueError:
+            return por_defecto
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        hoy = date.today()
+        agrupar = self.request.GET.get('agrupar')
+        if agrupar not in self.AGRUPACIONES:
+            agrupar = 'mes'
+        desde = self._fecha('desde', hoy.replace(month=1, day=1))
+        hasta = self._fecha('hasta', hoy)
+        metodo = self.request.GET.get('metodo')
+
+        resumenes = PagoResumenDiario.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        if metodo:
+            resumenes = resumenes.filter(metodo_pago=metodo)
+        truncar, formato = self.AGRUPACIONES[agrupar]
+        periodo = truncar('fecha') if truncar else F('fecha')
+        filas = (
+            resumenes.order_by()
+            .annotate(periodo=periodo)
+            .values('periodo', 'metodo_pago')
+            .annotate(cantidad=Sum('cantidad'), total=Sum('total'))
+            .order_by('periodo', 'metodo_pago')
+        )
+
+        # Una fila por periodo con una columna por método
+        filas = list(filas)
+        conocidos = dict(Pago.METODO_PAGO_CHOICES)
+        metodos = [m for m in Pago.METODO_PAGO_CHOICES if not metodo or m[0] == metodo]
+        # Métodos antiguos que ya no están en las opciones: columna propia con su valor tal cual
+        metodos += [
+            (clave, clave) for clave in dict.fromkeys(fila['metodo_pago'] for fila in filas)
+            if clave not in conocidos
+        ]
+        periodos = {}
+        totales = {clave: {'cantidad': 0, 'total': 0} for clave, _ in metodos}
+        for fila in filas:
+            datos = periodos.setdefault(fila['periodo'], {
+                'periodo': fila['periodo'],
+                'por_metodo': {clave: None for clave, _ in metodos},
+                'cantidad': 0,
+                'total': 0,
+            })
+            datos['por_metodo'][fila['metodo_pago']] = fila
+            datos['cantidad'] += fila['cantidad']
+            datos['total'] += fila['total']
+            totales[fila['metodo_pago']]['cantidad'] += fila['cantidad']
+            totales[fila['metodo_pago']]['total'] += fila['total']
+
+        for datos in periodos.values():
+            datos['columnas'] = [datos['por_metodo'][clave] for clave, _ in metodos]
+
+        context.update({
+            'agrupar': agrupar,
+            'formato_periodo': formato,
+            'desde': desde,
+            'hasta': hasta,
+            'metodo': metodo,
+            'metodos': metodos,
+            'metodos_disponibles': Pago.METODO_PAGO_CHOICES,
+            'periodos': list(periodos.values()),
+            'totales_por_metodo': [totales[clave] for clave, _ in metodos],
+            'cantidad_total': sum(t['cantidad'] for t in totales.values()),
+            'total_general': sum(t['total'] for t in totales.values()),
+        })
+        return context
+
+
+# ===== ANTIGÜEDAD DE DEUDA =====
+
+class AntiguedadDeudaView(ExportarMixin, ListView):
+    """
+    Pacientes con deuda, repartida en tramos de 0-30, 31-60, 61-90 y más de 90
+    días sin movimiento. ?formato=csv|xlsx descarga el reporte completo.
+    """
+    template_name = 'tratamientos/antiguedad_deuda.html'
+    context_object_name = 'deudores'
+    paginate_by = 25
+
+    # Valores permitidos para ?orden= (con desempate por paciente)
+    ORDENES = {
+        '-deuda': ('-deuda_total', 'paciente_id'),
+        'deuda': ('deuda_total', 'paciente_id'),
+        'antiguedad': ('-deuda_90_mas', '-deuda_61_90', '-deuda_total', 'paciente_id'),
+        'nombre': ('nombre', 'paciente_id'),
+    }
+    columnas_exportacion = [
+        ('dni', 'DNI'),
+        ('nombre', 'Paciente'),
+        ('tratamientos', 'Tratamientos con deuda'),
+        ('deuda_0_30', '0-30 días'),
+        ('deuda_31_60', '31-60 días'),
+        ('deuda_61_90', '61-90 días'),
+        ('deuda_90_mas', 'Más de 90 días'),
+        ('deuda_total', 'Deuda total'),
+    ]
+    nombre_exportacion = 'deudas'
+
+    def get_orden(self):
+        orden = self.request.GET.get('orden')
+        return orden if orden in self.ORDENES else '-deuda'
+
+    def get_queryset(self):
+        return Tratamiento.objects.antiguedad_de_deuda().order_by(*self.ORDENES[self.get_orden()])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['orden'] = self.get_orden()
+        return context
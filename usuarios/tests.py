@@ -1,3 +1,26 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+
+class SesionTest(TestCase):
+    def setUp(self):
+        # Sin is_staff: el login del admin no le sirve
+        self.usuario = User.objects.create_user('asistente', password='clave-segura')
+
+    def test_usuario_sin_staff_inicia_sesion_y_llega_a_media(self):
+        response = self.client.get('/media/no-existe.jpg')
+        self.assertRedirects(
+            response, reverse('usuarios:login') + '?next=/media/no-existe.jpg', fetch_redirect_response=False
+        )
+        response = self.client.post(reverse('usuarios:login'), {
+            'username': 'asistente', 'password': 'clave-segura', 'next': '/media/no-existe.jpg',
+        })
+        self.assertRedirects(response, '/media/no-existe.jpg', target_status_code=404)
+
+    def test_cerrar_sesion(self):
+        self.client.force_login(self.usuario)
+        self.assertContains(self.client.get(reverse('usuarios:logout')), 'asistente')
+        response = self.client.post(reverse('usuarios:logout'))
+        self.assertRedirects(response, reverse('usuarios:login'))
+        self.assertNotIn('_auth_user_id', self.client.session)
@@ -0,0 +1,15 @@
+# usuarios/urls.py
+
+from django.contrib.auth import views as auth_views
+from django.urls import path
+
+from . import views
+
+app_name = 'usuarios'
+
+urlpatterns = [
+    path('login/', auth_views.LoginView.as_view(
+        template_name='usuarios/login.html', redirect_authenticated_user=True
+    ), name='login'),
+    path('logout/', views.CerrarSesionView.as_view(), name='logout'),
+]
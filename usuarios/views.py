@@ -1,3 +1,17 @@
-from django.shortcuts import render
+# usuarios/views.py
 
-# Create your views here.
+from django.contrib.auth.views import LogoutView
+from django.template.response import TemplateResponse
+
+
+class CerrarSesionView(LogoutView):
+    """
+    Cerrar sesión exige POST. El enlace "Salir" de la barra lleva a una página de
+    confirmación con el formulario: la barra no puede llevar un token CSRF porque
+    algunas páginas se guardan en caché y se sirven a todos los usuarios.
+    """
+    http_method_names = ['get', 'post', 'options']
+    template_name = 'usuarios/logout.html'
+
+    def get(self, request, *args, **kwargs):
+        return TemplateResponse(request, self.template_name)